@@ -0,0 +1,63 @@
+"""基准测试脚本共用的计时与报告工具"""
+
+import os
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """返回样本的百分位数（最近秩法）"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples_s: List[float]) -> Dict[str, float]:
+    """把秒级样本汇总为微秒级统计"""
+    us = [s * 1e6 for s in samples_s]
+    return {
+        "n": len(us),
+        "mean_us": statistics.fmean(us) if us else 0.0,
+        "p50_us": percentile(us, 50),
+        "p99_us": percentile(us, 99),
+        "max_us": max(us) if us else 0.0,
+    }
+
+
+def bench(fn: Callable[[], Any], iterations: int = 1000) -> Dict[str, float]:
+    """同步函数计时"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def abench(fn: Callable[[], Awaitable[Any]], iterations: int = 200) -> Dict[str, float]:
+    """异步函数计时"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def report(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    """打印统计表"""
+    print(f"\n🔹 {title}")
+    print("-" * 72)
+    print(f"{'case':28} {'n':>6} {'mean(us)':>10} {'p50(us)':>10} {'p99(us)':>10} {'max(us)':>10}")
+    for name, stats in rows.items():
+        print(
+            f"{name:28} {stats['n']:>6} {stats['mean_us']:>10.1f} {stats['p50_us']:>10.1f} "
+            f"{stats['p99_us']:>10.1f} {stats['max_us']:>10.1f}"
+        )
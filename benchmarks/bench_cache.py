@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""响应缓存 vs 直接 ainvoke
+
+用法: uv run python benchmarks/bench_cache.py
+"""
+
+import asyncio
+
+from _common import abench, report
+from langchain_core.messages import HumanMessage
+
+from agent.graph import cached_graph, graph
+
+
+async def run():
+    rows = {}
+    for text in ["北京天气怎么样", "明天上海天气", "哪个城市最热", "你好"]:
+        await cached_graph.ainvoke({"messages": [HumanMessage(content=text)], "ui": []})  # 预热
+        rows[f"{text} ainvoke"] = await abench(
+            lambda t=text: graph.ainvoke({"messages": [HumanMessage(content=t)], "ui": []}), 300
+        )
+        rows[f"{text} cached"] = await abench(
+            lambda t=text: cached_graph.ainvoke({"messages": [HumanMessage(content=t)], "ui": []}), 300
+        )
+    report("graph.ainvoke vs cached_graph.ainvoke (hit)", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""天气卡片并行面板：各分支模拟上游延迟时，图的端到端耗时与串行获取对比
+
+用法: uv run python benchmarks/bench_fanout.py
+"""
+
+import asyncio
+import sys
+
+from _common import abench, report
+from langchain_core.messages import HumanMessage
+
+from agent.graph import graph
+from agent.panels import AIR_QUALITY, ALERTS, CURRENT, PANELS, SUN
+from agent.providers import WeatherFetcher
+
+graph_module = sys.modules["agent.graph"]
+
+# 每个分支的模拟上游延迟（秒）
+LATENCY = {CURRENT: 0.030, AIR_QUALITY: 0.020, ALERTS: 0.010, SUN: 0.005}
+
+
+class Delayed:
+    def __init__(self, inner, delay: float) -> None:
+        self.inner = inner
+        self.delay = delay
+        self.name = getattr(inner, "name", "delayed")
+
+    async def fetch(self, city: str):
+        await asyncio.sleep(self.delay)
+        return await self.inner.fetch(city)
+
+
+async def sequential(city: str) -> None:
+    """改动前的做法：在一个节点里依次获取每个数据集"""
+    await graph_module._weather_fetcher.fetch_with_fallback(city)
+    for panel in PANELS[1:]:
+        await graph_module._panel_providers[panel].fetch(city)
+
+
+async def run() -> None:
+    graph_module._weather_fetcher = WeatherFetcher(Delayed(graph_module._static_provider, LATENCY[CURRENT]))
+    for panel in PANELS[1:]:
+        graph_module._panel_providers[panel] = Delayed(graph_module._panel_providers[panel], LATENCY[panel])
+    state = {"messages": [HumanMessage(content="北京天气怎么样")], "ui": []}
+    latencies = ", ".join(f"{panel} {delay * 1000:.0f}ms" for panel, delay in LATENCY.items())
+    report(f"branch latency: {latencies}", {
+        "sequential fetches": await abench(lambda: sequential("北京"), 50),
+        "graph (fan-out)": await abench(lambda: graph.ainvoke(state), 50),
+    })
+
+    graph_module._panel_providers[SUN] = Delayed(graph_module._panel_providers[SUN], 1.0)
+    report("sun branch stuck for 1s, panel_timeout_ms=100", {
+        "graph (fan-out)": await abench(lambda: graph.ainvoke(state, {"configurable": {"panel_timeout_ms": 100}}), 20),
+    })
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
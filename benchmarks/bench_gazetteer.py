@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""行政区划索引构建与查询基准
+
+用法: uv run python benchmarks/bench_gazetteer.py
+"""
+
+import os
+import sys
+import time
+
+from _common import bench, report
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests', 'unit_tests'))
+
+from test_gazetteer import synthetic_divisions
+
+from agent.divisions import ADMIN_DIVISIONS
+from agent.gazetteer import Gazetteer, short_name
+from agent.graph import WEATHER_DATA
+
+
+def main() -> None:
+    bundled = Gazetteer(ADMIN_DIVISIONS)
+    available = {w["city"] for w in WEATHER_DATA}
+    report(f"bundled gazetteer ({len(bundled)} divisions)", {
+        "district -> city": bench(lambda: bundled.resolve("南山区天气", available), 5000),
+        "province -> capital": bench(lambda: bundled.resolve("浙江天气", available), 5000),
+        "ambiguous + containment": bench(lambda: bundled.resolve("北京朝阳区天气", available), 5000),
+        "no place name": bench(lambda: bundled.resolve("今天适合出门吗", available), 5000),
+    })
+
+    for scale in (1, 3, 10):
+        divisions = synthetic_divisions(cities=12 * scale)
+        start = time.perf_counter()
+        gazetteer = Gazetteer(divisions)
+        build_ms = (time.perf_counter() - start) * 1e3
+        names = [name for code, name in divisions if code[4:] != "00"]
+        targets = {short_name(name) for code, name in divisions if code[2:] == "0000"}
+        queries = iter([f"{n}天气" for n in names] * 10)
+        report(f"synthetic x{scale}: {len(gazetteer)} divisions, build {build_ms:.0f}ms", {
+            "resolve district": bench(lambda: gazetteer.resolve(next(queries), targets), 5000),
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""脱离图运行时推送 UI：捕获异常 vs 显式上下文检查 + sink
+
+用法: uv run python benchmarks/bench_headless_ui.py
+"""
+
+import asyncio
+
+from _common import abench, bench, report
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph.ui import push_ui_message
+
+from agent.graph import _push_ui, weather_node
+from agent.ui_sink import MemorySink
+
+PROPS = {"city": "北京", "temperature": "22°C", "condition": "晴天"}
+MESSAGE = AIMessage(id="m", content="☀️")
+
+
+def push_with_exception() -> None:
+    """改动前的做法：调用 push_ui_message 并吞掉 RuntimeError"""
+    try:
+        push_ui_message("weather", PROPS, message=MESSAGE)
+    except RuntimeError as e:
+        if "runnable context" not in str(e):
+            raise
+
+
+async def run():
+    sink = MemorySink()
+    rows = {
+        "push (raise + catch)": bench(push_with_exception, 20000),
+        "_push_ui (no sink)": bench(lambda: _push_ui("weather", PROPS, MESSAGE, {}), 20000),
+        "_push_ui (memory sink)": bench(lambda: _push_ui("weather", PROPS, MESSAGE, {"ui_sink": sink}), 20000),
+    }
+    state = {"messages": [HumanMessage(content="北京天气怎么样")], "ui": []}
+    config = {"configurable": {"ui_sink": sink}}
+    rows["weather_node (memory sink)"] = await abench(lambda: weather_node(state, config), 2000)
+    report("headless UI push", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""长尾数据源下的对冲请求效果
+
+模拟一个 95% 请求 2ms、5% 请求 200ms 的上游，比较开启 / 关闭对冲时的
+尾延迟，并报告对冲的触发率和胜出率。
+
+用法: uv run python benchmarks/bench_hedging.py
+"""
+
+import asyncio
+import random
+
+from _common import abench, report
+
+from agent.graph import WEATHER_DATA
+from agent.providers import Deadline, TableProvider, WeatherFetcher
+from agent.weather_store import WeatherTable
+
+
+class LongTailProvider:
+    """大部分请求很快、少量请求卡顿的模拟上游"""
+
+    name = "long-tail"
+
+    def __init__(self, seed: int = 0) -> None:
+        self._rng = random.Random(seed)
+        self._table = TableProvider(WeatherTable(WEATHER_DATA))
+
+    async def fetch(self, city):
+        await asyncio.sleep(0.2 if self._rng.random() < 0.05 else 0.002)
+        return await self._table.fetch(city)
+
+
+async def run() -> None:
+    rows = {}
+    for hedge in (False, True):
+        fetcher = WeatherFetcher(LongTailProvider())
+        rows[f"hedge={hedge}"] = await abench(
+            lambda: fetcher.fetch("北京", Deadline.after(1.0), hedge=hedge), 400
+        )
+        print(f"hedge={hedge}: {fetcher.stats.snapshot()}")
+    report("WeatherFetcher.fetch (5% of calls stall for 200ms)", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
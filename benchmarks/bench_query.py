@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""排名 / 范围查询：有序索引 vs 全表扫描
+
+用法: uv run python benchmarks/bench_query.py
+"""
+
+import heapq
+import random
+
+from _common import bench, report
+
+from agent.query import SortedIndex
+
+
+def main() -> None:
+    rng = random.Random(0)
+    for n in (1_000, 100_000, 1_000_000):
+        column = [rng.uniform(-20, 40) for _ in range(n)]
+        index = SortedIndex(column)
+        rows = range(n)
+        iterations = 2000 if n < 1_000_000 else 20
+        report(f"{n} records", {
+            "top-5 index": bench(lambda: index.top(5), 2000),
+            "top-5 scan (heapq)": bench(lambda: heapq.nlargest(5, rows, key=column.__getitem__), iterations),
+            "range 35..36 index": bench(lambda: index.range(35, 36), 2000),
+            "range 35..36 scan": bench(lambda: [i for i in rows if 35 <= column[i] <= 36], iterations),
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""意图预路由延迟基准
+
+用法: uv run python benchmarks/bench_router.py
+"""
+
+import asyncio
+
+from _common import abench, bench, report
+from langchain_core.messages import HumanMessage
+
+from agent.graph import WEATHER_DATA, graph, route_message, weather_node
+from agent.router import ROUTER_SCAN_CHARS, IntentRouter
+
+
+def main() -> None:
+    router = IntentRouter(w["city"] for w in WEATHER_DATA)
+    cases = {
+        "chitchat short": "你好",
+        "weather short": "北京天气怎么样？",
+        "chitchat 1KB": "随便聊聊" * 256,
+        "chitchat 5MB (bounded)": "啊" * 5_000_000,
+        "image block + text": [
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64," + "A" * 2_000_000}},
+            {"type": "text", "text": "你好"},
+        ],
+    }
+    report(
+        f"IntentRouter.classify (scan window = {ROUTER_SCAN_CHARS} chars)",
+        {name: bench(lambda c=content: router.classify(c), 2000) for name, content in cases.items()},
+    )
+
+    hello = {"messages": [HumanMessage(content="你好")], "ui": []}
+    report("route_message vs weather_node for '你好'", {
+        "route_message": bench(lambda: route_message(hello), 2000),
+        "weather_node (old path)": asyncio.run(_node_bench(hello)),
+    })
+    report("graph.ainvoke end-to-end", asyncio.run(_graph_bench()))
+
+
+async def _node_bench(state):
+    return await abench(lambda: weather_node(state), 500)
+
+
+async def _graph_bench():
+    rows = {}
+    for text in ["你好", "北京天气"]:
+        state = {"messages": [HumanMessage(content=text)], "ui": []}
+        rows[text] = await abench(lambda s=state: graph.ainvoke(s), 200)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
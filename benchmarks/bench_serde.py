@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""检查点序列化：CompactSerializer vs 默认 JsonPlusSerializer
+
+对同一线程跑 N 轮对话，取检查点中的 messages / ui 通道，比较
+序列化后的字节数与编解码耗时。
+
+用法: uv run python benchmarks/bench_serde.py
+"""
+
+import asyncio
+
+from _common import bench, report
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.graph import builder
+from agent.serde import CompactSerializer
+
+QUESTIONS = ["北京天气怎么样", "湿度呢？", "上海呢", "明天深圳天气", "哪个城市最热", "你好"]
+SERIALIZERS = {
+    "default": JsonPlusSerializer(),
+    "compact": CompactSerializer(compress_threshold=None),
+    "compact+zlib": CompactSerializer(),
+}
+
+
+async def history(turns):
+    graph = builder.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "bench"}}
+    for i in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=QUESTIONS[i % len(QUESTIONS)])]}, config)
+    return (await graph.aget_state(config)).values
+
+
+async def run():
+    for turns in (1, 10, 50):
+        values = await history(turns)
+        sizes = []
+        rows = {}
+        for channel in ("messages", "ui"):
+            for name, serde in SERIALIZERS.items():
+                blob = serde.dumps_typed(values[channel])
+                assert serde.loads_typed(blob) == values[channel]
+                sizes.append(f"{channel} {name} {len(blob[1])}B")
+                rows[f"{channel} {name} dumps"] = bench(lambda s=serde, v=values[channel]: s.dumps_typed(v), 300)
+                rows[f"{channel} {name} loads"] = bench(lambda s=serde, b=blob: s.loads_typed(b), 300)
+        report(f"{turns} turns: " + ", ".join(sizes), rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""SSE 服务器负载测试：本地客户端并发压测内置 HTTP 服务器
+
+在子进程中启动 `python -m agent.server`，然后用 asyncio 客户端以不同并发度
+发送会话运行请求，统计首个 UI 事件延迟（TTFE）、完整响应延迟、吞吐量，
+以及 503（超过 max_streams）和忙碌回复（准入控制拒绝）的数量。
+
+用法: uv run python benchmarks/bench_server.py [--requests 400] [--max-streams 256]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from _common import percentile
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+CITIES = ["北京", "上海", "深圳", "广州", "杭州"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /ok HTTP/1.1\r\n\r\n")
+            await reader.read()
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def one_run(port: int, thread: str, text: str) -> dict:
+    body = json.dumps({"input": {"messages": [{"type": "human", "content": text}]}}, ensure_ascii=False).encode()
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /threads/%s/runs/stream HTTP/1.1\r\ncontent-length: %d\r\n\r\n%s" % (thread.encode(), len(body), body)
+    )
+    await writer.drain()
+    first_ui = None
+    data = b""
+    while chunk := await reader.read(65536):
+        data += chunk
+        if first_ui is None and b"event: ui" in data:
+            first_ui = time.perf_counter() - start
+    writer.close()
+    return {
+        "status": int(data[9:12] or 0),
+        "ttfe": first_ui,
+        "total": time.perf_counter() - start,
+        "busy": b"event: ui" not in data and data.startswith(b"HTTP/1.1 200"),
+    }
+
+
+async def load(port: int, concurrency: int, requests: int) -> dict:
+    results = []
+    counter = iter(range(requests))
+
+    async def client(cid: int) -> None:
+        for n in counter:
+            results.append(await one_run(port, f"c{cid}-{n}", f"{CITIES[n % len(CITIES)]}天气怎么样"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = [r for r in results if r["status"] == 200 and not r["busy"]]
+    ttfe = [r["ttfe"] * 1000 for r in ok if r["ttfe"] is not None]
+    total = [r["total"] * 1000 for r in ok]
+    return {
+        "rps": len(results) / elapsed,
+        "ttfe_p50": percentile(ttfe, 50),
+        "ttfe_p99": percentile(ttfe, 99),
+        "p50": percentile(total, 50),
+        "p99": percentile(total, 99),
+        "503": sum(r["status"] == 503 for r in results),
+        "busy": sum(r["busy"] for r in results),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "agent.server", "--port", str(port), "--max-streams", str(args.max_streams)],
+        env={**os.environ, "PYTHONPATH": SRC},
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_ready(port)
+        await load(port, 4, 40)  # 预热
+        print(f"\n🔹 {args.requests} thread runs per level, max_streams={args.max_streams}")
+        print("-" * 72)
+        print(f"{'concurrency':>11} {'req/s':>8} {'ttfe p50':>9} {'ttfe p99':>9} {'p50 ms':>8} {'p99 ms':>8} {'503':>5} {'busy':>5}")
+        for concurrency in (1, 8, 32, 128):
+            r = await load(port, concurrency, args.requests)
+            print(
+                f"{concurrency:>11} {r['rps']:>8.0f} {r['ttfe_p50']:>9.1f} {r['ttfe_p99']:>9.1f} "
+                f"{r['p50']:>8.1f} {r['p99']:>8.1f} {r['503']:>5} {r['busy']:>5}"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--max-streams", type=int, default=256)
+    asyncio.run(run(parser.parse_args()))
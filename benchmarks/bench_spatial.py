@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""坐标最近邻索引基准：KD 树与线性扫描在不同规模下的构建与查询耗时
+
+用法: uv run python benchmarks/bench_spatial.py
+"""
+
+import math
+import random
+import time
+
+from _common import bench, report
+
+from agent.coordinates import PLACE_COORDINATES
+from agent.graph import WEATHER_DATA
+from agent.spatial import CityLocator, KDTree, haversine_km
+from agent.weather_store import WeatherTable
+
+
+def random_points(n: int, seed: int = 0) -> list[tuple[float, float]]:
+    rng = random.Random(seed)
+    return [(math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)) for _ in range(n)]
+
+
+def linear_nearest(points: list[tuple[float, float]], lat: float, lon: float) -> float:
+    return min(haversine_km(lat, lon, *p) for p in points)
+
+
+def main() -> None:
+    locator = CityLocator(WeatherTable(WEATHER_DATA), PLACE_COORDINATES)
+    report(f"bundled gazetteer ({len(locator.coordinates)} places)", {
+        "locate place without data": bench(lambda: locator.locate("东京的天气怎么样"), 5000),
+        "no place name": bench(lambda: locator.locate("今天适合出门吗"), 5000),
+    })
+
+    queries = random_points(1000, seed=1)
+    for n in (1_000, 10_000, 100_000):
+        points = random_points(n)
+        start = time.perf_counter()
+        tree = KDTree(points)
+        build_ms = (time.perf_counter() - start) * 1e3
+        it = iter(queries * 5)
+        results = {"kd-tree nearest": bench(lambda: tree.nearest(*next(it)), 5000)}
+        if n <= 10_000:
+            it = iter(queries)
+            results["linear scan"] = bench(lambda: linear_nearest(points, *next(it)), 50)
+        report(f"{n} points, build {build_ms:.0f}ms", results)
+
+
+if __name__ == "__main__":
+    main()
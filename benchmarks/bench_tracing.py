@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""追踪开销：关闭 / 全部采样 / 10% 采样时一次天气问答的端到端耗时
+
+用法: uv run python benchmarks/bench_tracing.py
+"""
+
+import asyncio
+
+from _common import abench, report
+from langchain_core.messages import HumanMessage
+
+from agent.graph import graph
+from agent.tracing import TRACER, InMemoryExporter
+
+STATE = {"messages": [HumanMessage(content="北京天气怎么样")], "ui": []}
+
+
+async def run() -> None:
+    rows = {}
+    exporter = InMemoryExporter()
+    for name, sink, rate in (("off", None, 1.0), ("sample 1.0", exporter, 1.0), ("sample 0.1", exporter, 0.1)):
+        TRACER.configure(sink, sample_rate=rate)
+        await graph.ainvoke(STATE)
+        exporter.clear()
+        rows[name] = await abench(lambda: graph.ainvoke(STATE), 300)
+    TRACER.configure(None, sample_rate=1.0)
+    report("graph.ainvoke with tracing", rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
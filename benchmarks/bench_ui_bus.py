@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""UI 事件总线扇出：观看端数量与溢出策略对图执行延迟的影响
+
+所有观看端都不读取（最坏情况的慢观看端），统计每轮 graph.ainvoke 的延迟、
+单次 publish 的耗时，以及结束时各策略的积压 / 丢弃 / 合并数。
+
+用法: uv run python benchmarks/bench_ui_bus.py
+"""
+
+import asyncio
+import sys
+
+from _common import abench, bench, report
+from langchain_core.messages import HumanMessage
+
+from agent.admission import AdmissionController
+from agent.graph import graph, ui_bus
+from agent.ui_bus import BLOCK, COALESCE, DROP_OLDEST, UIEventBus
+
+# 基准只关心扇出开销，关掉按会话限流
+sys.modules["agent.graph"]._admission = AdmissionController(rate=1e9, burst=1e9)
+
+CONFIG = {"configurable": {"thread_id": "dashboard", "ui_update_mode": "merge"}}
+
+
+async def run():
+    rows = {}
+    for viewers in (0, 100, 1000):
+        subs = [ui_bus.subscribe("dashboard", maxsize=64) for _ in range(viewers)]
+        rows[f"ainvoke, {viewers} stalled viewers"] = await abench(
+            lambda: graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []}, CONFIG), 300
+        )
+        for sub in subs:
+            sub.close()
+    report("graph.ainvoke with viewers that never read", rows)
+
+    rows = {}
+    summary = []
+    for policy in (DROP_OLDEST, COALESCE, BLOCK):
+        bus = UIEventBus(maxsize=64, policy=policy)
+        subs = [bus.subscribe("t") for _ in range(100)]
+        events = [
+            {"type": "ui", "id": f"card-{i % 8}", "name": "weather", "props": {"temperature": f"{i}°C"},
+             "metadata": {"merge": True}}
+            for i in range(1000)
+        ]
+        it = iter(events * 10)
+        rows[f"publish x100 subs, {policy}"] = bench(lambda: bus.publish("t", next(it)), 10000)
+        stats = subs[0].stats()
+        summary.append(
+            f"{policy:12} pending={stats['pending']:3} dropped={stats['dropped']:5} "
+            f"coalesced={stats['coalesced']:5} attached={len(bus)}"
+        )
+    report("UIEventBus.publish", rows)
+    print("\n".join(summary))
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
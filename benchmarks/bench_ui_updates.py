@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""长会话中 UI 推送的字节数：replace vs merge
+
+模拟一个 60 轮的会话，大部分追问同一个城市，偶尔切换单位或城市，统计
+每轮推送给前端的 UI 事件字节数、会话结束时 ui 状态的大小，以及前端会真正
+重新渲染卡片的次数（props 有变化的推送）。
+
+用法: uv run python benchmarks/bench_ui_updates.py
+"""
+
+import asyncio
+import json
+import sys
+
+import _common  # noqa: F401  (adds src/ to sys.path)
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.admission import AdmissionController
+from agent.graph import builder
+
+# 基准只关心推送字节数，关掉按会话限流
+sys.modules["agent.graph"]._admission = AdmissionController(rate=1e9, burst=1e9)
+
+TURNS = ["北京天气怎么样", "北京天气呢", "湿度呢？", "北京今天天气", "用华氏度呢", "北京天气", "上海天气", "上海呢"] * 8
+
+
+async def run(mode: str) -> dict[str, float]:
+    graph = builder.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": f"bench-{mode}", "ui_update_mode": mode}}
+    streamed = renders = 0
+    state = {}
+    seen: dict[str, dict] = {}
+    for text in TURNS:
+        async for kind, chunk in graph.astream(
+            {"messages": [HumanMessage(content=text)]}, config, stream_mode=["custom", "values"]
+        ):
+            if kind == "values":
+                state = chunk
+                continue
+            streamed += len(json.dumps(chunk, ensure_ascii=False).encode())
+            merged = {**seen.get(chunk["id"], {}), **chunk["props"]} if chunk["metadata"]["merge"] else chunk["props"]
+            renders += merged != seen.get(chunk["id"])
+            seen[chunk["id"]] = merged
+    return {
+        "bytes/turn": streamed / len(TURNS),
+        "ui state bytes": len(json.dumps(state["ui"], ensure_ascii=False).encode()),
+        "cards in state": len(state["ui"]),
+        "card renders": renders,
+    }
+
+
+def main() -> None:
+    print(f"\n🔹 {len(TURNS)} turns in one thread")
+    print("-" * 72)
+    results = {mode: asyncio.run(run(mode)) for mode in ("replace", "merge")}
+    print(f"{'metric':20} {'replace':>12} {'merge':>12}")
+    for metric in results["replace"]:
+        print(f"{metric:20} {results['replace'][metric]:>12.0f} {results['merge'][metric]:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,8 @@ from typing import Dict, Any
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from langchain_core.messages import HumanMessage
-from agent.graph import graph, AgentState, WEATHER_DATA
+from agent.graph import graph, weather_node, AgentState, WEATHER_DATA
+from agent.ui_sink import MemorySink
 
 
 def render_weather_card(ui_data: Dict[str, Any]) -> str:
@@ -53,7 +54,7 @@ def safe_render_ui(result: Dict[str, Any]) -> None:
     if result.get('ui') and len(result['ui']) > 0:
         print(render_weather_card(result['ui'][0]))
     else:
-        print("📝 注意: UI 组件需要在 LangGraph 服务器上下文中才能显示")
+        print("📝 本轮没有 UI 组件")
 
 
 def safe_get_city(result: Dict[str, Any]) -> str:
@@ -129,7 +130,7 @@ async def demo_error_handling():
     """演示错误处理 - 不支持的城市"""
     print("🔹 错误处理演示")
     print("-" * 40)
-    print("📌 当用户询问不支持的城市时，系统会提供友好的回退")
+    print("📌 当用户询问不支持的城市时，系统会回退到距离最近的有数据城市")
     
     user_message = HumanMessage(content="东京的天气怎么样？")
     state = AgentState(messages=[user_message], ui=[])
@@ -200,7 +201,26 @@ async def demo_data_structure():
         print(f"🔸 UI 组件类型: {ui_data.get('name', 'N/A')}")
         print(f"🔸 组件属性: {json.dumps(ui_data.get('props', {}), ensure_ascii=False, indent=2)}")
     else:
-        print("🔸 UI 组件: 无（需要 LangGraph 服务器上下文）")
+        print("🔸 UI 组件: 无")
+
+
+async def demo_headless_sink():
+    """演示无头模式 - 不经过图直接调用节点，UI 事件写入 sink"""
+    print("🔹 无头模式演示")
+    print("-" * 40)
+    print("📌 批处理或脚本中直接调用节点时，通过 ui_sink 配置收集 UI 事件")
+
+    sink = MemorySink()
+    config = {"configurable": {"ui_sink": sink}}
+    for user_input in ["广州天气怎么样？", "杭州天气"]:
+        state = AgentState(messages=[HumanMessage(content=user_input)], ui=[])
+        result = await weather_node(state, config)
+        print(f"👤 用户: {user_input}")
+        print(f"💬 Agent 消息: {result['messages'][-1].content}")
+
+    print(f"🔸 sink 收集到 {len(sink)} 个 UI 事件")
+    for event in sink.events:
+        print(render_weather_card(event))
 
 
 async def main():
@@ -229,6 +249,9 @@ async def main():
     
     await demo_data_structure()
     print()
+
+    await demo_headless_sink()
+    print()
     
     print("✅ 所有演示完成！")
     print("💡 提示: 要在完整的 LangGraph 环境中看到 UI 组件效果，请运行:")
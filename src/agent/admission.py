@@ -0,0 +1,224 @@
+"""Admission control in front of the weather branch and its upstream fetches.
+
+Two checks:
+
+* a token bucket per tenant (or thread) caps each client's request rate;
+  it runs before any extraction (`check_rate`);
+* a global concurrency limit caps in-flight weather requests, with a
+  bounded FIFO wait queue whose waits are capped by a timeout and the
+  run's deadline (`acquire` / `admit` within one block, `lease` across
+  graph nodes).
+
+A weather run takes one slot before extraction and keeps it through its
+panel fetches until the card is composed. Nodes cannot share an
+``async with``, so that slot is a lease with a time-to-live: the run
+releases it with `release_lease`, and a lease left behind by a cancelled
+run is reclaimed once it expires instead of leaking the slot.
+
+A request that fails either check is rejected immediately with a reason,
+so the caller can answer with a precomputed "busy" reply instead of
+queueing forever. Queue depth, in-flight count and rejections are exported
+through `agent.metrics`.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from agent.metrics import REGISTRY
+
+REGISTRY.describe("admission_in_flight", "Weather requests currently being served")
+REGISTRY.describe("admission_queue_depth", "Weather requests waiting for a concurrency slot")
+REGISTRY.describe("admission_admitted_total", "Weather requests admitted")
+REGISTRY.describe("admission_rejected_total", "Weather requests rejected, by reason")
+REGISTRY.describe("admission_leases_expired_total", "Slots reclaimed from leases that were never released")
+
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class Rejected(RuntimeError):
+    """Raised when a request is refused a concurrency slot; `reason` says why."""
+
+    def __init__(self, reason: str) -> None:
+        """Record the rejection `reason`."""
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TokenBuckets:
+    """One token bucket per key, refilled lazily on access."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_keys: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Allow `rate` requests/s per key with bursts of up to `burst`."""
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: dict[str, list[float]] = {}  # key -> [tokens, last refill]
+
+    def try_acquire(self, key: str) -> bool:
+        """Take one token from `key`'s bucket; return False if it is empty."""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                # 超出容量时淘汰最早创建的桶（相当于重新给它满额令牌）
+                del self._buckets[next(iter(self._buckets))]
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+
+class AdmissionController:
+    """Per-key rate limiting plus a global concurrency limit with a bounded queue."""
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        max_concurrent: int = 64,
+        max_queue: int = 128,
+        queue_timeout: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Configure the limits; `queue_timeout` caps how long a request may wait."""
+        self.buckets = TokenBuckets(rate, burst, clock=clock)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._clock = clock
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._leases: dict[str, float] = {}  # lease id -> 过期时间
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    def check_rate(self, key: str | None) -> str | None:
+        """Take one token from `key`'s bucket; return None, or the rejection reason."""
+        if key is not None and not self.buckets.try_acquire(key):
+            return self._reject(RATE_LIMITED)
+        return None
+
+    async def acquire(self, key: str | None, timeout: float | None = None) -> str | None:
+        """Admit one request for `key`; return None, or the rejection reason.
+
+        Requests without a key (no tenant or thread) skip the rate limit but
+        still count against the concurrency limit. `timeout` (e.g. the run's
+        remaining deadline) further caps the wait.
+        """
+        if key is not None and not self.buckets.try_acquire(key):
+            return self._reject(RATE_LIMITED)
+        if self.in_flight < self.max_concurrent:
+            self.in_flight += 1
+            self._admit()
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return self._reject(QUEUE_FULL)
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=wait)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # 已经拿到的名额交给下一个等待者
+            else:
+                waiter.cancel()
+                self._discard(waiter)
+            raise
+        if not done:
+            waiter.cancel()
+            self._discard(waiter)
+            return self._reject(QUEUE_TIMEOUT)
+        # release() 把名额直接移交给了我们，in_flight 不变
+        self._admit()
+        return None
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest live waiter."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    @asynccontextmanager
+    async def admit(self, key: str | None, timeout: float | None = None) -> AsyncIterator[str | None]:
+        """Hold a slot for the block; yields None when admitted, else the reason."""
+        rejected = await self.acquire(key, timeout)
+        try:
+            yield rejected
+        finally:
+            if rejected is None:
+                self.release()
+
+    async def lease(self, ttl: float, timeout: float | None = None) -> str:
+        """Take a slot held until `release_lease` or for at most `ttl` seconds; return its id.
+
+        Raises `Rejected` when no slot frees up within `timeout`.
+        """
+        self._reclaim()
+        rejected = await self.acquire(None, timeout)
+        if rejected is not None:
+            raise Rejected(rejected)
+        # 随机 id：从检查点恢复的旧运行不会误释放新进程里别人的名额
+        lease = uuid.uuid4().hex
+        self._leases[lease] = self._clock() + ttl
+        return lease
+
+    def release_lease(self, lease: str) -> None:
+        """Free the slot of `lease`; a lease that already expired is ignored."""
+        if self._leases.pop(lease, None) is not None:
+            self.release()
+
+    def _reclaim(self) -> None:
+        now = self._clock()
+        expired = [lease for lease, expires_at in self._leases.items() if expires_at <= now]
+        for lease in expired:
+            # 运行被取消、没有走到 compose：过期后收回名额
+            del self._leases[lease]
+            REGISTRY.inc("admission_leases_expired_total")
+            self.release()
+
+    def _admit(self) -> None:
+        REGISTRY.inc("admission_admitted_total")
+        self._publish()
+
+    def _reject(self, reason: str) -> str:
+        REGISTRY.inc("admission_rejected_total", reason=reason)
+        return reason
+
+    def _discard(self, waiter: asyncio.Future[None]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._publish()
+
+    def _publish(self) -> None:
+        REGISTRY.set("admission_in_flight", self.in_flight)
+        REGISTRY.set("admission_queue_depth", len(self._waiters))
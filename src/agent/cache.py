@@ -0,0 +1,180 @@
+"""Opt-in response cache in front of the compiled graph.
+
+A handful of normalised questions ("北京天气怎么样") dominate traffic, and
+each still pays for the Pregel loop, the reducers and the node. `CachedGraph`
+answers repeats of a stateless one-message request from an LRU keyed on
+the normalised text, the display preferences and the dataset version;
+forecast questions ("明天", "这周") also key on the local date, since their
+relative days resolve against today. A
+hit replays the stored reply text and UI payloads under fresh ids, so the
+frontend sees distinct messages and cards.
+
+Requests that depend on thread state (a ``thread_id``, or a multi-message
+input) or that expect UI events in a ``ui_sink`` bypass the cache, as do results the `cacheable` predicate rejects
+(busy replies, stale fallbacks). Entries expire after `ttl` seconds and the
+whole cache is dropped when the dataset version changes. Hits skip the
+graph entirely, including admission control and stream events, so the
+cache is for plain `ainvoke` callers.
+"""
+
+import json
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Mapping, NamedTuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from agent.forecast import parse_time_range
+from agent.matching import message_text
+from agent.metrics import REGISTRY
+from agent.tracing import current_span, traced
+
+REGISTRY.describe("response_cache_total", "Graph response cache lookups by result (hit / miss / bypass)")
+
+# 影响输出内容的配置项；截止时间、对冲、租户等不改变回答本身
+CACHE_CONFIG_KEYS = ("temperature_unit", "wind_unit", "locale")
+NORMALIZE_SCAN_CHARS = 2048
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING = "?？!！。.，,~～ "
+
+
+def normalize(content: Any) -> str:
+    """Return the cache form of a message: text only, lower-case, collapsed spaces."""
+    text = message_text(content, NORMALIZE_SCAN_CHARS)
+    return _WHITESPACE.sub(" ", text).strip().lower().rstrip(_TRAILING)
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    replies: tuple[str, ...]
+    ui: tuple[tuple[str, str, dict[str, Any]], ...]  # (name, props JSON, metadata)
+    extras: str  # other state keys, JSON
+
+
+class CachedGraph:
+    """Wrap a compiled graph with a bounded, TTL'd response cache."""
+
+    def __init__(
+        self,
+        graph: Any,
+        version: Callable[[], int],
+        maxsize: int = 1024,
+        ttl: float = 60.0,
+        cacheable: Callable[[dict[str, Any]], bool] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        today: Callable[[], date] = date.today,
+    ) -> None:
+        """Cache `graph`'s results; `version()` returns the dataset version."""
+        self.graph = graph
+        self.version = version
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cacheable = cacheable
+        self._clock = clock
+        self._today = today
+        self._entries: OrderedDict[tuple[Any, ...], _Entry] = OrderedDict()
+        self._version = version()
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else (astream, get_state...) to the graph."""
+        return getattr(self.graph, name)
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._entries.clear()
+
+    def key(self, input: Mapping[str, Any], config: Mapping[str, Any] | None) -> tuple[Any, ...] | None:
+        """Return the cache key for a request, or None if it must not be cached."""
+        configurable = (config or {}).get("configurable", {})
+        if configurable.get("thread_id") is not None or configurable.get("ui_sink") is not None:
+            # 会话状态或 UI sink 都需要真正执行图
+            return None
+        if set(input) - {"messages", "ui"} or input.get("ui"):
+            return None
+        messages = input.get("messages")
+        if not isinstance(messages, list) or len(messages) != 1:
+            return None
+        message = messages[0]
+        if not isinstance(message, BaseMessage) or message.type != "human":
+            return None
+        text = normalize(message.content)
+        prefs = tuple(configurable.get(k) for k in CACHE_CONFIG_KEYS)
+        # 相对日期按当天解析：过了零点，“明天”就不再是缓存里的那一天
+        day = self._today().isoformat() if parse_time_range(text) is not None else None
+        return (text, prefs, day, self._version)
+
+    @traced("graph.cached_invoke")
+    async def ainvoke(self, input: Mapping[str, Any], config: Mapping[str, Any] | None = None, **kwargs: Any) -> Any:
+        """Return a cached response when possible, otherwise run the graph."""
+        span = current_span()
+        version = self.version()
+        if version != self._version:
+            # 数据集重新加载后所有缓存失效
+            self._entries.clear()
+            self._version = version
+
+        key = self.key(input, config)
+        if key is None:
+            REGISTRY.inc("response_cache_total", result="bypass")
+            span.set_attributes({"cache.result": "bypass", "cache.hit": False})
+            return await self.graph.ainvoke(input, config, **kwargs)
+
+        entry = self._entries.get(key)
+        now = self._clock()
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                REGISTRY.inc("response_cache_total", result="hit")
+                span.set_attributes({"cache.result": "hit", "cache.hit": True})
+                return self._replay(input["messages"][0], entry)
+            del self._entries[key]
+
+        REGISTRY.inc("response_cache_total", result="miss")
+        span.set_attributes({"cache.result": "miss", "cache.hit": False})
+        output = await self.graph.ainvoke(input, config, **kwargs)
+        if self.version() == version and (self.cacheable is None or self.cacheable(output)):
+            self._store(key, output, now)
+        return output
+
+    def _store(self, key: tuple[Any, ...], output: dict[str, Any], now: float) -> None:
+        replies = tuple(
+            m.content for m in output.get("messages", []) if isinstance(m, AIMessage) and isinstance(m.content, str)
+        )
+        ui = tuple(
+            (
+                u["name"],
+                json.dumps(u["props"], ensure_ascii=False),
+                {k: v for k, v in u.get("metadata", {}).items() if k not in ("message_id", "run_id")},
+            )
+            for u in output.get("ui", [])
+        )
+        extras = {k: v for k, v in output.items() if k not in ("messages", "ui")}
+        self._entries[key] = _Entry(now + self.ttl, replies, ui, json.dumps(extras, ensure_ascii=False))
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _replay(self, human: BaseMessage, entry: _Entry) -> dict[str, Any]:
+        if human.id is None:
+            human = human.model_copy(update={"id": str(uuid.uuid4())})
+        replies = [AIMessage(id=str(uuid.uuid4()), content=content) for content in entry.replies]
+        # UI 组件关联到最后一条回复，与节点里 push_ui_message(message=...) 的行为一致
+        message_id = replies[-1].id if replies else None
+        ui = [
+            {
+                "type": "ui",
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "props": json.loads(props),
+                "metadata": {**metadata, **({"message_id": message_id} if message_id else {})},
+            }
+            for name, props, metadata in entry.ui
+        ]
+        return {"messages": [human, *replies], "ui": ui, **json.loads(entry.extras)}
@@ -0,0 +1,132 @@
+"""Resolved conversational context carried across turns.
+
+Instead of re-reading earlier messages, each turn stores the slots it
+resolved (city, time range, units) in ``state["context"]``. A follow-up
+such as "那明天呢？" or "湿度呢？" only looks at the latest message plus this
+record, so resolution stays O(1) in the length of the thread.
+"""
+
+from typing import Any, Mapping, NamedTuple, TypedDict
+
+from agent.forecast import TimeRange
+from agent.matching import KeywordAutomaton, keyword_table
+from agent.units import DEFAULT_UNITS
+
+FOLLOW_UP_MARKERS = ("呢", "那", "还有", "换成", "what about", "how about")
+
+ATTRIBUTE_KEYWORDS = (
+    ("humidity", ("湿度", "潮湿", "干燥", "humidity")),
+    ("windSpeed", ("风速", "风力", "刮风", "风大", "wind")),
+    ("temperature", ("温度", "气温", "多少度", "冷不冷", "热不热", "temperature")),
+)
+
+UNIT_KEYWORDS = (
+    (("temperature", "F"), ("华氏", "fahrenheit", "°f")),
+    (("temperature", "C"), ("摄氏", "celsius", "°c")),
+    (("windSpeed", "mph"), ("英里", "mph")),
+    (("windSpeed", "m/s"), ("米每秒", "米/秒", "m/s")),
+    (("windSpeed", "km/h"), ("公里每小时", "公里/小时", "km/h")),
+)
+
+_Slot = tuple[str, str]
+_automaton: KeywordAutomaton[_Slot] = KeywordAutomaton(
+    keyword_table(
+        [(FOLLOW_UP_MARKERS, ("follow_up", ""))]
+        + [(words, ("attribute", field)) for field, words in ATTRIBUTE_KEYWORDS]
+        + [(words, ("unit:" + field, unit)) for (field, unit), words in UNIT_KEYWORDS]
+    )
+)
+
+
+class TimeRangeSlot(TypedDict):
+    """Checkpoint-friendly form of `TimeRange` (plain values only)."""
+
+    start_day: int
+    days: int
+    label: str
+
+
+class CardSlot(TypedDict):
+    """The thread's current "weather" card, so later turns can update it in place."""
+
+    id: str
+    city: str
+    props: dict[str, Any]
+
+
+class ResolvedContext(TypedDict, total=False):
+    """Slots resolved so far in this thread."""
+
+    city: str
+    time_range: TimeRangeSlot | None
+    units: dict[str, str]
+    card: CardSlot
+
+
+def merge_context(left: ResolvedContext | None, right: ResolvedContext | None) -> ResolvedContext:
+    """Reducer: a turn overwrites only the slots it resolved."""
+    return {**(left or {}), **(right or {})}
+
+
+class Turn(NamedTuple):
+    """Slots resolved for the current turn."""
+
+    city: str | None
+    time_range: TimeRange | None
+    attribute: str | None
+    units: dict[str, str]
+    is_follow_up: bool
+
+
+def resolve_turn(
+    text: str,
+    context: ResolvedContext | None,
+    city: str | None,
+    time_range: TimeRange | None,
+    configured_units: Mapping[str, str] | None = None,
+) -> Turn:
+    """Fill the current turn's slots from `text`, falling back to `context`.
+
+    `city` and `time_range` are what the extractors found in `text`.
+    Units resolve as defaults < previous turn < config < words in the message.
+    """
+    context = context or {}
+    attribute: str | None = None
+    follow_up = False
+    spoken_units: dict[str, str] = {}
+    for _, _, (kind, value) in _automaton.iter_matches(text.lower()):
+        if kind == "follow_up":
+            follow_up = True
+        elif kind == "attribute":
+            attribute = attribute or value
+        else:
+            spoken_units[kind.removeprefix("unit:")] = value
+
+    units = {**DEFAULT_UNITS, **context.get("units", {}), **(configured_units or {}), **spoken_units}
+
+    previous_range = context.get("time_range")
+    if time_range is None and previous_range and follow_up and attribute is None and not spoken_units:
+        # “那上海呢？”沿用上一轮的时间范围；“湿度呢？”只问当前属性
+        time_range = TimeRange(**previous_range)
+
+    return Turn(
+        city=city or context.get("city"),
+        time_range=time_range,
+        attribute=attribute,
+        units=units,
+        is_follow_up=follow_up or (city is None and "city" in context),
+    )
+
+
+def context_update(city: str, turn: Turn) -> ResolvedContext:
+    """Return the context record to store after answering `turn` for `city`."""
+    return {
+        "city": city,
+        "time_range": turn.time_range._asdict() if turn.time_range else None,  # type: ignore[typeddict-item]
+        "units": turn.units,
+    }
+
+
+def has_context(context: ResolvedContext | None) -> bool:
+    """Return whether a previous turn resolved a city."""
+    return bool(context and context.get("city"))
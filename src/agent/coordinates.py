@@ -0,0 +1,53 @@
+"""Bundled offline gazetteer of place coordinates.
+
+Each entry is ``(name, latitude, longitude)`` in decimal degrees (WGS 84,
+rounded to two decimals). Names are the short forms users type ("东京",
+"成都"), so they can be matched directly in a message. The list covers
+every city with weather data, the provincial capitals and other major
+Chinese cities, and the largest cities abroad.
+"""
+
+PLACE_COORDINATES: tuple[tuple[str, float, float], ...] = (
+    # 有天气数据的城市
+    ("北京", 39.90, 116.41), ("上海", 31.23, 121.47), ("深圳", 22.54, 114.06),
+    ("广州", 23.13, 113.26), ("杭州", 30.27, 120.16),
+    # 直辖市、省会及主要城市
+    ("天津", 39.13, 117.20), ("重庆", 29.56, 106.55), ("石家庄", 38.04, 114.51),
+    ("唐山", 39.63, 118.18), ("保定", 38.87, 115.46), ("秦皇岛", 39.94, 119.60),
+    ("太原", 37.87, 112.55), ("呼和浩特", 40.84, 111.75), ("包头", 40.66, 109.84),
+    ("沈阳", 41.80, 123.43), ("大连", 38.91, 121.61), ("长春", 43.82, 125.32),
+    ("吉林", 43.84, 126.55), ("延吉", 42.89, 129.51), ("哈尔滨", 45.80, 126.53),
+    ("漠河", 52.97, 122.54), ("南京", 32.06, 118.80), ("无锡", 31.49, 120.31),
+    ("苏州", 31.30, 120.59), ("南通", 32.01, 120.86), ("扬州", 32.39, 119.41),
+    ("徐州", 34.26, 117.18), ("合肥", 31.82, 117.23), ("黄山", 29.71, 118.34),
+    ("福州", 26.07, 119.30), ("厦门", 24.48, 118.09), ("泉州", 24.87, 118.68),
+    ("南昌", 28.68, 115.86), ("九江", 29.71, 116.00), ("济南", 36.65, 117.12),
+    ("青岛", 36.07, 120.38), ("烟台", 37.46, 121.45), ("潍坊", 36.71, 119.16),
+    ("郑州", 34.75, 113.63), ("洛阳", 34.62, 112.45), ("武汉", 30.59, 114.31),
+    ("宜昌", 30.69, 111.29), ("长沙", 28.23, 112.94), ("张家界", 29.12, 110.48),
+    ("南宁", 22.82, 108.32), ("桂林", 25.27, 110.29), ("海口", 20.04, 110.20),
+    ("三亚", 18.25, 109.51), ("成都", 30.57, 104.07), ("贵阳", 26.65, 106.63),
+    ("昆明", 24.88, 102.83), ("大理", 25.61, 100.27), ("丽江", 26.86, 100.23),
+    ("拉萨", 29.65, 91.17), ("西安", 34.34, 108.94), ("兰州", 36.06, 103.83),
+    ("敦煌", 40.14, 94.66), ("西宁", 36.62, 101.78), ("银川", 38.49, 106.23),
+    ("乌鲁木齐", 43.83, 87.62), ("喀什", 39.47, 75.99), ("宁波", 29.87, 121.55),
+    ("温州", 28.00, 120.70), ("嘉兴", 30.75, 120.76), ("绍兴", 30.00, 120.58),
+    ("金华", 29.08, 119.65), ("珠海", 22.27, 113.58), ("汕头", 23.35, 116.68),
+    ("佛山", 23.02, 113.12), ("江门", 22.58, 113.08), ("惠州", 23.11, 114.42),
+    ("东莞", 23.02, 113.75), ("中山", 22.52, 113.39), ("香港", 22.32, 114.17),
+    ("澳门", 22.20, 113.54), ("台北", 25.03, 121.57), ("高雄", 22.63, 120.30),
+    # 亚洲
+    ("东京", 35.68, 139.69), ("大阪", 34.69, 135.50), ("京都", 35.01, 135.77),
+    ("首尔", 37.57, 126.98), ("釜山", 35.18, 129.08), ("平壤", 39.04, 125.76),
+    ("乌兰巴托", 47.89, 106.91), ("新加坡", 1.35, 103.82), ("曼谷", 13.76, 100.50),
+    ("河内", 21.03, 105.85), ("胡志明", 10.82, 106.63), ("吉隆坡", 3.14, 101.69),
+    ("雅加达", -6.21, 106.85), ("马尼拉", 14.60, 120.98), ("新德里", 28.61, 77.21),
+    ("孟买", 19.08, 72.88), ("迪拜", 25.20, 55.27),
+    # 欧洲、美洲、大洋洲、非洲
+    ("莫斯科", 55.76, 37.62), ("伦敦", 51.51, -0.13), ("巴黎", 48.86, 2.35),
+    ("柏林", 52.52, 13.40), ("罗马", 41.90, 12.50), ("马德里", 40.42, -3.70),
+    ("纽约", 40.71, -74.01), ("洛杉矶", 34.05, -118.24), ("旧金山", 37.77, -122.42),
+    ("温哥华", 49.28, -123.12), ("多伦多", 43.65, -79.38), ("圣保罗", -23.55, -46.63),
+    ("悉尼", -33.87, 151.21), ("墨尔本", -37.81, 144.96), ("开罗", 30.04, 31.24),
+    ("约翰内斯堡", -26.20, 28.05),
+)
@@ -0,0 +1,73 @@
+"""Bundled administrative divisions (GB/T 2260 codes).
+
+Each entry is ``(code, name)``. The hierarchy is implied by the code itself:
+``XX0000`` is a province-level division, ``XXYY00`` a prefecture-level city
+and ``XXYYZZ`` a district or county. Municipalities list their districts
+directly under the ``XX0000`` entry.
+"""
+
+ADMIN_DIVISIONS: tuple[tuple[str, str], ...] = (
+    # 省级行政区
+    ("110000", "北京市"), ("120000", "天津市"), ("130000", "河北省"),
+    ("140000", "山西省"), ("150000", "内蒙古自治区"), ("210000", "辽宁省"),
+    ("220000", "吉林省"), ("230000", "黑龙江省"), ("310000", "上海市"),
+    ("320000", "江苏省"), ("330000", "浙江省"), ("340000", "安徽省"),
+    ("350000", "福建省"), ("360000", "江西省"), ("370000", "山东省"),
+    ("410000", "河南省"), ("420000", "湖北省"), ("430000", "湖南省"),
+    ("440000", "广东省"), ("450000", "广西壮族自治区"), ("460000", "海南省"),
+    ("500000", "重庆市"), ("510000", "四川省"), ("520000", "贵州省"),
+    ("530000", "云南省"), ("540000", "西藏自治区"), ("610000", "陕西省"),
+    ("620000", "甘肃省"), ("630000", "青海省"), ("640000", "宁夏回族自治区"),
+    ("650000", "新疆维吾尔自治区"), ("710000", "台湾省"),
+    ("810000", "香港特别行政区"), ("820000", "澳门特别行政区"),
+    # 北京市
+    ("110101", "东城区"), ("110102", "西城区"), ("110105", "朝阳区"),
+    ("110106", "丰台区"), ("110107", "石景山区"), ("110108", "海淀区"),
+    ("110109", "门头沟区"), ("110111", "房山区"), ("110112", "通州区"),
+    ("110113", "顺义区"), ("110114", "昌平区"), ("110115", "大兴区"),
+    ("110116", "怀柔区"), ("110117", "平谷区"), ("110118", "密云区"),
+    ("110119", "延庆区"),
+    # 上海市
+    ("310101", "黄浦区"), ("310104", "徐汇区"), ("310105", "长宁区"),
+    ("310106", "静安区"), ("310107", "普陀区"), ("310109", "虹口区"),
+    ("310110", "杨浦区"), ("310112", "闵行区"), ("310113", "宝山区"),
+    ("310114", "嘉定区"), ("310115", "浦东新区"), ("310116", "金山区"),
+    ("310117", "松江区"), ("310118", "青浦区"), ("310120", "奉贤区"),
+    ("310151", "崇明区"),
+    # 广东省
+    ("440100", "广州市"), ("440103", "荔湾区"), ("440104", "越秀区"),
+    ("440105", "海珠区"), ("440106", "天河区"), ("440111", "白云区"),
+    ("440112", "黄埔区"), ("440113", "番禺区"), ("440114", "花都区"),
+    ("440115", "南沙区"), ("440117", "从化区"), ("440118", "增城区"),
+    ("440300", "深圳市"), ("440303", "罗湖区"), ("440304", "福田区"),
+    ("440305", "南山区"), ("440306", "宝安区"), ("440307", "龙岗区"),
+    ("440308", "盐田区"), ("440309", "龙华区"), ("440310", "坪山区"),
+    ("440311", "光明区"),
+    ("440400", "珠海市"), ("440500", "汕头市"), ("440600", "佛山市"),
+    ("440700", "江门市"), ("441300", "惠州市"), ("441900", "东莞市"),
+    ("442000", "中山市"),
+    # 浙江省
+    ("330100", "杭州市"), ("330102", "上城区"), ("330105", "拱墅区"),
+    ("330106", "西湖区"), ("330108", "滨江区"), ("330109", "萧山区"),
+    ("330110", "余杭区"), ("330111", "富阳区"), ("330112", "临安区"),
+    ("330113", "临平区"), ("330114", "钱塘区"), ("330122", "桐庐县"),
+    ("330127", "淳安县"), ("330182", "建德市"),
+    ("330200", "宁波市"), ("330300", "温州市"), ("330400", "嘉兴市"),
+    ("330600", "绍兴市"), ("330700", "金华市"),
+    # 其他省会及主要城市
+    ("130100", "石家庄市"), ("130200", "唐山市"), ("130600", "保定市"),
+    ("140100", "太原市"), ("150100", "呼和浩特市"), ("150200", "包头市"),
+    ("210100", "沈阳市"), ("210200", "大连市"),
+    ("220100", "长春市"), ("220102", "南关区"), ("220104", "朝阳区"),
+    ("220200", "吉林市"), ("230100", "哈尔滨市"),
+    ("320100", "南京市"), ("320200", "无锡市"), ("320500", "苏州市"),
+    ("320600", "南通市"), ("320612", "通州区"),
+    ("340100", "合肥市"), ("350100", "福州市"), ("350200", "厦门市"),
+    ("360100", "南昌市"), ("370100", "济南市"), ("370200", "青岛市"),
+    ("410100", "郑州市"), ("410300", "洛阳市"), ("420100", "武汉市"),
+    ("430100", "长沙市"), ("450100", "南宁市"), ("450300", "桂林市"),
+    ("460100", "海口市"), ("460200", "三亚市"),
+    ("510100", "成都市"), ("520100", "贵阳市"), ("530100", "昆明市"),
+    ("540100", "拉萨市"), ("610100", "西安市"), ("620100", "兰州市"),
+    ("630100", "西宁市"), ("640100", "银川市"), ("650100", "乌鲁木齐市"),
+)
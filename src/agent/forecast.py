@@ -0,0 +1,184 @@
+"""Multi-day forecast backed by columnar per-city hourly series.
+
+Each city owns one contiguous ``array('f')`` of hourly temperatures covering
+`FORECAST_DAYS` days. Daily min / max / average are computed over whole
+day-blocks at once: with NumPy the series is viewed as a ``(days, 24)``
+matrix and reduced along an axis; without it, the builtins run over
+memoryview slices so no Python-level loop touches individual readings.
+"""
+
+import math
+import re
+import zlib
+from array import array
+from datetime import date, timedelta
+from typing import Iterable, NamedTuple, TypedDict
+
+from agent.units import TEMPERATURE_UNITS, Unit, convert_values
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖，缺失时回退到 array + 内建聚合
+    np = None
+
+HOURS_PER_DAY = 24
+FORECAST_DAYS = 7
+
+_WEEKDAYS = "一二三四五六日"
+_CN_DIGITS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7}
+_CONDITION_CYCLE = ("晴天", "多云", "阴天", "小雨")
+
+# 有界、无嵌套量词的模式，避免回溯
+_NEXT_N_DAYS = re.compile(r"(?:未来|接下来|最近)([一二两三四五六七1-7])天")
+
+
+class TimeRange(NamedTuple):
+    """A window of whole days relative to today."""
+
+    start_day: int
+    days: int
+    label: str
+
+
+class ForecastDay(TypedDict):
+    """Aggregated forecast for one day."""
+
+    date: str
+    label: str
+    condition: str
+    min: float
+    max: float
+    avg: float
+
+
+class ForecastOutput(TypedDict):
+    """Props for the "forecast" UI component."""
+
+    city: str
+    unit: str
+    days: list[ForecastDay]
+    hourly: list[float]
+
+
+def parse_time_range(text: str, today: date | None = None) -> TimeRange | None:
+    """Parse a relative time expression; None means current conditions."""
+    if "大后天" in text:
+        return TimeRange(3, 1, "大后天")
+    if "后天" in text:
+        return TimeRange(2, 1, "后天")
+    if "明天" in text or "明日" in text:
+        return TimeRange(1, 1, "明天")
+
+    match = _NEXT_N_DAYS.search(text)
+    if match:
+        raw = match.group(1)
+        days = _CN_DIGITS.get(raw) or int(raw)
+        return TimeRange(0, min(days, FORECAST_DAYS), f"未来{days}天")
+
+    if "周末" in text:
+        weekday = (today or date.today()).weekday()
+        start = (5 - weekday) % 7 if weekday <= 5 else 0
+        return TimeRange(start, 2 if weekday < 6 else 1, "周末")
+    if any(k in text for k in ("这周", "本周", "一周")):
+        return TimeRange(0, FORECAST_DAYS, "本周")
+    if any(k in text for k in ("这几天", "未来几天", "最近几天")):
+        return TimeRange(0, 3, "这几天")
+    return None
+
+
+def day_label(offset: int, day: date) -> str:
+    """Return a human label for `day`, `offset` days from today."""
+    return {0: "今天", 1: "明天", 2: "后天"}.get(offset, f"周{_WEEKDAYS[day.weekday()]}")
+
+
+class ForecastStore:
+    """Hourly temperature series per city, one contiguous column each."""
+
+    def __init__(self, days: int = FORECAST_DAYS) -> None:
+        """Create an empty store holding `days` days per city."""
+        self.days = days
+        self._temperature: dict[str, array[float]] = {}
+        self._conditions: dict[str, tuple[str, ...]] = {}
+
+    def __contains__(self, city: object) -> bool:
+        """Return whether `city` has a forecast series."""
+        return city in self._temperature
+
+    def add_city(self, city: str, hourly: Iterable[float], conditions: Iterable[str]) -> None:
+        """Store `days * 24` hourly temperatures and one condition per day."""
+        series = array("f", hourly)
+        if len(series) != self.days * HOURS_PER_DAY:
+            raise ValueError(f"{city}: expected {self.days * HOURS_PER_DAY} hourly values, got {len(series)}")
+        self._temperature[city] = series
+        self._conditions[city] = tuple(conditions)
+
+    def hourly(self, city: str, day: int) -> list[float]:
+        """Return the 24 hourly temperatures (°C) of `day`."""
+        start = day * HOURS_PER_DAY
+        return self._temperature[city][start : start + HOURS_PER_DAY].tolist()
+
+    def aggregate(self, city: str, start_day: int, days: int) -> tuple[list[float], list[float], list[float]]:
+        """Return daily (min, max, avg) columns for the requested window."""
+        series = self._temperature[city]
+        end_day = min(start_day + days, self.days)
+        if np is not None:
+            block = np.frombuffer(series, dtype=np.float32).reshape(self.days, HOURS_PER_DAY)[start_day:end_day]
+            return block.min(axis=1).tolist(), block.max(axis=1).tolist(), block.mean(axis=1).tolist()
+
+        view = memoryview(series)
+        blocks = [view[d * HOURS_PER_DAY : (d + 1) * HOURS_PER_DAY] for d in range(start_day, end_day)]
+        return (
+            list(map(min, blocks)),
+            list(map(max, blocks)),
+            [math.fsum(b) / HOURS_PER_DAY for b in blocks],
+        )
+
+    def forecast(
+        self, city: str, time_range: TimeRange, today: date | None = None, unit: Unit | None = None
+    ) -> ForecastOutput:
+        """Build forecast props for `city` over `time_range`, in `unit` (default °C)."""
+        today = today or date.today()
+        unit = unit or TEMPERATURE_UNITS["C"]
+        start = min(time_range.start_day, self.days - 1)
+        mins, maxs, avgs = (convert_values(c, unit) for c in self.aggregate(city, start, time_range.days))
+        conditions = self._conditions[city]
+
+        days: list[ForecastDay] = []
+        for offset, (lo, hi, avg) in enumerate(zip(mins, maxs, avgs), start):
+            day = today + timedelta(days=offset)
+            days.append({
+                "date": day.isoformat(),
+                "label": day_label(offset, day),
+                "condition": conditions[offset],
+                "min": round(lo, 1),
+                "max": round(hi, 1),
+                "avg": round(avg, 1),
+            })
+        hourly = self.hourly(city, start) if len(days) == 1 else []
+        return {
+            "city": city,
+            "unit": unit.suffix,
+            "days": days,
+            "hourly": [round(t, 1) for t in convert_values(hourly, unit)],
+        }
+
+
+def synthetic_series(city: str, base_temperature: float, condition: str, days: int = FORECAST_DAYS) -> tuple[list[float], list[str]]:
+    """Generate a deterministic diurnal series around today's temperature.
+
+    Stands in for an upstream forecast feed: each day gets a stable offset
+    derived from the city name and a sine-shaped daily cycle peaking at 15:00.
+    """
+    seed = zlib.crc32(city.encode("utf-8"))
+    offsets = [((seed >> (d * 3)) % 7) - 3 for d in range(days)]
+    offsets[0] = 0
+    hourly = [
+        base_temperature + offsets[d] + 4.0 * math.sin(2 * math.pi * (h - 9) / HOURS_PER_DAY)
+        for d in range(days)
+        for h in range(HOURS_PER_DAY)
+    ]
+    first = _CONDITION_CYCLE.index(condition) if condition in _CONDITION_CYCLE else 0
+    conditions = [condition] + [
+        _CONDITION_CYCLE[(first + (seed >> d) % 3) % len(_CONDITION_CYCLE)] for d in range(1, days)
+    ]
+    return hourly, conditions
@@ -0,0 +1,177 @@
+"""Hierarchical administrative gazetteer (province / city / district).
+
+Division names and their short aliases ("南山区" / "南山") are compiled into a
+single `KeywordAutomaton`, so a message is scanned once no matter how many
+divisions are loaded. The hierarchy is kept in flat parallel arrays with
+parent pointers; resolution walks up from the most specific match to the
+nearest division that has weather data.
+"""
+
+from array import array
+from enum import IntEnum
+from typing import Collection, Iterable
+
+from agent.matching import KeywordAutomaton
+
+# 去掉后缀得到简称，按长度从长到短尝试
+_SUFFIXES = (
+    "特别行政区", "维吾尔自治区", "壮族自治区", "回族自治区",
+    "自治区", "自治州", "新区", "省", "市", "区", "县",
+)
+
+# 简称是常用词时容易误匹配（如“蓝天白云”），只保留全称
+_AMBIGUOUS_ALIASES = frozenset({"白云", "光明", "城区", "上城"})
+
+# 地名扫描的最大字符数，与路由的有界扫描保持一致
+GAZETTEER_SCAN_CHARS = 512
+
+
+class AdminLevel(IntEnum):
+    """Administrative level encoded by a GB/T 2260 code."""
+
+    PROVINCE = 1
+    CITY = 2
+    DISTRICT = 3
+
+
+def short_name(name: str) -> str:
+    """Strip the administrative suffix ("广州市" -> "广州") when enough remains."""
+    for suffix in _SUFFIXES:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            return name[: -len(suffix)]
+    return name
+
+
+def _level_of(code: str) -> AdminLevel:
+    if code[2:] == "0000":
+        return AdminLevel.PROVINCE
+    if code[4:] == "00":
+        return AdminLevel.CITY
+    return AdminLevel.DISTRICT
+
+
+class Gazetteer:
+    """Name index over administrative divisions with parent pointers."""
+
+    def __init__(self, divisions: Iterable[tuple[str, str]]) -> None:
+        """Build the index from ``(code, name)`` pairs."""
+        self.codes: list[str] = []
+        self.names: list[str] = []
+        self.short_names: list[str] = []
+        self.levels = array("b")
+        self.parents = array("i")
+        self._by_code: dict[str, int] = {}
+
+        for code, name in divisions:
+            self._by_code[code] = len(self.codes)
+            self.codes.append(code)
+            self.names.append(name)
+            self.short_names.append(short_name(name))
+            self.levels.append(_level_of(code))
+
+        for code, level in zip(self.codes, self.levels):
+            self.parents.append(self._parent_index(code, AdminLevel(level)))
+
+        # 省级单位的“驻地”（省会），按编码规则为 XX0100
+        self._seats = array(
+            "i",
+            (
+                self._by_code.get(code[:2] + "0100", -1) if level == AdminLevel.PROVINCE else -1
+                for code, level in zip(self.codes, self.levels)
+            ),
+        )
+
+        aliases: dict[str, list[int]] = {}
+        for idx, (name, short) in enumerate(zip(self.names, self.short_names)):
+            aliases.setdefault(name, []).append(idx)
+            if short != name and short not in _AMBIGUOUS_ALIASES:
+                aliases.setdefault(short, []).append(idx)
+        self._aliases = {alias: tuple(dict.fromkeys(ids)) for alias, ids in aliases.items()}
+        self._automaton: KeywordAutomaton[tuple[int, ...]] = KeywordAutomaton(self._aliases)
+
+    def __len__(self) -> int:
+        """Return the number of divisions in the index."""
+        return len(self.codes)
+
+    def _parent_index(self, code: str, level: AdminLevel) -> int:
+        if level == AdminLevel.PROVINCE:
+            return -1
+        if level == AdminLevel.DISTRICT:
+            city = self._by_code.get(code[:4] + "00")
+            if city is not None:
+                return city
+        return self._by_code.get(code[:2] + "0000", -1)
+
+    def ancestors(self, idx: int) -> Iterable[int]:
+        """Yield the parent chain of `idx`, nearest first."""
+        parent = self.parents[idx]
+        while parent != -1:
+            yield parent
+            parent = self.parents[parent]
+
+    def province_of(self, name: str) -> str | None:
+        """Return the short name of the province-level division containing `name`."""
+        ids = self._aliases.get(name)
+        if not ids:
+            return None
+        idx = ids[0]
+        while self.parents[idx] != -1:
+            idx = self.parents[idx]
+        return self.short_names[idx]
+
+    def nearest_with_data(self, idx: int, available: Collection[str]) -> str | None:
+        """Walk up from `idx` to the closest division whose short name has data.
+
+        A province with no data of its own resolves to its capital.
+        """
+        node = idx
+        while node != -1:
+            if self.short_names[node] in available:
+                return self.short_names[node]
+            seat = self._seats[node]
+            if seat != -1 and self.short_names[seat] in available:
+                return self.short_names[seat]
+            node = self.parents[node]
+        return None
+
+    def find(self, text: str) -> list[tuple[int, str, tuple[int, ...]]]:
+        """Return non-overlapping leftmost-longest alias matches in `text`."""
+        matches = sorted(
+            self._automaton.iter_matches(text[:GAZETTEER_SCAN_CHARS]),
+            key=lambda m: (m[0], -len(m[1])),
+        )
+        selected: list[tuple[int, str, tuple[int, ...]]] = []
+        covered_until = 0
+        for start, alias, ids in matches:
+            if start >= covered_until:
+                selected.append((start, alias, ids))
+                covered_until = start + len(alias)
+        return selected
+
+    def resolve(self, text: str, available: Collection[str]) -> str | None:
+        """Resolve the most specific place in `text` to a city with data.
+
+        Same-named divisions ("朝阳区" in Beijing and Changchun) are
+        disambiguated by containment: a candidate whose ancestor is also
+        mentioned wins. Remaining ties prefer a candidate that reaches data.
+        """
+        matches = self.find(text)
+        if not matches:
+            return None
+        mentioned = {idx for _, _, ids in matches for idx in ids}
+
+        best: tuple[tuple[int, int, int, int], str | None] | None = None
+        for order, (_, _, ids) in enumerate(matches):
+            for idx in ids:
+                resolved = self.nearest_with_data(idx, available)
+                contained = any(a in mentioned for a in self.ancestors(idx))
+                # 优先级：被上级地名包含 > 行政级别更细 > 出现更早 > 有数据
+                rank = (
+                    0 if contained else 1,
+                    -self.levels[idx],
+                    order,
+                    0 if resolved is not None else 1,
+                )
+                if best is None or rank < best[0]:
+                    best = (rank, resolved)
+        return best[1] if best else None
@@ -3,22 +3,61 @@
 Demonstrates how to create UI components from LangGraph nodes.
 """
 
-import random
-import re
+import asyncio
+import json
 import uuid
-from typing import Annotated, Sequence, TypedDict
+from typing import Annotated, Any, NotRequired, Sequence, TypedDict
 
 from langchain_core.messages import AIMessage, BaseMessage
-from langgraph.graph import StateGraph
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.types import Send
+
+from agent.admission import AdmissionController, Rejected
+from agent.cache import CachedGraph
+from agent.coordinates import PLACE_COORDINATES
+from agent.context import CardSlot, ResolvedContext, context_update, has_context, merge_context, resolve_turn
+from agent.divisions import ADMIN_DIVISIONS
+from agent.forecast import ForecastStore, parse_time_range, synthetic_series
+from agent.gazetteer import Gazetteer
+from agent.matching import message_text
+from agent.metrics import REGISTRY
+from agent.panels import (
+    AIR_QUALITY,
+    ALERTS,
+    CURRENT,
+    ERROR,
+    PANELS,
+    SUN,
+    TIMEOUT,
+    AirQualityPanel,
+    AirQualityProvider,
+    AlertPanel,
+    AlertsProvider,
+    SunPanel,
+    SunProvider,
+    merge_panels,
+)
+from agent.partitions import BundledPartitions, PartitionedWeatherStore
+from agent.prefetch import RefreshAhead
+from agent.providers import Deadline, TableProvider, WeatherFetcher
+from agent.query import RankingIndex, WeatherListOutput, describe, parse_ranking_query
+from agent.router import ROUTER_SCAN_CHARS, Intent, IntentRouter
+from agent.spatial import CityLocator, NearestCity
+from agent.tracing import TRACER, current_span, traced, traced_node
+from agent.ui_bus import UIEventBus
+from agent.ui_sink import UISink, in_runnable_context, resolve_sink, ui_event
+from agent.units import resolve_unit
+from agent.weather_store import WeatherTable, format_reading
 try:
     from langgraph.graph.ui import AnyUIMessage, push_ui_message, ui_message_reducer
 except ImportError:
     # Fallback for older versions
     AnyUIMessage = Any
-    def push_ui_message(component_name: str, props: dict, message=None):
+    def push_ui_message(component_name: str, props: dict, message=None, id=None, merge=False):
         """Fallback implementation for push_ui_message"""
-        return {"id": str(uuid.uuid4()), "name": component_name, "props": props}
+        return {"id": id or str(uuid.uuid4()), "name": component_name, "props": props}
     def ui_message_reducer(messages, new_message):
         """Fallback implementation for ui_message_reducer"""
         return messages + [new_message] if new_message else messages
@@ -33,6 +72,46 @@ class WeatherOutput(TypedDict):
     humidity: str
     windSpeed: str  # 统一使用windSpeed（与前端对齐）
     description: str
+    stale: NotRequired[bool]  # 数据源不可用时展示的是缓存 / 内置数据
+    airQuality: NotRequired[AirQualityPanel]
+    alerts: NotRequired[list[AlertPanel]]
+    sun: NotRequired[SunPanel]
+    unavailable: NotRequired[list[str]]  # 获取失败或超时而缺失的面板
+
+
+class Configuration(TypedDict, total=False):
+    """Per-run display preferences read from ``config["configurable"]``."""
+
+    temperature_unit: str  # "C" | "F"
+    wind_unit: str  # "km/h" | "m/s" | "mph"
+    locale: str  # "zh-CN" | "en-US" | "de-DE" | "fr-FR"
+    deadline: float  # 绝对截止时间（UNIX 时间戳），由上游调用方传入
+    timeout_ms: float  # 相对本次运行的时间预算
+    hedge: bool  # 慢请求超过 p95 延迟时发起第二次对冲请求
+    tenant_id: str  # 限流维度；未设置时按 thread_id 限流
+    thread_id: str  # 检查点会话 id，由 LangGraph 运行时传入
+    ui_update_mode: str  # "replace"（默认，每轮推送新卡片）| "merge"（同城市只推送变化的属性）
+    ui_sink: UISink | str  # UI 事件的额外去向：UISink 实例或 JSONL 文件路径（脱离图运行时的唯一去向）
+    panel_timeout_ms: float  # 单个面板分支的时间预算，超时只丢弃该面板
+
+
+class WeatherPlan(TypedDict):
+    """What the extract step resolved, handed to the panel branches and compose."""
+
+    city: str
+    units: dict[str, str]
+    locale: str | None
+    attribute: str | None  # 追问的单个属性（“湿度呢？”）
+    note: str  # 回复前缀，如最近城市说明
+    slot: str | None  # 本次运行占用的准入名额（lease id），compose 时释放
+    expires_at: float | None  # 运行截止时间（单调时钟）
+
+
+class PanelTask(TypedDict):
+    """Input of one `panel` branch, sent by the fan-out."""
+
+    panel: str
+    plan: WeatherPlan
 
 
 class AgentState(TypedDict):
@@ -40,9 +119,13 @@ class AgentState(TypedDict):
 
     messages: Annotated[Sequence[BaseMessage], add_messages]
     ui: Annotated[Sequence[AnyUIMessage], ui_message_reducer]
+    context: NotRequired[Annotated[ResolvedContext, merge_context]]
+    plan: NotRequired[WeatherPlan | None]  # 本轮天气回答的提取结果，compose 后清空
+    panels: NotRequired[Annotated[dict[str, Any], merge_panels]]  # 各分支的面板结果
 
 
-# Predefined weather data for different cities
+# Predefined weather data for different cities (bundled display format,
+# parsed once into the numeric `_weather_table` below)
 WEATHER_DATA = [
     {
         "city": "北京",
@@ -86,102 +169,542 @@ WEATHER_DATA = [
     }
 ]
 
+# 各城市的空气质量（AQI, 首要污染物）与生效中的预警（示例数据）
+AIR_QUALITY_DATA: dict[str, tuple[int, str | None]] = {
+    "北京": (68, "PM2.5"),
+    "上海": (45, None),
+    "深圳": (32, None),
+    "广州": (57, "O3"),
+    "杭州": (52, "PM2.5"),
+}
+WEATHER_ALERTS: dict[str, list[AlertPanel]] = {
+    "深圳": [
+        {"level": "黄色", "title": "雷电黄色预警", "description": "未来 6 小时深圳有雷阵雨，请避免在空旷地带停留。"},
+    ],
+}
+
+# 数值列式存储：温度 / 湿度 / 风速以规范单位保存，展示时再格式化
+_weather_table = WeatherTable(WEATHER_DATA)
+
+# 数值字段的有序二级索引，用于排名和范围查询（排名需要所有城市的数值，使用整表）。
+# _weather_table 始终整表常驻，排名与预报都依赖它；分区只限制单城市查询路径的内存
+_ranking_index = RankingIndex(_weather_table)
+
+# 行政区划索引：区县 / 省份解析到最近的有数据城市
+_gazetteer = Gazetteer(ADMIN_DIVISIONS)
+
+# 不属于任何省级行政区的城市（海外）归入同一分区
+OTHER_REGION = "其他"
+
+# 已加载分区的内存预算（字节，None 表示不限）；超出时淘汰最久未用的分区
+WEATHER_STORE_BUDGET_BYTES: int | None = 64 * 1024 * 1024
+
+
+def region_of(city: str) -> str:
+    """Partition key of a city: its province-level division."""
+    return _gazetteer.province_of(city) or OTHER_REGION
+
+
+# 按省份分区的单城市查询路径：分区在首次查询其中的城市时加载。
+# BundledPartitions 的记录本身仍在 WEATHER_DATA 中常驻，并不节省内存；
+# 接入全量数据时换成 JsonPartitions(目录)，并让排名与预报改用预先计算的汇总数据，
+# 而不是从全量记录构建 _weather_table
+_weather_store = PartitionedWeatherStore(
+    BundledPartitions(WEATHER_DATA, region_of), budget_bytes=WEATHER_STORE_BUDGET_BYTES
+)
+
+# 坐标索引：没有数据但能定位的地名（"东京"、"成都"）回退到距离最近的有数据城市
+_city_locator = CityLocator(_weather_store, PLACE_COORDINATES)
+
+# 每个城市一列逐小时预报数据（示例数据由当前温度生成）
+_forecast_store = ForecastStore()
+for _city, _condition, _temperature in zip(
+    _weather_table.cities, _weather_table.conditions, _weather_table.columns["temperature"]
+):
+    _forecast_store.add_city(_city, *synthetic_series(_city, _temperature, _condition))
+
+# 当前天气的数据源；替换 provider 即可接入真实的上游天气接口。
+# 数据源熔断或超时时回退到该城市最近一次的数据，再回退到内置的 WEATHER_DATA。
+_static_provider = TableProvider(_weather_store)
+_weather_fetcher = WeatherFetcher(_static_provider, fallback=_static_provider)
+
+# 热门城市的提前刷新（可选）：enable_refresh_ahead() 之后实时天气先查新鲜读数缓存，
+# 后台循环在缓存过期前刷新请求最多的城市
+_refresh_ahead: RefreshAhead | None = None
+
+
+def enable_refresh_ahead(**options: Any) -> RefreshAhead:
+    """Serve current conditions through a `RefreshAhead` cache; call ``start()`` on the result.
+
+    `options` are passed to `RefreshAhead`; the cache follows the dataset version.
+    """
+    global _refresh_ahead
+    _refresh_ahead = RefreshAhead(_weather_fetcher, version=lambda: _weather_store.version, **options)
+    return _refresh_ahead
+
+
+# 天气卡片的其余面板：空气质量、预警（内置数据）与日出日落（按坐标计算）
+_panel_providers: dict[str, Any] = {
+    AIR_QUALITY: AirQualityProvider(AIR_QUALITY_DATA),
+    ALERTS: AlertsProvider(WEATHER_ALERTS),
+    SUN: SunProvider(_city_locator.coordinates),
+}
+
+# 面板分支在运行截止时间之外的单独预算；超时的分支只丢弃自己的面板
+PANEL_TIMEOUT_MS = 1000.0
+
+# 按租户 / 会话限流，并限制同时进行的天气请求数；超限都直接返回预先生成的忙碌回复
+_admission = AdmissionController()
+# 名额租约在面板预算之外的余量（秒），覆盖提取与 compose；被取消的运行在租约过期后归还名额
+SLOT_LEASE_GRACE = 2.0
+BUSY_REPLY = "⏳ 当前查询的人有点多，请稍后再试。"
+
+# 进程内 UI 事件总线：按 thread_id 把卡片镜像给看板等多个观看端，慢观看端不会阻塞图执行
+ui_bus = UIEventBus()
+
+
+# 追问单个属性时的回答模板
+ATTRIBUTE_ANSWERS = {
+    "temperature": ("🌡️", "温度"),
+    "humidity": ("💧", "湿度"),
+    "windSpeed": ("💨", "风速"),
+}
+
+# 展示缓存数据时附加的提示
+STALE_NOTE = "（天气数据源暂时不可用，以上为最近一次的数据）"
+
+# 实时天气分支失败时的卡片占位与回复
+PLACEHOLDER = "—"
+CURRENT_UNAVAILABLE = "⚠️ 暂时无法获取{city}的实时天气，请稍后再试。"
+
+# 面板名 -> 卡片属性名（与前端对齐）
+PANEL_PROPS = {AIR_QUALITY: "airQuality", ALERTS: "alerts", SUN: "sun"}
+
+# 未指定城市时的默认城市；没有它的数据时取离它最近的城市
+DEFAULT_CITY = "北京"
+
+
+def nearest_note(nearest: NearestCity) -> str:
+    """Explain that the answer is for the nearest city with data."""
+    return f"📍 暂无{nearest.place}的天气数据，以下是距离最近的{nearest.city}（约 {nearest.distance_km:,.0f} 公里）：\n"
+
+
+# 城市提取只扫描消息开头的有界窗口，任何输入下都是线性时间
+EXTRACTION_SCAN_CHARS = 2048
+
+
+def extract_city_from_message(message_content: str) -> str | None:
+    """从用户消息中提取城市名称 - 线性时间版本"""
+    text = message_content[:EXTRACTION_SCAN_CHARS]
+
+    # 第一层: 自动机单次扫描，返回最先出现的支持城市
+    with TRACER.span("extract.tier", tier="automaton") as span:
+        match = _weather_store.city_matcher.first_match(text)
+        span.set_attributes({"hit": match is not None, "city": match and match[2]})
+    if match:
+        return match[2]
+
+    # 原先的正则层只会返回正则捕获内容中包含的支持城市，而捕获内容是消息的子串，
+    # 第一层已经覆盖；去掉惰性 (.+?) 模式可避免长输入上的超线性回溯。
+
+    # 第二层: 行政区划层级解析 ("南山区天气" -> 深圳, "浙江天气" -> 杭州)
+    with TRACER.span("extract.tier", tier="gazetteer") as span:
+        city = _gazetteer.resolve(text, _weather_store.city_set)
+        span.set_attributes({"hit": city is not None, "city": city})
+    return city
+
+
+@traced("weather_node")
+async def weather_node(state: AgentState, config: RunnableConfig | None = None) -> dict[str, Any]:
+    """Answer a weather turn in one call: extract, fetch every panel concurrently, compose.
+
+    The compiled graph runs the same steps as separate nodes (``weather`` ->
+    one ``panel`` branch per data set -> ``compose``); this entry point serves
+    callers outside the graph and `query_node`'s hand-off.
+    """
+    update = await extract_node(state, config)
+    plan = update.get("plan")
+    if plan is None:
+        return {k: v for k, v in update.items() if k != "plan"}
+
+    branches = await asyncio.gather(*(_direct_panel(p, plan, config) for p in PANELS))
+    context = merge_context(state.get("context"), update["context"])
+    panels = {panel: value for branch in branches for panel, value in branch["panels"].items()}
+    composed = await compose_node({**state, "context": context, "plan": plan, "panels": panels}, config)
+    return {"messages": composed["messages"], "context": merge_context(update["context"], composed.get("context"))}
+
+
+async def _direct_panel(panel: str, plan: WeatherPlan, config: RunnableConfig | None) -> dict[str, Any]:
+    # 图中每个分支有自己的节点 span；直接调用时补上同名的 span
+    with TRACER.span("node.panel"):
+        return await panel_node(PanelTask(panel=panel, plan=plan), config)
+
+
+async def extract_node(state: AgentState, config: RunnableConfig | None = None) -> dict[str, Any]:
+    """Extract step of the weather branch: rate limiting, slot resolution and city selection.
+
+    Busy replies and forecasts are answered here; otherwise the returned
+    ``plan`` is fanned out to the panel branches by `fan_out`. The run holds
+    one admission slot from here until `compose_node`.
+    """
+    configurable: Configuration = (config or {}).get("configurable", {})  # type: ignore[assignment]
+    deadline = Deadline.from_config(configurable)
+
+    # The per-tenant rate limit runs before any extraction or fetching
+    tenant = configurable.get("tenant_id") or configurable.get("thread_id")
+    if _admission.check_rate(tenant) is not None:
+        return {"messages": [AIMessage(id=str(uuid.uuid4()), content=BUSY_REPLY)], "plan": None}
+
+    # One concurrency slot per run, taken before extraction and released by compose
+    ttl = configurable.get("panel_timeout_ms", PANEL_TIMEOUT_MS) / 1000 + SLOT_LEASE_GRACE
+    try:
+        slot = await _admission.lease(ttl, deadline.remaining())
+    except Rejected:
+        return {"messages": [AIMessage(id=str(uuid.uuid4()), content=BUSY_REPLY)], "plan": None}
+    try:
+        update = _extract(state, configurable, deadline)
+    except BaseException:
+        _admission.release_lease(slot)
+        raise
+    if update["plan"] is None:
+        _admission.release_lease(slot)  # 预报等在提取阶段已经回答
+    else:
+        update["plan"]["slot"] = slot
+    return update
+
+
+def _extract(state: AgentState, configurable: Configuration, deadline: Deadline) -> dict[str, Any]:
+    """Resolve the turn and pick the city; answer forecasts directly."""
+    configured_units = {
+        field: configurable[key]  # type: ignore[literal-required]
+        for field, key in (("temperature", "temperature_unit"), ("windSpeed", "wind_unit"))
+        if key in configurable
+    }
 
-def extract_city_from_message(message_content: str) -> str:
-    """从用户消息中提取城市名称 - 优化版本"""
-    # 动态获取支持的城市列表
-    available_cities = {w["city"] for w in WEATHER_DATA}
-    
-    # 第一层: 直接匹配城市名称 - 按位置排序 (最快)
-    city_positions = []
-    for city in available_cities:
-        pos = message_content.find(city)
-        if pos != -1:
-            city_positions.append((pos, city))
-    
-    if city_positions:
-        # 返回最先出现的城市
-        city_positions.sort(key=lambda x: x[0])
-        return city_positions[0][1]
-    
-    # 第二层: 基本正则模式匹配 (核心场景覆盖)
-    basic_patterns = [
-        r"(?:查询|查看|了解)(.+?)(?:的)?(?:天气|温度)",     # "查询北京的天气"
-        r"(.+?)(?:的)?(?:天气|温度)(?:如何|怎么样)",        # "北京的天气如何"
-        r"(.+?)(?:天气|温度)"                             # "北京天气"
-    ]
-    
-    for pattern in basic_patterns:
-        match = re.search(pattern, message_content)
-        if match:
-            potential_city = match.group(1).strip()
-            # 检查提取的城市是否在支持列表中
-            for city in available_cities:
-                if city in potential_city:
-                    return city
-    
-    return None
-
-
-async def weather_node(state: AgentState) -> dict[str, list[AIMessage]]:
-    """Weather node that generates UI components with complete weather data."""
     # Extract city from the last user message
     last_message = state["messages"][-1] if state["messages"] else None
     user_input = last_message.content if last_message else ""
 
-    # Ensure user_input is a string for processing
-    if isinstance(user_input, list):
-        user_input = " ".join(str(item) for item in user_input)
-    user_input = str(user_input)
+    # Only text blocks are scanned, and only a bounded window of them
+    user_input = message_text(user_input, EXTRACTION_SCAN_CHARS)
 
-    # Enhanced city extraction using the optimized function
-    requested_city = extract_city_from_message(user_input)
+    # A place without data but with known coordinates ("东京天气") stands in
+    # for the nearest city that has data
+    mentioned = extract_city_from_message(user_input)
+    nearby = None
+    if not mentioned:
+        # 第三层: 坐标最近的有数据城市
+        with TRACER.span("extract.tier", tier="nearest") as span:
+            nearby = _city_locator.locate(user_input)
+            span.set_attributes({"hit": nearby is not None, "city": nearby and nearby.city})
+
+    # Resolve this turn's slots; follow-ups fall back to the stored context
+    turn = resolve_turn(
+        user_input,
+        state.get("context"),
+        mentioned or (nearby.city if nearby else None),
+        parse_time_range(user_input),
+        configured_units,
+    )
+    requested_city, time_range, units = turn.city, turn.time_range, turn.units
 
     # Select weather data
-    if requested_city:
-        # User specified a city, find matching data
-        weather_data = next((w for w in WEATHER_DATA if w["city"] == requested_city), None)
-        if not weather_data:
-            # City not found, use random data
-            weather_data = random.choice(WEATHER_DATA)
+    if requested_city and requested_city in _weather_store:
+        city = requested_city
     else:
-        # No city specified, use default (Beijing)
-        weather_data = next((w for w in WEATHER_DATA if w["city"] == "北京"), random.choice(WEATHER_DATA))
-
-    # Create complete weather output
-    weather_output: WeatherOutput = {
-        "city": weather_data["city"],
-        "temperature": weather_data["temperature"],
-        "condition": weather_data["condition"],
-        "humidity": weather_data["humidity"],
-        "windSpeed": weather_data["windSpeed"],
-        "description": weather_data["description"]
-    }
+        # No city specified (default to Beijing), or the context's city is no
+        # longer in the table: use the nearest city that has data
+        fallback = _city_locator.nearest_to(requested_city or DEFAULT_CITY)
+        city = fallback.city if fallback else _weather_store.cities[0]
+    note = nearest_note(nearby) if nearby and nearby.city == city else ""
+
+    resolved_context = context_update(city, turn)
+    current_span().set_attributes({"city": city, "follow_up": turn.is_follow_up})
+
+    # Forecast requests ("明天北京天气", "这周上海温度") get the forecast card
+    if time_range and city in _forecast_store:
+        forecast = _forecast_store.forecast(city, time_range, unit=resolve_unit("temperature", units["temperature"]))
+        lows = [d["min"] for d in forecast["days"]]
+        highs = [d["max"] for d in forecast["days"]]
+        conditions = "、".join(dict.fromkeys(d["condition"] for d in forecast["days"]))
+        message = AIMessage(
+            id=str(uuid.uuid4()),
+            content=f"{note}📅 {city}{time_range.label}：{conditions}，{min(lows):.0f}~{max(highs):.0f}{forecast['unit']}",
+        )
+        _push_ui("forecast", dict(forecast), message, configurable)
+        return {"messages": [message], "context": resolved_context, "plan": None}
+
+    if _refresh_ahead is not None:
+        _refresh_ahead.record(city)
+    plan = WeatherPlan(
+        city=city,
+        units=units,
+        locale=configurable.get("locale"),
+        attribute=turn.attribute if turn.is_follow_up else None,
+        note=note,
+        slot=None,
+        expires_at=deadline.expires_at,
+    )
+    return {"context": resolved_context, "plan": plan, "panels": None}
+
+
+def fan_out(state: AgentState) -> list[Send] | str:
+    """Send the plan to one `panel` branch per data set, or end an answered turn."""
+    plan = state.get("plan")
+    if plan is None:
+        return END
+    return [Send("panel", PanelTask(panel=panel, plan=plan)) for panel in PANELS]
+
+
+async def panel_node(state: PanelTask, config: RunnableConfig | None = None) -> dict[str, Any]:
+    """Fetch one panel of the weather card; a failure or timeout drops only this panel."""
+    configurable: Configuration = (config or {}).get("configurable", {})  # type: ignore[assignment]
+    panel, plan = state["panel"], state["plan"]
+    budget = configurable.get("panel_timeout_ms", PANEL_TIMEOUT_MS) / 1000
+    remaining = Deadline(plan["expires_at"]).remaining()
+    deadline = Deadline.after(budget if remaining is None else min(budget, remaining))
+    hedge = configurable.get("hedge", False)
+    try:
+        if panel == CURRENT:
+            # 实时天气把预算作为截止时间交给 fetcher：超时计入熔断器，并回退到缓存 / 内置数据，
+            # 从外部取消会跳过这些处理
+            value = await _fetch_panel(panel, plan, hedge, deadline)
+        else:
+            value = await asyncio.wait_for(_fetch_panel(panel, plan, hedge, deadline), deadline.remaining())
+    except TimeoutError:
+        value, reason = None, TIMEOUT
+    except Exception:
+        value, reason = None, ERROR
+    span = current_span()
+    span.set_attributes({"panel": panel, "city": plan["city"]})
+    if value is None:
+        REGISTRY.inc("weather_panel_degraded_total", panel=panel, reason=reason)
+        span.set_attribute("degraded", reason)
+    return {"panels": {panel: value}}
+
+
+async def _fetch_panel(panel: str, plan: WeatherPlan, hedge: bool, deadline: Deadline) -> Any:
+    city = plan["city"]
+    if panel != CURRENT:
+        with TRACER.span("provider.fetch", provider=panel, city=city):
+            return await _panel_providers[panel].fetch(city)
+
+    # Fetch within the branch deadline (hedged if requested); falls back to stale data.
+    # With refresh-ahead enabled, fresh cached readings are served first
+    fetcher = _weather_fetcher if _refresh_ahead is None else _refresh_ahead
+    fetched = await fetcher.fetch_with_fallback(city, deadline, hedge=hedge)
+
+    # Numbers are formatted only here, at the UI edge
+    weather_output: WeatherOutput = format_reading(fetched.reading, plan["units"], plan["locale"])  # type: ignore[assignment]
+    if fetched.stale:
+        weather_output["stale"] = True
+    return weather_output
+
+
+async def compose_node(state: AgentState, config: RunnableConfig | None = None) -> dict[str, Any]:
+    """Join the panel branches into one composite weather card and reply."""
+    configurable: Configuration = (config or {}).get("configurable", {})  # type: ignore[assignment]
+    plan = state["plan"]
+    assert plan is not None
+    if plan.get("slot") is not None:
+        # 各面板已经取回，之后只剩组装卡片：归还本次运行的准入名额
+        _admission.release_lease(plan["slot"])  # type: ignore[arg-type]
+    panels = state.get("panels") or {}
+    city = plan["city"]
+
+    current: WeatherOutput | None = panels.get(CURRENT)
+    if current is None:
+        weather_output: WeatherOutput = {
+            "city": city,
+            "temperature": PLACEHOLDER,
+            "condition": PLACEHOLDER,
+            "humidity": PLACEHOLDER,
+            "windSpeed": PLACEHOLDER,
+            "description": CURRENT_UNAVAILABLE.format(city=city),
+        }
+    else:
+        weather_output = dict(current)  # type: ignore[assignment]
+    for panel, prop in PANEL_PROPS.items():
+        if panels.get(panel) is not None:
+            weather_output[prop] = panels[panel]  # type: ignore[literal-required]
+    unavailable = [panel for panel in PANELS if panels.get(panel) is None]
+    if unavailable:
+        weather_output["unavailable"] = unavailable
 
     # Create meaningful AI message with actual weather information
-    weather_icon = {"晴天": "☀️", "多云": "⛅", "阴天": "☁️", "小雨": "🌧️"}.get(weather_data["condition"], "🌤️")
-    message_content = f"{weather_icon} {weather_data['description']}"
+    attribute = plan["attribute"]
+    if current is None:
+        message_content = weather_output["description"]
+    elif attribute:
+        # “湿度呢？”这类追问直接回答被问到的属性
+        icon, label = ATTRIBUTE_ANSWERS[attribute]
+        message_content = f"{icon} {city}当前{label}：{weather_output[attribute]}"  # type: ignore[literal-required]
+    else:
+        weather_icon = {"晴天": "☀️", "多云": "⛅", "阴天": "☁️", "小雨": "🌧️"}.get(weather_output["condition"], "🌤️")
+        message_content = f"{weather_icon} {weather_output['description']}"
+        for alert in weather_output.get("alerts", []):
+            message_content += f"\n⚠️ {alert['title']}"
+
+    if current is not None and current.get("stale"):
+        message_content += STALE_NOTE
+    message_content = plan["note"] + message_content
 
     message = AIMessage(
         id=str(uuid.uuid4()), 
         content=message_content
     )
 
-    # Emit complete weather data to UI component (仅在 LangGraph 上下文中)
-    try:
-        push_ui_message("weather", dict(weather_output), message=message)
-    except RuntimeError as e:
-        # 在测试或非 LangGraph 上下文中运行时，跳过 UI 消息推送
-        if "runnable context" not in str(e):
-            raise
+    # Emit weather data to the UI component; in merge mode a repeat question
+    # about the same city updates the existing card with only the changed props
+    props = dict(weather_output)
+    update: dict[str, Any] = {"messages": [message], "plan": None, "panels": None}
+    if configurable.get("ui_update_mode") == "merge":
+        card = (state.get("context") or {}).get("card")
+        if card and card["city"] == city:
+            delta = props_delta(card["props"], props)
+            if delta:
+                # 属性都没有变化时卡片保持原样，不推送空的增量
+                _push_ui("weather", delta, message, configurable, id=card["id"], merge=True)
+            card_id = card["id"]
+        else:
+            card_id = str(uuid.uuid4())
+            _push_ui("weather", props, message, configurable, id=card_id)
+        update["context"] = {"card": CardSlot(id=card_id, city=city, props=props)}
+    else:
+        _push_ui("weather", props, message, configurable)
+
+    return update
+
 
+async def query_node(state: AgentState, config: RunnableConfig | None = None) -> dict[str, Any]:
+    """Answer ranking / filter questions with a comparison list component."""
+    configurable: Configuration = (config or {}).get("configurable", {})  # type: ignore[assignment]
+    last_message = state["messages"][-1] if state["messages"] else None
+    content = last_message.content if last_message else ""
+    query = parse_ranking_query(message_text(content, ROUTER_SCAN_CHARS))
+    if query is None:
+        # 命中了信号词但不是排名问题（如“北京最高温度”），交回常规分支
+        follow_up = has_context(state.get("context"))
+        if _intent_router.classify(content, allow_query=False, follow_up=follow_up) == "weather":
+            return await weather_node(state, config)
+        return await chitchat_node(state)
+
+    unit_pref = {"temperature": configurable.get("temperature_unit"), "windSpeed": configurable.get("wind_unit")}
+    unit = resolve_unit(query.field, unit_pref.get(query.field))
+    rows = _ranking_index.run(query, unit)
+    current_span().set_attributes({"query.field": query.field, "rows": len(rows)})
+    values = _weather_table.column(query.field, unit_pref.get(query.field))
+    displays = _weather_table.formatted(query.field, unit_pref.get(query.field), configurable.get("locale"))
+
+    title = describe(query, unit)
+    output: WeatherListOutput = {
+        "title": title,
+        "metric": query.field,
+        "unit": unit.suffix,
+        "items": [
+            {
+                "city": _weather_table.cities[i],
+                "value": round(values[i], 1),
+                "display": displays[i],
+                "condition": _weather_table.conditions[i],
+            }
+            for i in rows
+        ],
+    }
+    if output["items"]:
+        summary = "、".join(f"{item['city']} {item['display']}" for item in output["items"][:5])
+        content_text = f"🏆 {title}：{summary}"
+    else:
+        content_text = f"🔍 没有找到{title}"
+    message = AIMessage(id=str(uuid.uuid4()), content=content_text)
+    _push_ui("weather_list", dict(output), message, configurable)
     return {"messages": [message]}
 
 
-# Define the graph
-graph = (
+def props_delta(previous: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    """Return the props that changed; props that disappeared are sent as None."""
+    delta = {k: v for k, v in current.items() if previous.get(k) != v}
+    delta.update((k, None) for k in previous.keys() - current.keys())
+    return delta
+
+
+def _push_ui(
+    name: str,
+    props: dict[str, Any],
+    message: AIMessage,
+    configurable: Configuration,
+    id: str | None = None,
+    merge: bool = False,
+) -> None:
+    """Push a UI component to the run's stream and state, the configured sink and the bus."""
+    sink = resolve_sink(configurable.get("ui_sink"))
+    topic = configurable.get("thread_id")
+    event: dict[str, Any]
+    if in_runnable_context():
+        event = push_ui_message(name, props, message=message, id=id, merge=merge)  # type: ignore[assignment]
+    elif sink is not None or ui_bus.has_subscribers(topic):
+        # 脱离 LangGraph 运行（批处理、脚本、测试）时直接构造事件，无需触发异常
+        event = ui_event(name, props, id=id, message_id=message.id, merge=merge)
+    else:
+        return
+    span = current_span()
+    if span.recording:
+        span.set_attributes({"ui.component": name, "ui.payload_bytes": len(json.dumps(props, ensure_ascii=False).encode())})
+    if sink is not None:
+        sink.emit(event)
+    if ui_bus.has_subscribers(topic):
+        ui_bus.publish(topic, event)
+
+
+_intent_router = IntentRouter(_weather_store.cities)
+
+# 非天气消息的固定回复，预先生成以保持闲聊分支足够轻量
+CHITCHAT_REPLY = (
+    "👋 你好！我是天气助手，可以查询"
+    + "、".join(w["city"] for w in WEATHER_DATA)
+    + "的天气。试试问我“北京天气怎么样？”"
+)
+
+
+def route_message(state: AgentState) -> Intent:
+    """Route the latest message to the weather, query or chitchat branch."""
+    last_message = state["messages"][-1] if state["messages"] else None
+    return _intent_router.classify(
+        last_message.content if last_message else "",
+        follow_up=has_context(state.get("context")),
+    )
+
+
+async def chitchat_node(state: AgentState) -> dict[str, list[AIMessage]]:
+    """Lightweight reply for non-weather turns; no extraction and no UI."""
+    return {"messages": [AIMessage(id=str(uuid.uuid4()), content=CHITCHAT_REPLY)]}
+
+
+# Define the graph: the weather branch extracts once, fetches every panel in
+# parallel (one `Send` per data set) and joins them in `compose`
+builder = (
     StateGraph(AgentState)
-    .add_node("weather", weather_node)
-    .add_edge("__start__", "weather")
-    .compile()
+    .add_node("weather", traced_node(extract_node))
+    .add_node("panel", traced_node(panel_node))
+    .add_node("compose", traced_node(compose_node))
+    .add_node("chitchat", chitchat_node)
+    .add_node("query", traced_node(query_node))
+    .add_conditional_edges("__start__", route_message, ["weather", "chitchat", "query"])
+    .add_conditional_edges("weather", fan_out, ["panel", END])
+    .add_edge("panel", "compose")
+)
+graph = builder.compile()
+
+
+def _cacheable(output: dict[str, Any]) -> bool:
+    """Do not cache busy replies or answers served from stale fallback data or missing panels."""
+    messages = output.get("messages") or []
+    if messages and messages[-1].content == BUSY_REPLY:
+        return False
+    return not any(u["props"].get("stale") or u["props"].get("unavailable") for u in output.get("ui", []))
+
+
+# 可选的响应缓存：热门的无状态问题直接返回缓存结果，不经过图执行
+cached_graph = CachedGraph(
+    graph, version=lambda: _weather_table.version + _weather_store.version, cacheable=_cacheable
 )
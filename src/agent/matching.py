@@ -0,0 +1,131 @@
+"""Linear-time keyword matching shared by the router and the extractors.
+
+`KeywordAutomaton` is a small Aho-Corasick automaton: it is compiled once at
+import time and then scans a message in a single pass, independent of how
+many keywords it holds.
+"""
+
+from collections import deque
+from typing import Any, Generic, Iterable, Iterator, Mapping, TypeVar
+
+V = TypeVar("V")
+
+
+class KeywordAutomaton(Generic[V]):
+    """Aho-Corasick automaton mapping keywords to payload values."""
+
+    __slots__ = ("_goto", "_fail", "_out", "max_len")
+
+    def __init__(self, keywords: Mapping[str, V]) -> None:
+        """Compile the automaton for `keywords` (keyword -> payload)."""
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[tuple[str, V]]] = [[]]
+        self.max_len = 0
+
+        for keyword, value in keywords.items():
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append((keyword, value))
+            self.max_len = max(self.max_len, len(keyword))
+
+        # 广度优先构建失败指针，并把后缀状态的输出合并进来
+        fail = [0] * len(goto)
+        queue: deque[int] = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch) != nxt else 0
+                out[nxt].extend(out[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        # 冻结为元组，扫描时不再分配
+        self._out: list[tuple[tuple[str, V], ...]] = [tuple(o) for o in out]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, str, V]]:
+        """Yield `(start, keyword, value)` for every occurrence, in end order."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword, value in out[state]:
+                yield end - len(keyword), keyword, value
+
+    def first_match(self, text: str) -> tuple[int, str, V] | None:
+        """Return the leftmost (then longest) match, or None.
+
+        Scanning stops `max_len` characters after the first hit, since no
+        later-ending keyword can start before it.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        best: tuple[int, str, V] | None = None
+        state = 0
+        for end, ch in enumerate(text, 1):
+            if best is not None and end - self.max_len > best[0]:
+                break
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword, value in out[state]:
+                start = end - len(keyword)
+                if (
+                    best is None
+                    or start < best[0]
+                    or (start == best[0] and len(keyword) > len(best[1]))
+                ):
+                    best = (start, keyword, value)
+        return best
+
+    def contains_any(self, text: str) -> bool:
+        """Return True as soon as any keyword occurs in `text`."""
+        for _ in self.iter_matches(text):
+            return True
+        return False
+
+
+def message_text(content: Any, limit: int) -> str:
+    """Return at most `limit` characters of text from message `content`.
+
+    Only plain strings and ``{"type": "text"}`` blocks contribute; image and
+    other binary blocks are skipped without being stringified.
+    """
+    if isinstance(content, str):
+        return content[:limit]
+    if not isinstance(content, list):
+        return str(content)[:limit]
+
+    parts: list[str] = []
+    remaining = limit
+    for block in content:
+        if remaining <= 0:
+            break
+        if isinstance(block, str):
+            text = block
+        elif isinstance(block, dict) and block.get("type") == "text":
+            text = str(block.get("text", ""))
+        else:
+            continue
+        text = text[:remaining]
+        parts.append(text)
+        remaining -= len(text) + 1
+    return " ".join(parts)[:limit]
+
+
+def keyword_table(groups: Iterable[tuple[Iterable[str], V]]) -> dict[str, V]:
+    """Flatten `(keywords, value)` groups into a keyword -> value mapping."""
+    return {keyword: value for keywords, value in groups for keyword in keywords}
@@ -0,0 +1,75 @@
+"""Process-wide counters and gauges with Prometheus text export.
+
+Metrics are keyed by name plus a sorted tuple of label pairs, so recording
+is one dict update. `render()` produces the Prometheus exposition format
+for scraping; `snapshot()` returns plain values for tests and logs.
+"""
+
+from typing import Iterator
+
+_Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class MetricsRegistry:
+    """Counters (monotonic) and gauges (last value) with string labels."""
+
+    def __init__(self) -> None:
+        """Start with no series."""
+        self._counters: dict[_Key, float] = {}
+        self._gauges: dict[_Key, float] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        """Attach a HELP line to metric `name`."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add `value` to a counter series."""
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge series."""
+        self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def get(self, name: str, **labels: str) -> float:
+        """Return one series' value (0 if never recorded)."""
+        key = (name, tuple(sorted(labels.items())))
+        return self._counters.get(key, self._gauges.get(key, 0))
+
+    def snapshot(self) -> dict[str, float]:
+        """Return every series as ``name{label="value"}`` -> value."""
+        return {_series(name, labels): value for (name, labels), value in self._items()}
+
+    def render(self) -> str:
+        """Return all series in the Prometheus text exposition format."""
+        lines = []
+        for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+            names = sorted({name for name, _ in series})
+            for name in names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (n, labels), value in sorted(series.items()):
+                    if n == name:
+                        lines.append(f"{_series(n, labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every series (used by tests)."""
+        self._counters.clear()
+        self._gauges.clear()
+
+    def _items(self) -> Iterator[tuple[_Key, float]]:
+        yield from self._counters.items()
+        yield from self._gauges.items()
+
+
+def _series(name: str, labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+# 全局指标注册表
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,167 @@
+"""Local providers for the weather card's supplementary panels.
+
+A weather answer is assembled from independent data sets: current
+conditions (from `WeatherFetcher`), air quality, active alerts and
+sunrise / sunset. The graph fetches them in parallel branches, one per
+panel, and a branch that fails or runs out of time only drops its own panel.
+
+The providers here are offline: air quality and alerts are served from
+bundled tables, sunrise and sunset are computed from the city's
+coordinates with the NOAA sunrise equation.
+"""
+
+import math
+from datetime import UTC, date, datetime, timedelta, timezone
+from typing import Any, Mapping, NamedTuple, NotRequired, Sequence, TypedDict
+
+from agent.metrics import REGISTRY
+
+REGISTRY.describe("weather_panel_degraded_total", "Weather card panels dropped, by panel and reason")
+
+# 面板名称，同时是并行分支的标识
+CURRENT = "current"
+AIR_QUALITY = "air_quality"
+ALERTS = "alerts"
+SUN = "sun"
+PANELS = (CURRENT, AIR_QUALITY, ALERTS, SUN)
+
+# 降级原因
+TIMEOUT = "timeout"
+ERROR = "error"
+
+# HJ 633-2012 空气质量指数分级（上限, 级别）
+AQI_LEVELS = ((50, "优"), (100, "良"), (150, "轻度污染"), (200, "中度污染"), (300, "重度污染"))
+
+# 太阳中心位于地平线下 0.833° 时为日出 / 日落（含大气折射与视半径）
+_SUN_ALTITUDE = math.radians(-0.833)
+_OBLIQUITY = math.radians(23.4397)
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+
+
+class AirQualityPanel(TypedDict):
+    """Props of the air quality panel."""
+
+    aqi: int
+    level: str
+    pollutant: NotRequired[str]  # 首要污染物；AQI 不超过 50 时没有
+
+
+class AlertPanel(TypedDict):
+    """One active weather alert."""
+
+    level: str  # 蓝色 | 黄色 | 橙色 | 红色
+    title: str
+    description: str
+
+
+class SunPanel(TypedDict):
+    """Props of the sunrise / sunset panel; None during polar day or night."""
+
+    sunrise: str | None
+    sunset: str | None
+    dayLength: str
+
+
+def merge_panels(left: dict[str, Any] | None, right: dict[str, Any] | None) -> dict[str, Any]:
+    """Reducer: each branch adds its panel; None clears the results for the next turn."""
+    return {} if right is None else {**(left or {}), **right}
+
+
+def aqi_level(aqi: int) -> str:
+    """Return the HJ 633 category of an AQI value."""
+    for upper, level in AQI_LEVELS:
+        if aqi <= upper:
+            return level
+    return "严重污染"
+
+
+class AirQualityProvider:
+    """Serve AQI readings from a bundled ``city -> (aqi, pollutant)`` table."""
+
+    name = AIR_QUALITY
+
+    def __init__(self, data: Mapping[str, tuple[int, str | None]]) -> None:
+        """Index `data`; cities missing from it have no air quality panel."""
+        self._data = dict(data)
+
+    async def fetch(self, city: str) -> AirQualityPanel:
+        """Return the air quality of `city`; raises KeyError without data."""
+        aqi, pollutant = self._data[city]
+        panel: AirQualityPanel = {"aqi": aqi, "level": aqi_level(aqi)}
+        if pollutant and aqi > AQI_LEVELS[0][0]:
+            panel["pollutant"] = pollutant
+        return panel
+
+
+class AlertsProvider:
+    """Serve active alerts from a bundled ``city -> alerts`` table."""
+
+    name = ALERTS
+
+    def __init__(self, data: Mapping[str, Sequence[AlertPanel]]) -> None:
+        """Index `data`; cities missing from it have no active alerts."""
+        self._data = {city: list(alerts) for city, alerts in data.items()}
+
+    async def fetch(self, city: str) -> list[AlertPanel]:
+        """Return the alerts in force for `city` (possibly none)."""
+        return list(self._data.get(city, ()))
+
+
+class SunTimes(NamedTuple):
+    """UTC sunrise and sunset; both None during polar day or polar night."""
+
+    sunrise: datetime | None
+    sunset: datetime | None
+    daylight: timedelta
+
+
+def sun_times(lat: float, lon: float, day: date) -> SunTimes:
+    """Compute sunrise and sunset at `lat`/`lon` on `day` (accurate to about a minute)."""
+    n = day.toordinal() - date(2000, 1, 1).toordinal() + 0.0008
+    mean_solar_noon = n - lon / 360
+    anomaly = math.radians((357.5291 + 0.98560028 * mean_solar_noon) % 360)
+    center = 1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) + 0.0003 * math.sin(3 * anomaly)
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = _J2000 + mean_solar_noon + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+    declination = math.asin(math.sin(ecliptic) * math.sin(_OBLIQUITY))
+    phi = math.radians(lat)
+    cos_hour_angle = (math.sin(_SUN_ALTITUDE) - math.sin(phi) * math.sin(declination)) / (
+        math.cos(phi) * math.cos(declination)
+    )
+    if cos_hour_angle < -1:
+        return SunTimes(None, None, timedelta(days=1))  # 极昼
+    if cos_hour_angle > 1:
+        return SunTimes(None, None, timedelta(0))  # 极夜
+    half_day = math.degrees(math.acos(cos_hour_angle)) / 360
+
+    def to_datetime(julian: float) -> datetime:
+        return datetime.fromtimestamp((julian - _UNIX_EPOCH_JD) * 86400, tz=UTC)
+
+    return SunTimes(to_datetime(transit - half_day), to_datetime(transit + half_day), timedelta(days=2 * half_day))
+
+
+class SunProvider:
+    """Compute sunrise and sunset from city coordinates (no data source needed)."""
+
+    name = SUN
+
+    def __init__(self, coordinates: Mapping[str, tuple[float, float]], utc_offset_hours: float = 8.0) -> None:
+        """Look cities up in `coordinates`; times are shown at `utc_offset_hours`."""
+        self._coordinates = coordinates
+        self._tz = timezone(timedelta(hours=utc_offset_hours))
+
+    async def fetch(self, city: str, day: date | None = None) -> SunPanel:
+        """Return today's (or `day`'s) sunrise and sunset in `city`; raises KeyError without coordinates."""
+        lat, lon = self._coordinates[city]
+        day = day or datetime.now(self._tz).date()
+        times = sun_times(lat, lon, day)
+        minutes = round(times.daylight.total_seconds() / 60)
+        return {
+            "sunrise": self._clock(times.sunrise),
+            "sunset": self._clock(times.sunset),
+            "dayLength": f"{minutes // 60}h{minutes % 60:02d}m",
+        }
+
+    def _clock(self, moment: datetime | None) -> str | None:
+        return None if moment is None else moment.astimezone(self._tz).strftime("%H:%M")
@@ -0,0 +1,187 @@
+"""Region-partitioned weather data with on-demand loading and eviction.
+
+A worldwide dataset should not be resident in every worker. The store
+keeps only a small city -> partition index in memory; a partition (a
+province, a country...) is loaded into its own `WeatherTable` the first
+time one of its cities is requested, and the least recently used
+partitions are evicted once the resident tables exceed `budget_bytes`.
+
+City extraction only needs the index (`cities`, `city_set`,
+`city_matcher`), so recognising "杭州" in a message never loads data.
+The store exposes the same ``version`` / ``cities`` / ``table_for`` surface
+as a single `WeatherTable`, so `TableProvider` and `CityLocator` accept
+either.
+
+Partitions come from a `PartitionSource`: `BundledPartitions` groups
+in-process records, `JsonPartitions` reads one JSON file per partition
+from a directory written by `write_partitions`. Only `JsonPartitions`
+saves memory: `BundledPartitions` keeps every record in its source list,
+so evicting a partition frees the parsed table but not the data. The
+store bounds only the single-city path; whole-dataset reads (ranking,
+forecasts) need their own resident data or a precomputed summary.
+"""
+
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Mapping, Protocol
+
+from agent.matching import KeywordAutomaton
+from agent.metrics import REGISTRY
+from agent.weather_store import WeatherTable
+
+REGISTRY.describe("weather_partition_loads_total", "Weather partitions loaded on demand, by partition")
+REGISTRY.describe("weather_partition_evictions_total", "Weather partitions evicted under the memory budget")
+REGISTRY.describe("weather_partition_resident_bytes", "Approximate memory held by resident weather partitions")
+
+INDEX_FILE = "index.json"
+
+
+class PartitionSource(Protocol):
+    """Where partitions live: a city index plus the records of each partition."""
+
+    def index(self) -> Mapping[str, str]:
+        """Return ``city -> partition`` for every city with data."""
+        ...
+
+    def load(self, partition: str) -> Iterable[Mapping[str, Any]]:
+        """Return the display-format records of one partition."""
+        ...
+
+
+class BundledPartitions:
+    """Partition in-process records by ``key(city)`` (the bundled data, tests).
+
+    The records stay resident for the life of the source, so this gives no
+    memory savings; it exercises the partitioned path with bundled data.
+    """
+
+    def __init__(self, records: Iterable[Mapping[str, Any]], key: Callable[[str], str]) -> None:
+        """Group `records` by the partition `key` assigns to their city."""
+        self.partitions: dict[str, list[Mapping[str, Any]]] = {}
+        for record in records:
+            self.partitions.setdefault(key(record["city"]), []).append(record)
+
+    def index(self) -> dict[str, str]:
+        """Return ``city -> partition``."""
+        return {r["city"]: partition for partition, rows in self.partitions.items() for r in rows}
+
+    def load(self, partition: str) -> list[Mapping[str, Any]]:
+        """Return the records of `partition`."""
+        return self.partitions[partition]
+
+
+class JsonPartitions:
+    """Read partitions from a directory written by `write_partitions`."""
+
+    def __init__(self, directory: str) -> None:
+        """Use `directory`; the index is read on `index()`, partitions on `load()`."""
+        self.directory = directory
+        self._files: dict[str, str] = {}
+
+    def index(self) -> dict[str, str]:
+        """Read ``index.json``: the partition files and ``city -> partition``."""
+        with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as f:
+            index: dict[str, Any] = json.load(f)
+        self._files = index["files"]
+        cities: dict[str, str] = index["cities"]
+        return cities
+
+    def load(self, partition: str) -> list[dict[str, Any]]:
+        """Read the records of `partition` from its file."""
+        with open(os.path.join(self.directory, self._files[partition]), encoding="utf-8") as f:
+            records: list[dict[str, Any]] = json.load(f)
+        return records
+
+
+def write_partitions(directory: str, records: Iterable[Mapping[str, Any]], key: Callable[[str], str]) -> dict[str, str]:
+    """Write `records` as one JSON file per partition plus ``index.json``; return the index."""
+    source = BundledPartitions(records, key)
+    os.makedirs(directory, exist_ok=True)
+    # 分区名可能是中文或含路径字符，文件名只用序号
+    files = {partition: f"part-{i:05d}.json" for i, partition in enumerate(sorted(source.partitions))}
+    for partition, name in files.items():
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            json.dump(source.load(partition), f, ensure_ascii=False)
+    cities = source.index()
+    with open(os.path.join(directory, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump({"files": files, "cities": cities}, f, ensure_ascii=False)
+    return cities
+
+
+class PartitionedWeatherStore:
+    """Always-resident city index in front of lazily loaded partition tables."""
+
+    def __init__(self, source: PartitionSource, budget_bytes: int | None = None) -> None:
+        """Read `source`'s index; keep resident partitions within `budget_bytes` (None = unbounded).
+
+        The partition just requested is never evicted, even when it alone
+        exceeds the budget.
+        """
+        self.version = 0
+        self.budget_bytes = budget_bytes
+        self._source = source
+        self._load_index()
+
+    def _load_index(self) -> None:
+        self._partition_of = dict(self._source.index())
+        self.cities: tuple[str, ...] = tuple(self._partition_of)
+        self.city_set = frozenset(self.cities)
+        self.city_matcher: KeywordAutomaton[str] = KeywordAutomaton({city: city for city in self.cities})
+        self._tables: OrderedDict[str, WeatherTable] = OrderedDict()
+        self._publish()
+
+    def reload(self, source: PartitionSource | None = None) -> None:
+        """Re-read the index (of `source`, if given), drop every partition and bump `version`."""
+        self._source = source or self._source
+        self._load_index()
+        self.version += 1
+
+    def __len__(self) -> int:
+        """Return the number of cities in the index."""
+        return len(self.cities)
+
+    def __contains__(self, city: object) -> bool:
+        """Return whether `city` has data, without loading its partition."""
+        return city in self._partition_of
+
+    def partition_of(self, city: str) -> str | None:
+        """Return the partition holding `city`, or None."""
+        return self._partition_of.get(city)
+
+    @property
+    def resident(self) -> tuple[str, ...]:
+        """Loaded partitions, least recently used first."""
+        return tuple(self._tables)
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by the loaded partitions."""
+        return sum(table.nbytes() for table in self._tables.values())
+
+    def table_for(self, city: str) -> WeatherTable | None:
+        """Return the table of `city`'s partition, loading it on first use; None without data."""
+        partition = self._partition_of.get(city)
+        if partition is None:
+            return None
+        table = self._tables.get(partition)
+        if table is not None:
+            self._tables.move_to_end(partition)
+            return table
+        table = self._tables[partition] = WeatherTable(self._source.load(partition))
+        REGISTRY.inc("weather_partition_loads_total", partition=partition)
+        self._evict()
+        return table
+
+    def _evict(self) -> None:
+        # 只在加载新分区时检查预算；格式化缓存的增长在下次加载时一并计入
+        if self.budget_bytes is not None:
+            sizes = {partition: table.nbytes() for partition, table in self._tables.items()}
+            total = sum(sizes.values())
+            while total > self.budget_bytes and len(self._tables) > 1:
+                partition, _ = self._tables.popitem(last=False)
+                total -= sizes[partition]
+                REGISTRY.inc("weather_partition_evictions_total", partition=partition)
+        self._publish()
+
+    def _publish(self) -> None:
+        REGISTRY.set("weather_partition_resident_bytes", self.resident_bytes())
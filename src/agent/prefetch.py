@@ -0,0 +1,317 @@
+"""Refresh-ahead prefetching of current conditions for the most requested cities.
+
+A few cities account for most weather questions, and a plain TTL cache
+still sends each of them upstream once per expiry, on a user's request.
+`RefreshAhead` sits in front of a `WeatherFetcher` with a small cache of
+fresh readings and a demand sketch:
+
+* every weather turn records its city in a `SpaceSaving` sketch, which
+  keeps the heavy hitters in bounded memory however many cities exist;
+* a background loop (`start` / `run`) refreshes the current top-N cities
+  whose cached reading is missing or expires within `lead` seconds, so a
+  popular city is refreshed before it expires, not when the next user asks;
+* prefetches draw from a `TokenBuckets` budget, so a burst of new
+  heavy hitters cannot flood the source.
+
+Counts decay periodically so the top-k follows current demand. Stale
+fallback readings are never cached, and the cache is dropped when the
+dataset version changes. `report()` returns the top-k, the hit and
+prefetch-hit ratios and the upstream calls saved (requests answered
+from the cache minus calls spent prefetching).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+from agent.admission import TokenBuckets
+from agent.metrics import REGISTRY
+from agent.providers import Deadline, FetchResult, WeatherFetcher, WeatherReading
+from agent.tracing import TRACER
+
+REGISTRY.describe("weather_reading_cache_total", "Current-conditions cache lookups by result (hit / prefetch_hit / miss)")
+REGISTRY.describe("weather_prefetch_total", "Refresh-ahead prefetches by result (ok / error / throttled)")
+REGISTRY.describe("weather_prefetch_hit_ratio", "Share of current-conditions requests answered by a prefetched reading")
+REGISTRY.describe("weather_prefetch_upstream_saved", "Upstream calls avoided by the cache, net of prefetch calls")
+
+# 所有预取共用一个令牌桶
+_BUDGET_KEY = "prefetch"
+
+
+class HeavyHitter(NamedTuple):
+    """One tracked item: its estimated count (`hits`) and the overestimate bound."""
+
+    item: str
+    hits: int
+    error: int
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in bounded memory (Metwally et al.'s Space-Saving).
+
+    Tracks at most `capacity` items. An untracked item replaces the one with
+    the smallest count and inherits that count as its error, so counts are
+    overestimates by at most ``error``; any item whose true frequency exceeds
+    ``total / capacity`` is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        """Track up to `capacity` items."""
+        self.capacity = capacity
+        self.total = 0
+        self._counts: dict[str, list[int]] = {}  # item -> [count, error]
+
+    def __len__(self) -> int:
+        """Return the number of tracked items."""
+        return len(self._counts)
+
+    def __contains__(self, item: object) -> bool:
+        """Return whether `item` is tracked."""
+        return item in self._counts
+
+    def add(self, item: str, count: int = 1) -> None:
+        """Count `count` occurrences of `item`."""
+        self.total += count
+        entry = self._counts.get(item)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[item] = [count, 0]
+            return
+        # 线性查找最小计数：容量只有几百，且只在新条目挤入时发生
+        victim = min(self._counts, key=lambda k: self._counts[k][0])
+        floor = self._counts.pop(victim)[0]
+        self._counts[item] = [floor + count, floor]
+
+    def top(self, n: int | None = None) -> list[HeavyHitter]:
+        """Return the `n` (default all) highest counts, largest first."""
+        ranked = sorted(self._counts.items(), key=lambda kv: -kv[1][0])
+        return [HeavyHitter(item, count, error) for item, (count, error) in ranked[:n]]
+
+    def decay(self, factor: float = 0.5) -> None:
+        """Scale every count by `factor`, dropping items that reach zero."""
+        for item, entry in list(self._counts.items()):
+            entry[0] = int(entry[0] * factor)
+            entry[1] = int(entry[1] * factor)
+            if entry[0] == 0:
+                del self._counts[item]
+        self.total = int(self.total * factor)
+
+
+class _Cached(NamedTuple):
+    reading: WeatherReading
+    expires_at: float
+    prefetched: bool
+
+
+class PrefetchStats:
+    """Counters for one `RefreshAhead`: cache lookups and prefetch outcomes."""
+
+    __slots__ = ("hits", "prefetch_hits", "misses", "prefetches", "errors", "throttled")
+
+    def __init__(self) -> None:
+        """Start every counter at zero."""
+        self.hits = self.prefetch_hits = self.misses = 0
+        self.prefetches = self.errors = self.throttled = 0
+
+    @property
+    def requests(self) -> int:
+        """Current-conditions requests seen."""
+        return self.hits + self.misses
+
+    @property
+    def upstream_saved(self) -> int:
+        """Requests answered from the cache minus upstream calls spent prefetching."""
+        return self.hits - self.prefetches - self.errors
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the counters plus hit, prefetch-hit ratios and upstream savings."""
+        requests = self.requests
+        return {
+            "requests": requests,
+            "hits": self.hits,
+            "prefetch_hits": self.prefetch_hits,
+            "misses": self.misses,
+            "prefetches": self.prefetches,
+            "prefetch_errors": self.errors,
+            "throttled": self.throttled,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "prefetch_hit_ratio": self.prefetch_hits / requests if requests else 0.0,
+            "upstream_calls": self.misses + self.prefetches + self.errors,
+            "upstream_saved": self.upstream_saved,
+        }
+
+
+class RefreshAhead:
+    """Fresh-reading cache in front of a `WeatherFetcher`, kept warm for the hottest cities."""
+
+    def __init__(
+        self,
+        fetcher: WeatherFetcher,
+        ttl: float = 120.0,
+        top_n: int = 10,
+        lead: float = 20.0,
+        rate: float = 1.0,
+        burst: float = 10.0,
+        maxsize: int = 1024,
+        sketch_capacity: int = 256,
+        decay_every: float = 600.0,
+        timeout: float = 5.0,
+        version: Callable[[], int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Cache `fetcher`'s readings for `ttl` seconds and keep the `top_n` cities warm.
+
+        A city is refreshed once its reading expires within `lead` seconds;
+        prefetches are limited to `rate` per second with bursts of `burst`,
+        and each is bounded by `timeout`. Demand counts are halved every
+        `decay_every` seconds. `version()` returns the dataset version.
+        """
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.top_n = top_n
+        self.lead = lead
+        self.maxsize = maxsize
+        self.decay_every = decay_every
+        self.timeout = timeout
+        self.version = version
+        self.heavy = SpaceSaving(sketch_capacity)
+        self.tokens = TokenBuckets(rate, burst, max_keys=1, clock=clock)
+        self.stats = PrefetchStats()
+        self._clock = clock
+        self._entries: OrderedDict[str, _Cached] = OrderedDict()
+        self._version = version() if version else 0
+        self._decayed_at = clock()
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        """Return the number of cached readings."""
+        return len(self._entries)
+
+    def record(self, city: str) -> None:
+        """Count one request for `city` (called for every weather turn)."""
+        self.heavy.add(city)
+
+    def top(self, n: int | None = None) -> list[HeavyHitter]:
+        """Return the `n` (default `top_n`) most requested cities."""
+        return self.heavy.top(n or self.top_n)
+
+    def expires_in(self, city: str) -> float | None:
+        """Seconds until `city`'s cached reading expires, or None when not cached."""
+        entry = self._entries.get(city)
+        return None if entry is None else entry.expires_at - self._clock()
+
+    async def fetch_with_fallback(
+        self, city: str, deadline: Deadline | None = None, hedge: bool = False
+    ) -> FetchResult:
+        """Return the cached reading while fresh, otherwise fetch through `fetcher`."""
+        self._check_version()
+        entry = self._entries.get(city)
+        if entry is not None and entry.expires_at > self._clock():
+            self._entries.move_to_end(city)
+            self.stats.hits += 1
+            if entry.prefetched:
+                self.stats.prefetch_hits += 1
+            REGISTRY.inc("weather_reading_cache_total", result="prefetch_hit" if entry.prefetched else "hit")
+            self._publish()
+            return FetchResult(entry.reading, False)
+
+        self.stats.misses += 1
+        REGISTRY.inc("weather_reading_cache_total", result="miss")
+        version = self._version
+        result = await self.fetcher.fetch_with_fallback(city, deadline, hedge)
+        if not result.stale and self._version == version:
+            self._store(city, result.reading, prefetched=False)
+        self._publish()
+        return result
+
+    def due(self) -> list[str]:
+        """Return the top-N cities whose reading is missing or expires within `lead`."""
+        now = self._clock()
+        due = []
+        for hitter in self.heavy.top(self.top_n):
+            entry = self._entries.get(hitter.item)
+            if entry is None or entry.expires_at - now <= self.lead:
+                due.append(hitter.item)
+        return due
+
+    async def refresh(self) -> int:
+        """Prefetch the due cities within the rate limit; return how many were refreshed."""
+        self._check_version()
+        now = self._clock()
+        if now - self._decayed_at >= self.decay_every:
+            self.heavy.decay()
+            self._decayed_at = now
+
+        refreshed = 0
+        due = self.due()
+        with TRACER.span("prefetch.refresh", due=len(due)) as span:
+            for city in due:
+                if not self.tokens.try_acquire(_BUDGET_KEY):
+                    # 预算用完：剩下的城市留到下一轮，按热度排序保证先刷新最热门的
+                    self.stats.throttled += 1
+                    REGISTRY.inc("weather_prefetch_total", result="throttled")
+                    break
+                version = self._version
+                try:
+                    reading = await self.fetcher.fetch(city, Deadline.after(self.timeout))
+                except Exception:
+                    self.stats.errors += 1
+                    REGISTRY.inc("weather_prefetch_total", result="error")
+                    continue
+                self.stats.prefetches += 1
+                REGISTRY.inc("weather_prefetch_total", result="ok")
+                if self._version == version:
+                    self._store(city, reading, prefetched=True)
+                    refreshed += 1
+            span.set_attribute("refreshed", refreshed)
+        self._publish()
+        return refreshed
+
+    async def run(self, interval: float = 5.0) -> None:
+        """Refresh every `interval` seconds until cancelled."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = 5.0) -> "asyncio.Task[None]":
+        """Start the background refresh loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(interval))
+        return self._task
+
+    async def stop(self) -> None:
+        """Cancel the background refresh loop and wait for it to finish."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def report(self) -> dict[str, object]:
+        """Return the top-k cities and the cache / prefetch counters."""
+        return {"top": [tuple(h) for h in self.top()], **self.stats.snapshot()}
+
+    def _check_version(self) -> None:
+        if self.version is None:
+            return
+        version = self.version()
+        if version != self._version:
+            # 数据集重新加载后缓存的读数全部作废
+            self._entries.clear()
+            self._version = version
+
+    def _store(self, city: str, reading: WeatherReading, prefetched: bool) -> None:
+        self._entries[city] = _Cached(reading, self._clock() + self.ttl, prefetched)
+        self._entries.move_to_end(city)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _publish(self) -> None:
+        stats = self.stats
+        REGISTRY.set("weather_prefetch_hit_ratio", stats.prefetch_hits / stats.requests if stats.requests else 0.0)
+        REGISTRY.set("weather_prefetch_upstream_saved", stats.upstream_saved)
@@ -0,0 +1,525 @@
+"""Profile real graph runs: CPU (cProfile, sampled flame graph) and memory (tracemalloc).
+
+Usage::
+
+    python -m agent.profile --requests 500 --threads 20 -o profiles/
+    python -m agent.profile --workload traffic.jsonl --mode memory
+    python -m agent.profile --mode cpu --mode flame --concurrency 16
+
+The workload (a built-in mix, or a log in the `agent.replay` format) is
+spread round-robin over ``--threads`` checkpointed threads so follow-ups
+build up state as they do in production; ``--threads 0`` runs every
+request statelessly. Each mode is a separate pass over the workload:
+
+* ``cpu``    – cProfile over the run: ``cpu.pstats`` (snakeviz, gprof2dot)
+  and ``cpu.txt``, the top functions by cumulative time;
+* ``flame``  – a sampling thread records whole stacks: ``flame.folded``, the
+  collapsed-stack input of flamegraph.pl, speedscope and inferno;
+* ``memory`` – requests run one at a time under tracemalloc: ``memory.txt``
+  with peak and retained bytes per request, per node (from graph
+  callbacks) and per extraction phase (helpers in `agent.graph` are
+  wrapped for the pass), the top retained allocation sites, and the
+  checkpointed state bytes per thread.
+
+Admission control is swapped for one without rate or concurrency limits
+during the run, so a wide workload is not turned into busy replies.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import functools
+import importlib
+import inspect
+import os
+import pstats
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, NamedTuple, TextIO
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.replay import iter_lines, load_graph, parse_request, unlimited_admission
+from agent.serde import CompactSerializer
+
+MODES = ("cpu", "flame", "memory")
+DEFAULT_BUILDER = "agent.graph:builder"
+
+# 默认负载：覆盖天气 / 追问 / 预报 / 排名 / 区县 / 闲聊各分支
+DEFAULT_WORKLOAD = [
+    "北京天气怎么样",
+    "湿度呢？",
+    "明天上海天气",
+    "用华氏度呢",
+    "哪个城市最热",
+    "南山区天气",
+    "你好",
+    "湿度低于60%的城市",
+    "杭州天气",
+    "这周广州温度",
+]
+
+# 内存分析时逐阶段包装的 agent.graph 辅助函数：阶段名 -> 模块属性 / (对象, 方法)
+PHASE_FUNCTIONS = {
+    "extract_city": "extract_city_from_message",
+    "resolve_turn": "resolve_turn",
+    "parse_time_range": "parse_time_range",
+    "parse_ranking": "parse_ranking_query",
+    "format_reading": "format_reading",
+    "push_ui": "_push_ui",
+}
+PHASE_METHODS = {
+    "classify": ("_intent_router", "classify"),
+    "fetch": ("_weather_fetcher", "fetch_with_fallback"),
+}
+
+TOP_FUNCTIONS = 40
+TOP_SITES = 15
+
+
+class Request(NamedTuple):
+    """One replayed turn: its thread (None = stateless), message and run config."""
+
+    thread_id: str | None
+    message: Any
+    config: dict[str, Any]
+
+
+class PhaseStats:
+    """Totals for one node or phase across the memory pass."""
+
+    __slots__ = ("calls", "seconds", "peak", "retained", "max_peak")
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak = 0
+        self.retained = 0
+        self.max_peak = 0
+
+    def add(self, seconds: float, peak: int, retained: int) -> None:
+        """Record one call."""
+        self.calls += 1
+        self.seconds += seconds
+        self.peak += peak
+        self.retained += retained
+        self.max_peak = max(self.max_peak, peak)
+
+
+class MemoryRecorder:
+    """Nested tracemalloc spans: peak and retained bytes for each node / phase.
+
+    The memory pass runs one request at a time, but the weather branch fans
+    out to parallel panel nodes, so spans may overlap as well as nest. Every
+    enter / exit folds the traced peak so far into all open spans and resets
+    it, so each span sees the true peak of its own interval (overlapping
+    siblings share theirs). Child spans are keyed ``parent/child``.
+    """
+
+    def __init__(self) -> None:
+        """Start with no spans."""
+        self.stats: dict[str, PhaseStats] = {}
+        self._open: list[list[Any]] = []  # [key, 开始时间, 开始时的内存, 目前的峰值]
+
+    @property
+    def root(self) -> list[Any] | None:
+        """Return the outermost open span (the request), if any."""
+        return self._open[0] if self._open else None
+
+    def _fold_peak(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        for span in self._open:
+            span[3] = max(span[3], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name: str, parent: list[Any] | None = None) -> list[Any]:
+        """Open a span under `parent` (default: the innermost open span) and return it.
+
+        An empty name opens a request; its children's keys are not prefixed.
+        """
+        current = self._fold_peak()
+        if parent is None and self._open:
+            parent = self._open[-1]
+        key = f"{parent[0]}/{name}" if parent and parent[0] else name
+        span = [key, time.perf_counter(), current, current]
+        self._open.append(span)
+        return span
+
+    def exit(self, span: list[Any] | None = None) -> tuple[int, int]:
+        """Close `span` (default: the innermost); returns its ``(peak, retained)`` bytes."""
+        current = self._fold_peak()
+        span = self._open[-1] if span is None else span
+        self._open.remove(span)
+        key, started, start_bytes, peak = span
+        result = (peak - start_bytes, current - start_bytes)
+        if key:
+            self.stats.setdefault(key, PhaseStats()).add(time.perf_counter() - started, *result)
+        return result
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Record the block as a span."""
+        span = self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit(span)
+
+
+class NodeSpans(BaseCallbackHandler):
+    """Open a recorder span for every node and branch the graph runs."""
+
+    run_inline = True  # 在事件循环线程中同步回调，保证与节点执行严格嵌套
+
+    def __init__(self, recorder: MemoryRecorder) -> None:
+        """Report spans to `recorder`."""
+        self.recorder = recorder
+        self._open: dict[Any, list[Any]] = {}
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: Any, parent_run_id: Any = None, **kwargs: Any) -> None:
+        """Open a span for a node (the graph itself is covered by the request span)."""
+        if parent_run_id is None:
+            return
+        # 并行分支的父节点按 parent_run_id 确定，而不是最近打开的兄弟分支
+        parent = self._open.get(parent_run_id, self.recorder.root)
+        self._open[run_id] = self.recorder.enter(kwargs.get("name") or "chain", parent)
+
+    def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        """Close the node's span."""
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            self.recorder.exit(span)
+
+    def on_chain_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        """Close the node's span."""
+        self.on_chain_end(None, run_id=run_id)
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval (collapsed-stack output)."""
+
+    def __init__(self, interval: float = 0.001, thread_id: int | None = None) -> None:
+        """Sample `thread_id` (default: the calling thread) every `interval` seconds."""
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "StackSampler":
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, out: TextIO) -> None:
+        """Write ``frame;frame;frame count`` lines."""
+        for stack, count in sorted(self.samples.items()):
+            out.write(f"{stack} {count}\n")
+
+
+def load_workload(path: str | None) -> list[tuple[Any, dict[str, Any]]]:
+    """Return ``(message, config)`` pairs from a replay log, or the built-in mix."""
+    if path is None:
+        return [(message, {}) for message in DEFAULT_WORKLOAD]
+    workload = []
+    for _, line in iter_lines(path):
+        try:
+            _, message, config = parse_request(line)
+        except ValueError:
+            continue
+        workload.append((message, config))
+    return workload
+
+
+def plan(workload: list[tuple[Any, dict[str, Any]]], requests: int, threads: int, prefix: str = "profile") -> list[Request]:
+    """Cycle the workload to `requests` requests, assigned round-robin to `threads` threads."""
+    return [
+        Request(f"{prefix}-{i % threads}" if threads else None, *workload[i % len(workload)])
+        for i in range(requests)
+    ]
+
+
+async def invoke(graph: Any, request: Request, callbacks: list[Any] | None = None) -> Any:
+    """Run one request through `graph.ainvoke`."""
+    configurable = dict(request.config.get("configurable") or {})
+    if request.thread_id is not None:
+        configurable["thread_id"] = request.thread_id
+    config: dict[str, Any] = {**request.config, "configurable": configurable}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return await graph.ainvoke({"messages": [HumanMessage(content=request.message)]}, config)
+
+
+async def run_workload(graph: Any, requests: list[Request], concurrency: int = 1) -> None:
+    """Run the requests; one thread's requests stay in order, up to `concurrency` at once."""
+    lanes: dict[Any, list[Request]] = {}
+    for i, request in enumerate(requests):
+        lanes.setdefault(request.thread_id if request.thread_id is not None else i, []).append(request)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lane(items: list[Request]) -> None:
+        async with semaphore:
+            for request in items:
+                await invoke(graph, request)
+
+    await asyncio.gather(*(lane(items) for items in lanes.values()))
+
+
+@contextmanager
+def instrumented(module: Any, recorder: MemoryRecorder | None = None) -> Iterator[None]:
+    """Swap in pass-through admission and, with a recorder, phase-wrapped helpers."""
+    saved: list[tuple[Any, str, Any, bool]] = []
+
+    def swap(owner: Any, attr: str, value: Any) -> None:
+        saved.append((owner, attr, getattr(owner, attr), attr in vars(owner)))
+        setattr(owner, attr, value)
+
+    try:
+        swap(module, "_admission", unlimited_admission())
+        if recorder is not None:
+            for phase, attr in PHASE_FUNCTIONS.items():
+                if hasattr(module, attr):
+                    swap(module, attr, _wrap(recorder, phase, getattr(module, attr)))
+            for phase, (owner_attr, method) in PHASE_METHODS.items():
+                owner = getattr(module, owner_attr, None)
+                if owner is not None:
+                    swap(owner, method, _wrap(recorder, phase, getattr(owner, method)))
+        yield
+    finally:
+        for owner, attr, original, own in reversed(saved):
+            if own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)  # 实例方法：去掉实例属性即恢复类上的定义
+
+
+def _wrap(recorder: MemoryRecorder, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with recorder.span(name):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with recorder.span(name):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def compile_graph(builder_path: str, requests: list[Request]) -> Any:
+    """Compile the builder, with a fresh in-memory checkpointer when any request names a thread."""
+    stateful = any(r.thread_id is not None for r in requests)
+    return load_graph(builder_path).compile(checkpointer=InMemorySaver(serde=CompactSerializer()) if stateful else None)
+
+
+async def profile_cpu(builder_path: str, requests: list[Request], concurrency: int, out_dir: str) -> list[str]:
+    """Run the workload under cProfile; write ``cpu.pstats`` and ``cpu.txt``."""
+    graph = compile_graph(builder_path, requests)
+    module = importlib.import_module(builder_path.partition(":")[0])
+    profiler = cProfile.Profile()
+    with instrumented(module):
+        profiler.enable()
+        try:
+            await run_workload(graph, requests, concurrency)
+        finally:
+            profiler.disable()
+    pstats_path = os.path.join(out_dir, "cpu.pstats")
+    text_path = os.path.join(out_dir, "cpu.txt")
+    profiler.dump_stats(pstats_path)
+    with open(text_path, "w", encoding="utf-8") as f:
+        pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return [pstats_path, text_path]
+
+
+async def profile_flame(
+    builder_path: str, requests: list[Request], concurrency: int, out_dir: str, interval: float
+) -> list[str]:
+    """Sample stacks during the workload; write ``flame.folded``."""
+    graph = compile_graph(builder_path, requests)
+    module = importlib.import_module(builder_path.partition(":")[0])
+    with instrumented(module), StackSampler(interval) as sampler:
+        await run_workload(graph, requests, concurrency)
+    path = os.path.join(out_dir, "flame.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        sampler.write(f)
+    return [path]
+
+
+async def profile_memory(builder_path: str, requests: list[Request], out_dir: str) -> list[str]:
+    """Run the workload one request at a time under tracemalloc; write ``memory.txt``."""
+    graph = compile_graph(builder_path, requests)
+    module = importlib.import_module(builder_path.partition(":")[0])
+    recorder = MemoryRecorder()
+    callbacks = [NodeSpans(recorder)]
+    per_request: list[tuple[int, int]] = []
+
+    with instrumented(module, recorder):
+        # 预热：导入、正则编译、惰性缓存不计入
+        for request in plan(load_workload(None), len(DEFAULT_WORKLOAD), 1, prefix="warmup"):
+            await invoke(graph, request)
+        recorder.stats.clear()
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for request in requests:
+                root = recorder.enter("")
+                try:
+                    await invoke(graph, request, callbacks)
+                finally:
+                    per_request.append(recorder.exit(root))
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    state = await state_bytes(graph, sorted({r.thread_id for r in requests if r.thread_id is not None}))
+    path = os.path.join(out_dir, "memory.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        write_memory_report(f, per_request, recorder.stats, site_diff(after, before), state)
+    return [path]
+
+
+async def state_bytes(graph: Any, thread_ids: list[str]) -> list[dict[str, int]]:
+    """Return the serialised size of each thread's checkpointed state, total and per channel."""
+    sizes: list[dict[str, int]] = []
+    if not thread_ids:
+        return sizes
+    serde = graph.checkpointer.serde
+    for thread_id in thread_ids:
+        snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+        row = {channel: len(serde.dumps_typed(value)[1]) for channel, value in snapshot.values.items()}
+        row["total"] = len(serde.dumps_typed(snapshot.values)[1])
+        sizes.append(row)
+    return sizes
+
+
+def site_diff(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot) -> list[tracemalloc.StatisticDiff]:
+    """Top retained allocation sites, excluding the profiler's own bookkeeping."""
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return [d for d in diff if d.size_diff > 0][:TOP_SITES]
+
+
+def write_memory_report(
+    out: TextIO,
+    per_request: list[tuple[int, int]],
+    stats: dict[str, PhaseStats],
+    sites: list[tracemalloc.StatisticDiff],
+    state: list[dict[str, int]],
+) -> None:
+    """Write the memory pass results as plain text."""
+    peaks = sorted(p for p, _ in per_request)
+    retained = [r for _, r in per_request]
+    out.write(f"requests: {len(per_request)} (one at a time, tracemalloc)\n")
+    if peaks:
+        out.write(
+            f"peak KiB per request: p50 {_pct(peaks, 50) / 1024:.1f}  p95 {_pct(peaks, 95) / 1024:.1f}  "
+            f"max {peaks[-1] / 1024:.1f}\n"
+        )
+        out.write(f"retained KiB per request: mean {statistics.fmean(retained) / 1024:.2f}\n")
+
+    out.write(f"\n{'node / phase':40} {'calls':>7} {'mean ms':>9} {'peak KiB':>9} {'max KiB':>9} {'kept KiB':>9}\n")
+    for key, s in sorted(stats.items()):
+        out.write(
+            f"{key:40} {s.calls:>7} {s.seconds / s.calls * 1000:>9.3f} {s.peak / s.calls / 1024:>9.2f} "
+            f"{s.max_peak / 1024:>9.2f} {s.retained / s.calls / 1024:>9.3f}\n"
+        )
+
+    out.write("\ntop retained allocation sites\n")
+    for d in sites:
+        frame = d.traceback[0]
+        out.write(f"{d.size_diff / 1024:>10.1f} KiB {d.count_diff:>7} blocks  {frame.filename}:{frame.lineno}\n")
+
+    if state:
+        out.write(f"\nstate bytes per thread ({len(state)} threads, checkpoint serializer)\n")
+        channels = sorted({k for row in state for k in row} - {"total"}) + ["total"]
+        for channel in channels:
+            values = [row.get(channel, 0) for row in state]
+            out.write(f"{channel:20} mean {statistics.fmean(values):>10.0f}  max {max(values):>10}\n")
+
+
+def _pct(ordered: list[int], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+async def profile(args: argparse.Namespace) -> list[str]:
+    """Run the selected passes and return the files written."""
+    os.makedirs(args.output, exist_ok=True)
+    requests = plan(load_workload(args.workload), args.requests, args.threads)
+    modes = args.mode or list(MODES)
+    written = []
+    if "cpu" in modes:
+        written += await profile_cpu(args.builder, requests, args.concurrency, args.output)
+    if "flame" in modes:
+        written += await profile_flame(args.builder, requests, args.concurrency, args.output, args.interval / 1000)
+    if "memory" in modes:
+        written += await profile_memory(args.builder, requests, args.output)
+    return written
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m agent.profile", description=__doc__.split("\n")[0])
+    parser.add_argument("--workload", help="replay-format JSONL log (default: built-in mix)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per pass")
+    parser.add_argument("--threads", type=int, default=10, help="checkpointed threads (0 = stateless)")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads in flight (cpu / flame passes)")
+    parser.add_argument("--mode", action="append", choices=MODES, help="pass to run; repeatable (default: all)")
+    parser.add_argument("--interval", type=float, default=1.0, help="flame sampling interval, ms")
+    parser.add_argument("--builder", default=DEFAULT_BUILDER, help="module:attribute of the StateGraph builder")
+    parser.add_argument("-o", "--output", default="profiles", help="output directory")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    written = asyncio.run(profile(args))
+    sys.stderr.write(f"profiled {args.requests} requests per pass in {time.perf_counter() - start:.1f}s\n")
+    for path in written:
+        sys.stderr.write(f"  {path}\n")
+    memory = os.path.join(args.output, "memory.txt")
+    if memory in written:
+        with open(memory, encoding="utf-8") as f:
+            sys.stdout.write(f.read())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
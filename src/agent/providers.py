@@ -0,0 +1,387 @@
+"""Upstream weather sources, per-run deadlines and hedged fetches.
+
+`weather_node` never talks to a source directly: it asks a `WeatherFetcher`,
+which bounds every attempt by the run's `Deadline` and can optionally hedge
+a slow attempt. A hedge is a second attempt fired once the first has been
+outstanding longer than the source's recent p95 latency; whichever attempt
+finishes first wins and the other is cancelled. Hedging trades a few percent
+of extra upstream calls for a much shorter latency tail.
+
+Each source also sits behind a `CircuitBreaker`. After repeated failures
+the breaker opens and fetches fail fast; `fetch_with_fallback` then serves
+the last good reading for the city, or the bundled table, marked stale. After
+a cool-down one probe is let through (half-open) to decide whether to close.
+"""
+
+import asyncio
+import time
+from array import array
+from typing import Any, Callable, Mapping, NamedTuple, Protocol, TypedDict
+
+from agent.metrics import REGISTRY
+from agent.partitions import PartitionedWeatherStore
+from agent.tracing import current_span, traced
+from agent.weather_store import WeatherTable
+
+REGISTRY.describe("weather_breaker_state", "Circuit breaker state per source (0=closed, 1=half-open, 2=open)")
+REGISTRY.describe("weather_breaker_transitions_total", "Circuit breaker state transitions per source")
+REGISTRY.describe("weather_fallbacks_total", "Readings served from the cache or bundled data instead of the source")
+
+
+class WeatherReading(TypedDict):
+    """Current conditions for one city, numbers in canonical units."""
+
+    city: str
+    temperature: float
+    condition: str
+    humidity: float
+    windSpeed: float
+    description: str
+
+
+class WeatherProvider(Protocol):
+    """A source of current conditions (an HTTP API, a cache, a table...)."""
+
+    name: str
+
+    async def fetch(self, city: str) -> WeatherReading:
+        """Return the current reading for `city`."""
+        ...
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's deadline passed before any attempt finished."""
+
+
+class CircuitOpen(RuntimeError):
+    """The source's circuit breaker is open; the fetch was not attempted."""
+
+
+class FetchResult(NamedTuple):
+    """A reading plus whether it came from a fallback instead of the source."""
+
+    reading: WeatherReading
+    stale: bool
+
+
+class TableProvider:
+    """Serve readings from an in-process `WeatherTable` (the bundled data)."""
+
+    name = "table"
+
+    def __init__(self, table: "WeatherTable | PartitionedWeatherStore") -> None:
+        """Read from `table` or a partitioned store; reloads are picked up automatically."""
+        self._table = table
+
+    async def fetch(self, city: str) -> WeatherReading:
+        """Return the row of `city` as a reading."""
+        reading = self.reading(city)
+        if reading is None:
+            raise KeyError(city)
+        return reading
+
+    def reading(self, city: str) -> WeatherReading | None:
+        """Return the row of `city` without awaiting, or None."""
+        table = self._table.table_for(city)
+        i = None if table is None else table.row(city)
+        if table is None or i is None:
+            return None
+        return {
+            "city": city,
+            "temperature": table.columns["temperature"][i],
+            "condition": table.conditions[i],
+            "humidity": table.columns["humidity"][i],
+            "windSpeed": table.columns["windSpeed"][i],
+            "description": table.descriptions[i],
+        }
+
+
+class Deadline:
+    """An absolute point in time, tracked on the monotonic clock."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float | None) -> None:
+        """Create a deadline at monotonic time `expires_at` (None = unbounded)."""
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float | None) -> "Deadline":
+        """Return a deadline `seconds` from now."""
+        return cls(None if seconds is None else time.monotonic() + seconds)
+
+    @classmethod
+    def from_config(cls, configurable: Mapping[str, Any]) -> "Deadline":
+        """Read the run's deadline from ``config["configurable"]``.
+
+        ``deadline`` is an absolute UNIX timestamp, which is what a caller
+        propagates from its own deadline; ``timeout_ms`` is a budget relative
+        to now. When both are set the earlier one wins.
+        """
+        candidates = []
+        if configurable.get("deadline") is not None:
+            candidates.append(float(configurable["deadline"]) - time.time())
+        if configurable.get("timeout_ms") is not None:
+            candidates.append(float(configurable["timeout_ms"]) / 1000)
+        return cls.after(min(candidates)) if candidates else cls(None)
+
+    def remaining(self) -> float | None:
+        """Return the seconds left (never negative), or None if unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Return whether the deadline has passed."""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class LatencyWindow:
+    """Ring buffer of the most recent attempt latencies of one source."""
+
+    def __init__(self, size: int = 256) -> None:
+        """Keep the last `size` samples."""
+        self._samples = array("d", bytes(8 * size))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._count
+
+    def add(self, seconds: float) -> None:
+        """Record one attempt latency."""
+        self._samples[self._next] = seconds
+        self._next = (self._next + 1) % len(self._samples)
+        self._count = min(self._count + 1, len(self._samples))
+
+    def percentile(self, pct: float) -> float | None:
+        """Return the `pct` percentile (nearest rank), or None without samples."""
+        if not self._count:
+            return None
+        ordered = sorted(self._samples[: self._count])
+        return ordered[min(self._count - 1, max(0, round(pct / 100 * self._count) - 1))]
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker guarding one source."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        source: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Open after `failure_threshold` consecutive failures; probe after `reset_timeout` seconds."""
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        REGISTRY.set("weather_breaker_state", 0, source=source)
+
+    @property
+    def state(self) -> str:
+        """Return the current state, moving open -> half-open once the cool-down ends."""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Return whether a call may go to the source now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        # 半开状态只放行一个探测请求；探测被取消时超过冷却时间后允许重新探测
+        now = self._clock()
+        if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+            self._probe_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Reset the failure count; a successful probe closes the breaker."""
+        self._failures = 0
+        if self._state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        """Count a failure; open on the threshold or on a failed probe."""
+        self._failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._failures >= self.failure_threshold
+        ):
+            self._opened_at = self._clock()
+            self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        REGISTRY.inc("weather_breaker_transitions_total", source=self.source, to=state)
+        REGISTRY.set("weather_breaker_state", self._GAUGE[state], source=self.source)
+        self._state = state
+        self._probe_started = None
+
+
+class FetchStats:
+    """Counters for one fetcher: attempts, hedges fired and hedges won."""
+
+    __slots__ = ("requests", "hedges_fired", "hedges_won", "deadline_exceeded", "errors", "short_circuited", "fallbacks")
+
+    def __init__(self) -> None:
+        """Start every counter at zero."""
+        self.requests = self.hedges_fired = self.hedges_won = 0
+        self.deadline_exceeded = self.errors = 0
+        self.short_circuited = self.fallbacks = 0
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the counters plus hedge fire / win rates."""
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "deadline_exceeded": self.deadline_exceeded,
+            "errors": self.errors,
+            "short_circuited": self.short_circuited,
+            "fallbacks": self.fallbacks,
+            "hedge_rate": self.hedges_fired / self.requests if self.requests else 0.0,
+            "hedge_win_rate": self.hedges_won / self.hedges_fired if self.hedges_fired else 0.0,
+        }
+
+
+class WeatherFetcher:
+    """Fetch readings from a provider under a deadline, optionally hedged."""
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        hedge_percentile: float = 95.0,
+        min_samples: int = 20,
+        window: int = 256,
+        breaker: CircuitBreaker | None = None,
+        fallback: TableProvider | None = None,
+    ) -> None:
+        """Wrap `provider`; hedging starts once `min_samples` latencies are known.
+
+        `fallback` serves readings the source cannot, after the per-city
+        last-good cache.
+        """
+        self.provider = provider
+        self.breaker = breaker or CircuitBreaker(provider.name)
+        self.fallback = fallback
+        self._last_good: dict[str, WeatherReading] = {}
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow(window)
+        self.stats = FetchStats()
+
+    def hedge_delay(self) -> float | None:
+        """Return how long to wait before hedging, or None while warming up."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    @traced("provider.fetch")
+    async def _attempt(self, city: str, hedged: bool = False) -> WeatherReading:
+        current_span().set_attributes({"provider": self.provider.name, "city": city, "hedged": hedged})
+        start = time.monotonic()
+        try:
+            return await self.provider.fetch(city)
+        finally:
+            # 输掉对冲或被截止时间取消的慢请求也要计入，否则 p95 偏低、对冲越发越早
+            self.latencies.add(time.monotonic() - start)
+
+    async def fetch(self, city: str, deadline: Deadline | None = None, hedge: bool = False) -> WeatherReading:
+        """Return the reading for `city`.
+
+        Raises `DeadlineExceeded` when `deadline` passes first and
+        `CircuitOpen` without calling the source while the breaker is open;
+        outstanding attempts are cancelled either way.
+        """
+        deadline = deadline or Deadline(None)
+        self.stats.requests += 1
+        if deadline.expired:
+            self.stats.deadline_exceeded += 1
+            raise DeadlineExceeded(city)
+        if not self.breaker.allow():
+            self.stats.short_circuited += 1
+            raise CircuitOpen(self.provider.name)
+        try:
+            reading = await self._fetch(city, deadline, hedge)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        self._last_good[city] = reading
+        return reading
+
+    @traced("weather.fetch")
+    async def fetch_with_fallback(
+        self, city: str, deadline: Deadline | None = None, hedge: bool = False
+    ) -> FetchResult:
+        """Return a fresh reading, or a stale one when the source cannot answer."""
+        span = current_span()
+        span.set_attributes({"city": city, "hedge": hedge})
+        try:
+            return FetchResult(await self.fetch(city, deadline, hedge), False)
+        except CircuitOpen as e:
+            error: Exception = e
+            reason = "open"
+        except DeadlineExceeded as e:
+            error, reason = e, "deadline"
+        except Exception as e:
+            error, reason = e, "error"
+
+        reading: WeatherReading | None = self._last_good.get(city)
+        served = "cache"
+        if reading is None and self.fallback is not None:
+            reading, served = self.fallback.reading(city), "static"
+        if reading is None:
+            raise error
+        self.stats.fallbacks += 1
+        span.set_attributes({"stale": True, "fallback.reason": reason, "fallback.served": served})
+        REGISTRY.inc("weather_fallbacks_total", source=self.provider.name, reason=reason, served=served)
+        return FetchResult(reading, True)
+
+    async def _fetch(self, city: str, deadline: Deadline, hedge: bool) -> WeatherReading:
+        primary = asyncio.ensure_future(self._attempt(city))
+        attempts = {primary}
+        try:
+            delay = self.hedge_delay() if hedge else None
+            remaining = deadline.remaining()
+            if delay is not None and (remaining is None or delay < remaining):
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    self.stats.hedges_fired += 1
+                    attempts.add(asyncio.ensure_future(self._attempt(city, hedged=True)))
+
+            error: BaseException | None = None
+            while attempts:
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.stats.deadline_exceeded += 1
+                    raise DeadlineExceeded(city)
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            self.stats.errors += 1
+            assert error is not None
+            raise error
+        finally:
+            for task in attempts:
+                task.cancel()
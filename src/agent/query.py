@@ -0,0 +1,188 @@
+"""Ranking and filter queries over the numeric weather columns.
+
+Each numeric field has a `SortedIndex`: its values sorted once into an
+``array('d')`` alongside the matching row ids. Top-k is a slice from either
+end (O(k)) and a range is two bisections plus a slice (O(log n + k)), so
+queries never scan every record.
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Sequence, TypedDict
+
+from agent.units import Unit
+from agent.weather_store import NUMERIC_FIELDS, WeatherTable
+
+FIELD_LABELS = {"temperature": "温度", "humidity": "湿度", "windSpeed": "风速"}
+
+# 判断字段：风速和湿度优先，其余落到温度
+_FIELD_KEYWORDS = (
+    ("windSpeed", ("风速", "风力", "风最", "风大", "风小", "windiest", "calmest", "wind")),
+    ("humidity", ("湿度", "潮湿", "干燥", "humid", "dry")),
+    ("temperature", ("温度", "气温", "热", "冷", "暖", "hottest", "coldest", "warm", "temperature")),
+)
+_DESCENDING = ("最热", "最高", "最大", "最潮湿", "最暖", "最强", "hottest", "windiest", "most", "highest", "warmest")
+_ASCENDING = ("最冷", "最低", "最小", "最干燥", "最弱", "coldest", "calmest", "least", "lowest", "driest")
+_RANKING = ("排名", "排行", "ranking", "rank")
+# 查询必须带有比较对象，避免把“北京最高温度”当成排名
+QUERY_SUBJECTS = ("哪个城市", "哪些城市", "哪座城市", "哪里", "城市", "排名", "排行", "cities", "which", "rank", "top")
+
+_CN_NUMBERS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+_NUMBER = r"(-?\d{1,4}(?:\.\d{1,2})?)"
+_TOP_K = re.compile(r"(?:前|top\s?)(\d{1,3}|[一二两三四五六七八九十])")
+_BELOW = re.compile(r"(?:低于|小于|不到|少于|below|under|less than)\s?" + _NUMBER)
+_ABOVE = re.compile(r"(?:高于|大于|超过|多于|above|over|more than)\s?" + _NUMBER)
+_AT_LEAST = re.compile(_NUMBER + r"\s?(?:°c|°f|度|%|km/h|m/s|mph)?\s?以上")
+_AT_MOST = re.compile(_NUMBER + r"\s?(?:°c|°f|度|%|km/h|m/s|mph)?\s?以下")
+
+
+class RankingQuery(NamedTuple):
+    """A parsed top-k or range query over one numeric field."""
+
+    field: str
+    descending: bool = True
+    k: int | None = None
+    low: float | None = None
+    high: float | None = None
+    low_inclusive: bool = False
+    high_inclusive: bool = False
+
+    @property
+    def is_range(self) -> bool:
+        """Return whether this is a range (filter) query."""
+        return self.low is not None or self.high is not None
+
+
+class WeatherListItem(TypedDict):
+    """One row of the "weather_list" UI component."""
+
+    city: str
+    value: float
+    display: str
+    condition: str
+
+
+class WeatherListOutput(TypedDict):
+    """Props for the "weather_list" comparison component."""
+
+    title: str
+    metric: str
+    unit: str
+    items: list[WeatherListItem]
+
+
+def parse_ranking_query(text: str) -> RankingQuery | None:
+    """Parse "哪个城市最热" / "湿度低于50%的城市" / "top 5 windiest cities"."""
+    text = text.lower()
+    if not any(s in text for s in QUERY_SUBJECTS):
+        return None
+    field = next((f for f, words in _FIELD_KEYWORDS if any(w in text for w in words)), "temperature")
+
+    low = high = None
+    low_inclusive = high_inclusive = False
+    if match := _ABOVE.search(text):
+        low = float(match.group(1))
+    elif match := _AT_LEAST.search(text):
+        low, low_inclusive = float(match.group(1)), True
+    if match := _BELOW.search(text):
+        high = float(match.group(1))
+    elif match := _AT_MOST.search(text):
+        high, high_inclusive = float(match.group(1)), True
+    if low is not None or high is not None:
+        return RankingQuery(field, low is not None and high is None, None, low, high, low_inclusive, high_inclusive)
+
+    k: int | None = None
+    if match := _TOP_K.search(text):
+        raw = match.group(1)
+        k = _CN_NUMBERS.get(raw) or int(raw)
+    if any(w in text for w in _ASCENDING):
+        return RankingQuery(field, False, k or 1)
+    if any(w in text for w in _DESCENDING):
+        return RankingQuery(field, True, k or 1)
+    if k is not None or any(w in text for w in _RANKING):
+        return RankingQuery(field, True, k)
+    return None
+
+
+class SortedIndex:
+    """Secondary index over one numeric column."""
+
+    __slots__ = ("values", "rows")
+
+    def __init__(self, column: Sequence[float]) -> None:
+        """Sort `column` once, keeping the row id of every value."""
+        order = sorted(range(len(column)), key=column.__getitem__)
+        self.values = array("d", (column[i] for i in order))
+        self.rows = array("i", order)
+
+    def top(self, k: int | None, descending: bool = True) -> list[int]:
+        """Return the rows of the k largest (or smallest) values."""
+        n = len(self.rows)
+        k = n if k is None else min(k, n)
+        if descending:
+            return self.rows[n - k :].tolist()[::-1]
+        return self.rows[:k].tolist()
+
+    def range(
+        self,
+        low: float | None = None,
+        high: float | None = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> list[int]:
+        """Return rows whose value lies within the bounds, ascending."""
+        values = self.values
+        start = 0 if low is None else (bisect_left if low_inclusive else bisect_right)(values, low)
+        end = len(values) if high is None else (bisect_right if high_inclusive else bisect_left)(values, high)
+        return self.rows[start:end].tolist()
+
+
+class RankingIndex:
+    """Sorted indexes for every numeric field of a `WeatherTable`."""
+
+    def __init__(self, table: WeatherTable) -> None:
+        """Index `table`; indexes are rebuilt lazily when it reloads."""
+        self._table = table
+        self._version = -1
+        self._indexes: dict[str, SortedIndex] = {}
+
+    def index(self, field: str) -> SortedIndex:
+        """Return the index for `field`, rebuilding after a table reload."""
+        if self._version != self._table.version:
+            self._indexes = {f: SortedIndex(self._table.columns[f]) for f in NUMERIC_FIELDS}
+            self._version = self._table.version
+        return self._indexes[field]
+
+    def run(self, query: RankingQuery, unit: Unit) -> list[int]:
+        """Execute `query`; thresholds are given in `unit` and converted back."""
+        index = self.index(query.field)
+        if not query.is_range:
+            return index.top(query.k, query.descending)
+
+        # 单位换算是单调线性变换，只需把阈值换回规范单位
+        def canonical(v: float | None) -> float | None:
+            return None if v is None else (v - unit.offset) / unit.scale
+
+        rows = index.range(
+            canonical(query.low), canonical(query.high), query.low_inclusive, query.high_inclusive
+        )
+        return rows[::-1] if query.descending else rows
+
+
+def describe(query: RankingQuery, unit: Unit) -> str:
+    """Return a Chinese title for `query`."""
+    label = FIELD_LABELS[query.field]
+    if query.is_range:
+        parts = []
+        if query.low is not None:
+            parts.append(f"{'不低于' if query.low_inclusive else '高于'}{query.low:g}{unit.suffix}")
+        if query.high is not None:
+            parts.append(f"{'不高于' if query.high_inclusive else '低于'}{query.high:g}{unit.suffix}")
+        return f"{label}{'且'.join(parts)}的城市"
+    order = "最高" if query.descending else "最低"
+    if query.k is None:
+        return f"城市{label}排行"
+    if query.k == 1:
+        return f"{label}{order}的城市"
+    return f"{label}{order}的前{query.k}个城市"
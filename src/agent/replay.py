@@ -0,0 +1,276 @@
+"""Replay logged user messages through the graph and diff two runs.
+
+Usage::
+
+    python -m agent.replay run traffic.jsonl -o before.jsonl --concurrency 32 --workers 8
+    python -m agent.replay run traffic.jsonl -o after.jsonl --graph my_branch.graph:graph
+    python -m agent.replay diff before.jsonl after.jsonl
+
+Each input line is a JSON string (the message) or an object with
+``message`` / ``content`` / ``text`` and optional ``id`` and ``config``.
+The log is streamed: each worker process seeks to its own byte range and
+keeps at most ``--concurrency`` requests in flight, so memory stays flat
+whatever the log size. The graph module's admission control is swapped
+for one without rate or concurrency limits while replaying, so a log
+replayed faster or wider than it was recorded is not answered with busy
+replies. Results are written in input order, keyed by the byte offset of
+their line, and the per-worker files are merged by offset.
+`diff` walks two result files in lockstep and prints the requests whose
+resolved city, UI props or reply changed, plus latency percentiles.
+"""
+
+import argparse
+import asyncio
+import heapq
+import importlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator, TextIO
+
+from langchain_core.messages import HumanMessage
+
+from agent.admission import AdmissionController
+
+DEFAULT_GRAPH = "agent.graph:graph"
+INPUT_PREVIEW_CHARS = 200
+DIFF_FIELDS = ("city", "ui", "reply")
+
+
+def load_graph(path: str) -> Any:
+    """Import ``module:attribute`` and return the compiled graph."""
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr or "graph")
+
+
+def unlimited_admission() -> AdmissionController:
+    """Return a controller with no practical rate or concurrency limit."""
+    # 名额没有上限，也就从不排队：回放、剖析的并发开多大都不会得到忙碌回复
+    return AdmissionController(rate=1e9, burst=1e9, max_concurrent=sys.maxsize, max_queue=0)
+
+
+@contextmanager
+def passthrough_admission(graph_path: str) -> Iterator[None]:
+    """Swap the graph module's `_admission` for `unlimited_admission`, if it has one."""
+    module = importlib.import_module(graph_path.partition(":")[0])
+    original = getattr(module, "_admission", None)
+    if original is None:
+        yield
+        return
+    setattr(module, "_admission", unlimited_admission())
+    try:
+        yield
+    finally:
+        setattr(module, "_admission", original)
+
+
+def iter_lines(path: str, start: int = 0, end: int | None = None) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(offset, line)`` for every line that starts in ``[start, end)``."""
+    with open(path, "rb") as f:
+        if start > 0:
+            # 从前一个字节开始读掉半行，恰好从 start 开始的行不会被跳过
+            f.seek(start - 1)
+            f.readline()
+        offset = f.tell()
+        for line in f:
+            if end is not None and offset >= end:
+                break
+            yield offset, line
+            offset += len(line)
+
+
+def parse_request(line: bytes) -> tuple[Any, str, dict[str, Any]]:
+    """Return ``(id, message, config)`` from one log line."""
+    record = json.loads(line)
+    if isinstance(record, str):
+        return None, record, {}
+    message = record.get("message", record.get("content", record.get("text", "")))
+    return record.get("id"), message, record.get("config") or {}
+
+
+async def replay_one(graph: Any, offset: int, line: bytes) -> dict[str, Any]:
+    """Run one logged request and return its result record."""
+    result: dict[str, Any] = {"offset": offset, "id": None, "input": None}
+    start = time.perf_counter()
+    try:
+        result["id"], message, config = parse_request(line)
+        result["input"] = message[:INPUT_PREVIEW_CHARS] if isinstance(message, str) else message
+        output = await graph.ainvoke({"messages": [HumanMessage(content=message)], "ui": []}, config)
+    except Exception as e:
+        result.update(latency_ms=(time.perf_counter() - start) * 1000, error=f"{type(e).__name__}: {e}")
+        return result
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    ui = [{"name": u["name"], "props": u["props"]} for u in output.get("ui", [])]
+    city = next((u["props"]["city"] for u in ui if "city" in u["props"]), None)
+    if city is None:
+        city = (output.get("context") or {}).get("city")
+    messages = output.get("messages", [])
+    result.update(
+        city=city,
+        ui=ui,
+        reply=messages[-1].content if messages else None,
+        latency_ms=latency_ms,
+        error=None,
+    )
+    return result
+
+
+async def replay(
+    graph: Any, lines: Iterator[tuple[int, bytes]], out: TextIO, concurrency: int
+) -> int:
+    """Replay `lines` with at most `concurrency` in flight, writing results in order."""
+    window: deque[asyncio.Task[dict[str, Any]]] = deque()
+    count = 0
+
+    def write(record: dict[str, Any]) -> None:
+        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    for offset, line in lines:
+        if not line.strip():
+            continue
+        if len(window) >= concurrency:
+            write(await window.popleft())
+        window.append(asyncio.ensure_future(replay_one(graph, offset, line)))
+        count += 1
+    while window:
+        write(await window.popleft())
+    return count
+
+
+def run_shard(args: tuple[str, str, int, int | None, str, int]) -> int:
+    """Replay one byte range of the log into `out_path` (worker entry point)."""
+    graph_path, log_path, start, end, out_path, concurrency = args
+    graph = load_graph(graph_path)
+    with passthrough_admission(graph_path), open(out_path, "w", encoding="utf-8") as out:
+        return asyncio.run(replay(graph, iter_lines(log_path, start, end), out, concurrency))
+
+
+def _offset(line: str) -> int:
+    return int(json.loads(line)["offset"])
+
+
+def run(log_path: str, out_path: str, graph_path: str, concurrency: int, workers: int) -> int:
+    """Replay the whole log, sharded by byte range over `workers` processes."""
+    if workers <= 1:
+        return run_shard((graph_path, log_path, 0, None, out_path, concurrency))
+
+    size = os.path.getsize(log_path)
+    bounds = [size * k // workers for k in range(workers + 1)]
+    parts = [f"{out_path}.part{k}" for k in range(workers)]
+    shards = [
+        (graph_path, log_path, bounds[k], bounds[k + 1], parts[k], concurrency) for k in range(workers)
+    ]
+    with ProcessPoolExecutor(workers) as pool:
+        count = sum(pool.map(run_shard, shards))
+
+    files = [open(p, encoding="utf-8") for p in parts]
+    try:
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.writelines(heapq.merge(*files, key=_offset))
+    finally:
+        for f in files:
+            f.close()
+        for p in parts:
+            os.remove(p)
+    return count
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def _show(value: Any, width: int) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= width else text[: width - 1] + "…"
+
+
+def diff(
+    before_path: str, after_path: str, out: TextIO, fields: tuple[str, ...] = DIFF_FIELDS, limit: int = 50
+) -> int:
+    """Print changed requests side by side; return the number of changed requests."""
+    latencies: dict[str, list[float]] = {"before": [], "after": []}
+    errors = {"before": 0, "after": 0}
+    changed = dict.fromkeys(fields, 0)
+    total = differing = unmatched = 0
+
+    with open(before_path, encoding="utf-8") as fa, open(after_path, encoding="utf-8") as fb:
+        a_iter = (json.loads(line) for line in fa)
+        b_iter = (json.loads(line) for line in fb)
+        a, b = next(a_iter, None), next(b_iter, None)
+        while a is not None or b is not None:
+            # 两份结果都按 offset 排序，归并连接即可流式比较
+            if b is None or (a is not None and a["offset"] < b["offset"]):
+                unmatched, a = unmatched + 1, next(a_iter, None)
+                continue
+            if a is None or b["offset"] < a["offset"]:
+                unmatched, b = unmatched + 1, next(b_iter, None)
+                continue
+
+            total += 1
+            for side, record in (("before", a), ("after", b)):
+                latencies[side].append(record.get("latency_ms") or 0.0)
+                errors[side] += record.get("error") is not None
+            fields_changed = [f for f in fields if a.get(f) != b.get(f)]
+            for f in fields_changed:
+                changed[f] += 1
+            if fields_changed:
+                differing += 1
+                if differing <= limit:
+                    out.write(f"\n@{a['offset']} {_show(a.get('input'), 70)}\n")
+                    for f in fields_changed:
+                        out.write(f"  {f:6} {_show(a.get(f), 50):50} │ {_show(b.get(f), 50)}\n")
+            a, b = next(a_iter, None), next(b_iter, None)
+
+    out.write(f"\n{total} requests compared, {differing} changed")
+    out.write(f" ({', '.join(f'{f}: {n}' for f, n in changed.items())})")
+    if unmatched:
+        out.write(f", {unmatched} present in only one file")
+    out.write("\n")
+    for side in ("before", "after"):
+        values = latencies[side]
+        out.write(
+            f"{side:6} p50 {_percentile(values, 50):8.2f}ms  p99 {_percentile(values, 99):8.2f}ms"
+            f"  errors {errors[side]}\n"
+        )
+    return differing
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m agent.replay", description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="replay a JSONL log through the graph")
+    run_parser.add_argument("log", help="JSONL file of logged user messages")
+    run_parser.add_argument("-o", "--output", required=True, help="where to write the result JSONL")
+    run_parser.add_argument("--graph", default=DEFAULT_GRAPH, help="module:attribute of the graph")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per worker")
+    run_parser.add_argument("--workers", type=int, default=1, help="worker processes (byte-range shards)")
+
+    diff_parser = commands.add_parser("diff", help="compare two replay results")
+    diff_parser.add_argument("before")
+    diff_parser.add_argument("after")
+    diff_parser.add_argument("--fields", default=",".join(DIFF_FIELDS), help="comma-separated fields to compare")
+    diff_parser.add_argument("--limit", type=int, default=50, help="changed requests to print")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        start = time.perf_counter()
+        count = run(args.log, args.output, args.graph, args.concurrency, args.workers)
+        elapsed = time.perf_counter() - start
+        sys.stderr.write(f"replayed {count} requests in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s)\n")
+        return 0
+    fields = tuple(f for f in args.fields.split(",") if f)
+    return 1 if diff(args.before, args.after, sys.stdout, fields, args.limit) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
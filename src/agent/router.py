@@ -0,0 +1,74 @@
+"""Cheap intent pre-router that runs before `weather_node`.
+
+The router looks at a bounded prefix of the latest user message and decides
+which branch of the graph should handle it. Classification is a single
+`KeywordAutomaton` scan, so its cost is capped by `ROUTER_SCAN_CHARS`
+regardless of message size or keyword count.
+"""
+
+from typing import Iterable, Literal
+
+from agent.matching import KeywordAutomaton, keyword_table, message_text
+
+Intent = Literal["weather", "chitchat", "query"]
+
+# 只扫描消息开头的这部分字符，路由延迟因此有上界
+ROUTER_SCAN_CHARS = 512
+
+WEATHER_KEYWORDS = (
+    "天气", "气温", "温度", "气候", "湿度", "风速", "刮风", "大风",
+    "下雨", "降雨", "下雪", "晴天", "多云", "阴天", "雾霾", "带伞",
+    "冷不冷", "热不热", "穿什么",
+    "weather", "temperature", "forecast", "humidity",
+)
+
+
+# 排名 / 筛选类问题的信号词，命中后交给查询节点做完整解析
+QUERY_KEYWORDS = (
+    "最热", "最冷", "最高", "最低", "最大", "最小", "最潮湿", "最干燥", "最暖",
+    "排名", "排行", "低于", "高于", "小于", "大于", "超过", "以上", "以下",
+    "hottest", "coldest", "windiest", "warmest", "top", "rank", "below", "above",
+)
+
+
+# 追问信号词：只有上一轮已解析出城市时才按天气处理（“那明天呢？”）
+FOLLOW_UP_KEYWORDS = (
+    "呢", "那", "还有", "明天", "后天", "周末", "这周", "华氏", "摄氏",
+    "what about", "how about",
+)
+
+
+class IntentRouter:
+    """Classify a message as weather, query or chitchat with one automaton pass."""
+
+    def __init__(self, cities: Iterable[str], scan_chars: int = ROUTER_SCAN_CHARS) -> None:
+        """Precompile weather / query keywords plus the supported city names."""
+        self.scan_chars = scan_chars
+        self._automaton: KeywordAutomaton[str] = KeywordAutomaton(
+            keyword_table([
+                (FOLLOW_UP_KEYWORDS, "follow_up"),
+                (WEATHER_KEYWORDS, "weather"),
+                (cities, "weather"),
+                (QUERY_KEYWORDS, "query"),
+            ])
+        )
+
+    def classify(self, content: object, allow_query: bool = True, follow_up: bool = False) -> Intent:
+        """Return the intent for raw message `content` (str or content blocks).
+
+        `follow_up` is True when the thread already has a resolved city, so
+        bare follow-ups ("湿度呢？") are treated as weather questions.
+        """
+        text = message_text(content, self.scan_chars).lower()
+        if not text.strip():
+            # 空消息沿用原有行为：返回默认城市的天气
+            return "weather"
+        intent: Intent = "chitchat"
+        for _, _, label in self._automaton.iter_matches(text):
+            if label == "query" and allow_query:
+                return "query"
+            if label == "weather" or (label == "follow_up" and follow_up):
+                intent = "weather"
+                if not allow_query:
+                    break
+        return intent
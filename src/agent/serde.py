@@ -0,0 +1,216 @@
+"""Compact checkpoint serializer for the agent's own state types.
+
+Once a thread is checkpointed, every step serialises the whole ``messages``
+and ``ui`` channels again. The default `JsonPlusSerializer` writes each
+message as a pydantic dump, repeating the module, class name and every field
+(defaults included) per message, and repeats the key names of every UI
+props dict.
+
+`CompactSerializer` writes a blob as two msgpack documents: a table of the
+dict keys and message fields used in it, then the value with every key
+replaced by its index in the table. Messages of the known classes are
+written as ``[class code, {field: value}]`` with default-valued fields
+left out; tuples get their own extension so they do not come back as lists. Blobs at or over `compress_threshold` bytes are zlib-compressed
+when that makes them smaller. Values this module does not know (sets,
+datetimes, ``Send``, pydantic models, dicts with non-string keys) are
+delegated to the fallback serializer and embedded as an opaque extension,
+and blobs written by the fallback still load, so the serializer can be
+swapped into an existing checkpointer::
+
+    InMemorySaver(serde=CompactSerializer())
+"""
+
+import struct
+import zlib
+from typing import Any, Iterable
+
+import ormsgpack
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+COMPACT = "compact"
+COMPACT_ZLIB = "compact+zlib"
+COMPRESS_THRESHOLD = 4096
+
+# 扩展类型编号
+EXT_MESSAGE = 1
+EXT_FALLBACK = 2
+EXT_TUPLE = 3
+
+# 编号即在本元组中的位置，只能在末尾追加
+MESSAGE_CLASSES: tuple[type[BaseMessage], ...] = (
+    HumanMessage,
+    AIMessage,
+    SystemMessage,
+    ToolMessage,
+    RemoveMessage,
+    AIMessageChunk,
+)
+
+_HEADER = struct.Struct("<I")  # 键表长度
+_PACK_OPTIONS = ormsgpack.OPT_NON_STR_KEYS
+
+
+def _defaults(cls: type[BaseMessage]) -> dict[str, Any]:
+    # 字段默认值，等于默认值的字段不写入
+    defaults: dict[str, Any] = {}
+    for name, field in cls.model_fields.items():
+        if field.default_factory is not None:
+            defaults[name] = field.default_factory()  # type: ignore[call-arg]
+        elif not field.is_required():
+            defaults[name] = field.default
+    return defaults
+
+
+_MESSAGE_CODES = {cls: code for code, cls in enumerate(MESSAGE_CLASSES)}
+_MESSAGE_DEFAULTS = {cls: _defaults(cls) for cls in MESSAGE_CLASSES}
+_MESSAGE_DEFAULTS[RemoveMessage]["content"] = ""  # 构造函数不接受 content
+_MISSING = object()
+_SCALARS = frozenset((str, bool, int, float, bytes))
+
+
+class _Opaque:
+    """A fallback-decoded value; the key restoration pass must not descend into it."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+
+class _Encoder:
+    """One blob's worth of state: the key table being built."""
+
+    __slots__ = ("keys", "_fallback")
+
+    def __init__(self, fallback: SerializerProtocol) -> None:
+        self.keys: dict[str, int] = {}
+        self._fallback = fallback
+
+    def encode(self, obj: Any) -> Any:
+        # 按精确类型判断：子类（枚举等）交给后备序列化器处理
+        cls = type(obj)
+        if obj is None or cls in _SCALARS:
+            return obj
+        if cls is list:
+            return [self.encode(item) for item in obj]
+        if cls is tuple:
+            # msgpack 数组读回来是 list，元组单独标记以保持类型
+            return ormsgpack.Ext(EXT_TUPLE, ormsgpack.packb([self.encode(item) for item in obj], option=_PACK_OPTIONS))
+        if cls is dict:
+            if all(type(k) is str for k in obj):
+                return self._map(obj.items())
+        elif cls in _MESSAGE_CODES:
+            return self._message(obj)
+        return ormsgpack.Ext(EXT_FALLBACK, ormsgpack.packb(self._fallback.dumps_typed(obj)))
+
+    def _map(self, items: Iterable[tuple[str, Any]]) -> dict[int, Any]:
+        # 字符串键替换为键表下标；载荷中的映射因此全部是整数键
+        keys = self.keys
+        encoded: dict[int, Any] = {}
+        for k, v in items:
+            index = keys.get(k)
+            if index is None:
+                index = keys[k] = len(keys)
+            encoded[index] = v if v is None or type(v) in _SCALARS else self.encode(v)
+        return encoded
+
+    def _message(self, message: BaseMessage) -> ormsgpack.Ext:
+        cls = type(message)
+        defaults = _MESSAGE_DEFAULTS[cls]
+        fields = message.__dict__
+        if message.__pydantic_extra__:
+            fields = {**fields, **message.__pydantic_extra__}
+        # type 由类编号决定；等于默认值的字段不写入
+        kept = [(k, v) for k, v in fields.items() if k != "type" and defaults.get(k, _MISSING) != v]
+        return ormsgpack.Ext(EXT_MESSAGE, ormsgpack.packb([_MESSAGE_CODES[cls], self._map(kept)], option=_PACK_OPTIONS))
+
+
+class _Decoder:
+    """Restore the keys of one blob and rebuild its messages."""
+
+    __slots__ = ("keys", "_fallback")
+
+    def __init__(self, keys: list[str], fallback: SerializerProtocol) -> None:
+        self.keys = keys
+        self._fallback = fallback
+
+    def ext_hook(self, code: int, data: bytes) -> Any:
+        unpacked = ormsgpack.unpackb(data, ext_hook=self.ext_hook, option=_PACK_OPTIONS)
+        if code == EXT_MESSAGE:
+            class_code, fields = unpacked
+            return MESSAGE_CLASSES[class_code](**self.restore(fields))
+        if code == EXT_FALLBACK:
+            return _Opaque(self._fallback.loads_typed(tuple(unpacked)))
+        if code == EXT_TUPLE:
+            # 在这里恢复元素的键；外层的 restore 不进入元组
+            return tuple(self.restore(item) for item in unpacked)
+        raise ValueError(f"Unknown extension type in compact blob: {code}")
+
+    def restore(self, obj: Any) -> Any:
+        cls = type(obj)
+        if cls is dict:
+            keys = self.keys
+            restore = self.restore
+            return {keys[k]: v if type(v) in _SCALARS or v is None else restore(v) for k, v in obj.items()}
+        if cls is list:
+            return [self.restore(item) for item in obj]
+        if cls is _Opaque:
+            return obj.value
+        return obj
+
+
+class CompactSerializer(SerializerProtocol):
+    """Checkpoint serializer with interned keys, positional messages and optional zlib."""
+
+    def __init__(
+        self,
+        compress_threshold: int | None = COMPRESS_THRESHOLD,
+        level: int = 1,
+        fallback: SerializerProtocol | None = None,
+    ) -> None:
+        """Compress blobs of at least `compress_threshold` bytes (None: never) at zlib `level`.
+
+        `fallback` (default `JsonPlusSerializer`) handles the types this
+        module does not encode and the blobs it did not write.
+        """
+        self.compress_threshold = compress_threshold
+        self.level = level
+        self.fallback = fallback or JsonPlusSerializer()
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        """Serialise `obj`; None and raw bytes keep the fallback's encoding."""
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return self.fallback.dumps_typed(obj)
+        encoder = _Encoder(self.fallback)
+        payload = ormsgpack.packb(encoder.encode(obj), option=_PACK_OPTIONS)
+        table = ormsgpack.packb(list(encoder.keys))
+        blob = b"".join((_HEADER.pack(len(table)), table, payload))
+        if self.compress_threshold is not None and len(blob) >= self.compress_threshold:
+            compressed = zlib.compress(blob, self.level)
+            if len(compressed) < len(blob):
+                return COMPACT_ZLIB, compressed
+        return COMPACT, blob
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        """Deserialise a blob written by this serializer or by the fallback."""
+        type_, blob = data
+        if type_ == COMPACT_ZLIB:
+            blob = zlib.decompress(blob)
+        elif type_ != COMPACT:
+            return self.fallback.loads_typed(data)
+        (size,) = _HEADER.unpack_from(blob)
+        start = _HEADER.size
+        decoder = _Decoder(ormsgpack.unpackb(blob[start : start + size]), self.fallback)
+        return decoder.restore(
+            ormsgpack.unpackb(blob[start + size :], ext_hook=decoder.ext_hook, option=_PACK_OPTIONS)
+        )
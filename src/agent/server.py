@@ -0,0 +1,551 @@
+"""Minimal self-hosted ASGI server that streams graph runs over SSE.
+
+Usage::
+
+    python -m agent.server --port 2024        # built-in HTTP/1.1 server, no extra dependencies
+    uvicorn agent.server:app --port 2024      # or any ASGI server
+
+Endpoints::
+
+    POST /runs/stream                        stateless run
+    POST /threads/{thread_id}/runs/stream    run on a checkpointed thread
+    GET  /threads/{thread_id}/ui/stream      mirror a thread's UI events (`agent.graph.ui_bus`)
+    GET  /metrics                            Prometheus text from `agent.metrics`
+    GET  /ok                                 health check
+
+A run request body has the LangGraph platform shape,
+``{"input": {"messages": [{"type": "human", "content": "北京天气"}]},
+"config": {"configurable": {...}}}``. The response is ``text/event-stream``:
+one ``metadata`` frame, then ``messages`` and ``ui`` frames as the graph
+produces them, then ``end`` (or ``error``).
+
+Backpressure: at most `max_streams` responses stream at once, beyond that
+the server answers 503 with ``Retry-After``. Each stream has a bounded
+frame queue between the run and the socket, so a slow client pauses its
+own run instead of buffering without limit, and a client that accepts
+nothing for `send_timeout` seconds is dropped and its run cancelled. Runs
+on the same thread are serialised; different threads run concurrently.
+Idle streams get an SSE comment every `keepalive` seconds so proxies keep
+the connection open.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import sys
+import uuid
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, MutableMapping
+from urllib.parse import unquote
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.metrics import REGISTRY
+from agent.serde import CompactSerializer
+from agent.tracing import TRACER, FileExporter
+from agent.ui_bus import UIEventBus, format_sse
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+REGISTRY.describe("server_requests_total", "HTTP requests by route and status")
+REGISTRY.describe("server_streams_active", "Stream requests holding a slot (reading the body or streaming)")
+REGISTRY.describe("server_streams_aborted_total", "SSE streams ended before the run finished, by reason")
+
+KEEPALIVE = b": keepalive\n\n"
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),  # 关闭反向代理的响应缓冲
+]
+STREAM_MODES = ["messages", "custom"]
+
+_END = b""  # 生产者结束标记（正常帧永远非空）
+
+
+class HTTPError(Exception):
+    """An error answered with a JSON body instead of a stream."""
+
+    def __init__(self, status: int, detail: str, headers: list[tuple[bytes, bytes]] | None = None) -> None:
+        """Respond with `status` and ``{"detail": detail}``."""
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.headers = headers or []
+
+
+class ClientStalled(Exception):
+    """The client accepted nothing for `send_timeout` seconds."""
+
+
+class StreamServer:
+    """ASGI app exposing `graph.astream` as Server-Sent Events."""
+
+    def __init__(
+        self,
+        graph: Any,
+        threaded_graph: Any | None = None,
+        ui_bus: UIEventBus | None = None,
+        max_streams: int = 256,
+        queue_size: int = 64,
+        keepalive: float = 15.0,
+        send_timeout: float = 30.0,
+        max_body: int = 1 << 20,
+    ) -> None:
+        """Serve `graph` statelessly and `threaded_graph` (with a checkpointer) per thread."""
+        self.graph = graph
+        self.threaded_graph = threaded_graph or graph
+        self.ui_bus = ui_bus
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.send_timeout = send_timeout
+        self.max_body = max_body
+        self.active = 0
+        # thread_id -> [锁, 引用计数]；同一会话的运行串行执行，引用归零后删除
+        self._threads: dict[str, list[Any]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Dispatch one ASGI connection."""
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        status = 500
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method, path = scope["method"], scope["path"]
+        parts = path.strip("/").split("/")
+        route = "other"
+        try:
+            if path == "/ok":
+                route = "ok"
+                _allow(method, "GET")
+                await _respond(tracked_send, 200, {"ok": True})
+            elif path == "/metrics":
+                route = "metrics"
+                _allow(method, "GET")
+                body = REGISTRY.render().encode()
+                await _respond_bytes(tracked_send, 200, body, b"text/plain; version=0.0.4")
+            elif path == "/runs/stream":
+                route = "runs"
+                _allow(method, "POST")
+                await self._run(receive, tracked_send, None)
+            elif len(parts) == 4 and parts[0] == "threads" and parts[2:] == ["runs", "stream"]:
+                route = "thread_runs"
+                _allow(method, "POST")
+                await self._run(receive, tracked_send, parts[1])
+            elif len(parts) == 4 and parts[0] == "threads" and parts[2:] == ["ui", "stream"]:
+                route = "thread_ui"
+                _allow(method, "GET")
+                await self._mirror(receive, tracked_send, parts[1])
+            else:
+                raise HTTPError(404, "not found")
+        except HTTPError as e:
+            await _respond(tracked_send, e.status, {"detail": e.detail}, e.headers)
+        except ClientStalled:
+            pass  # 连接直接放弃，不再发送结束分块
+        finally:
+            REGISTRY.inc("server_requests_total", route=route, status=str(status))
+
+    async def _run(self, receive: Receive, send: Send, thread_id: str | None) -> None:
+        with self._reserve():
+            await self._run_reserved(receive, send, thread_id)
+
+    async def _run_reserved(self, receive: Receive, send: Send, thread_id: str | None) -> None:
+        payload = _parse_run(await _read_body(receive, self.max_body))
+        config = payload.get("config") or {}
+        configurable = dict(config.get("configurable") or {})
+        # 不允许客户端让服务器写任意文件
+        configurable.pop("ui_sink", None)
+        if thread_id is not None:
+            configurable["thread_id"] = thread_id
+        run_id = uuid.uuid4()
+        run_config = {"configurable": configurable, "run_id": run_id}
+        graph = self.graph if thread_id is None else self.threaded_graph
+
+        queue: asyncio.Queue[bytes] = asyncio.Queue(self.queue_size)
+
+        async def produce() -> None:
+            try:
+                stream = graph.astream(payload["input"], run_config, stream_mode=STREAM_MODES)
+                async with self._thread_lock(thread_id), aclosing(stream):
+                    async for mode, chunk in stream:
+                        # 队列满时在此等待：慢客户端只会拖慢自己的运行
+                        await queue.put(_frame(mode, chunk))
+                await queue.put(format_sse({"run_id": str(run_id)}, event="end"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put(format_sse({"error": type(e).__name__, "message": str(e)}, event="error"))
+            # 结束标记和普通帧一样等待队列空位，不会因为队列已满而丢失
+            await queue.put(_END)
+
+        metadata = format_sse({"run_id": str(run_id), "thread_id": thread_id}, event="metadata")
+        async with self._stream(receive, send, metadata) as (write, disconnected):
+            producer = asyncio.create_task(produce())
+            try:
+                while not disconnected.done():
+                    try:
+                        frame = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        if producer.done():
+                            # 运行已结束却没有送出结束标记（被取消或意外失败）：结束响应，不再发送心跳
+                            return
+                        try:
+                            frame = await asyncio.wait_for(queue.get(), self.keepalive)
+                        except TimeoutError:
+                            frame = KEEPALIVE
+                    if not frame:  # _END
+                        return
+                    await write(frame)
+            finally:
+                # 等待运行真正结束，释放会话锁后再结束响应
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+
+    async def _mirror(self, receive: Receive, send: Send, thread_id: str) -> None:
+        if self.ui_bus is None:
+            raise HTTPError(404, "UI mirroring is not enabled")
+        metadata = format_sse({"thread_id": thread_id}, event="metadata")
+        with self._reserve():
+            subscription = self.ui_bus.subscribe(thread_id)
+            try:
+                async with self._stream(receive, send, metadata) as (write, disconnected):
+                    async for frame in subscription.sse(self.keepalive):
+                        if disconnected.done():
+                            return
+                        await write(frame)
+            finally:
+                subscription.close()
+
+    @contextmanager
+    def _reserve(self) -> Iterator[None]:
+        """Take one of `max_streams` slots for the whole request, or answer 503."""
+        # 检查与占用之间没有 await：读请求体期间的并发请求也会看到这个名额已被占用
+        if self.active >= self.max_streams:
+            REGISTRY.inc("server_streams_aborted_total", reason="capacity")
+            raise HTTPError(503, "too many concurrent streams", [(b"retry-after", b"1")])
+        self.active += 1
+        REGISTRY.set("server_streams_active", self.active)
+        try:
+            yield
+        finally:
+            self.active -= 1
+            REGISTRY.set("server_streams_active", self.active)
+
+    @asynccontextmanager
+    async def _stream(
+        self, receive: Receive, send: Send, first: bytes
+    ) -> AsyncIterator[tuple[Callable[[bytes], Awaitable[None]], "asyncio.Task[None]"]]:
+        """Start an SSE response; yields a bounded-time writer and a disconnect task."""
+        disconnected = asyncio.create_task(_wait_disconnect(receive))
+
+        async def write(frame: bytes) -> None:
+            try:
+                async with asyncio.timeout(self.send_timeout):
+                    await send({"type": "http.response.body", "body": frame, "more_body": True})
+            except TimeoutError:
+                # 客户端长时间不读取：放弃该连接并取消运行
+                REGISTRY.inc("server_streams_aborted_total", reason="send_timeout")
+                raise ClientStalled from None
+
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+            await write(first)
+            yield write, disconnected
+            if disconnected.done():
+                REGISTRY.inc("server_streams_aborted_total", reason="disconnect")
+            else:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            disconnected.cancel()
+
+    @asynccontextmanager
+    async def _thread_lock(self, thread_id: str | None) -> AsyncIterator[None]:
+        if thread_id is None:
+            yield
+            return
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            entry = self._threads[thread_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._threads[thread_id]
+
+
+def create_app(graph: Any = None, threaded_graph: Any = None, **options: Any) -> StreamServer:
+    """Build the app; defaults to `agent.graph.graph` plus an in-memory checkpointed copy."""
+    if graph is None:
+        module = importlib.import_module("agent.graph")
+        graph = module.graph
+        threaded_graph = threaded_graph or module.builder.compile(checkpointer=InMemorySaver(serde=CompactSerializer()))
+        options.setdefault("ui_bus", module.ui_bus)
+    return StreamServer(graph, threaded_graph, **options)
+
+
+def _frame(mode: str, chunk: Any) -> bytes:
+    if mode == "messages":
+        message, metadata = chunk
+        data = {
+            "type": message.type,
+            "id": message.id,
+            "content": message.content,
+            "node": metadata.get("langgraph_node"),
+        }
+        return format_sse(data, event="messages")
+    if isinstance(chunk, dict) and chunk.get("type") in ("ui", "remove-ui"):
+        return format_sse(chunk)
+    return format_sse({"data": chunk}, event="custom")
+
+
+def _parse_run(body: bytes) -> dict[str, Any]:
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "request body is not valid JSON") from None
+    if not isinstance(payload, dict) or not isinstance(payload.get("input"), dict):
+        raise HTTPError(400, "request body must be an object with an 'input' object")
+    config = payload.get("config")
+    if config is not None and not (isinstance(config, dict) and isinstance(config.get("configurable", {}), dict)):
+        raise HTTPError(400, "'config' must be an object with a 'configurable' object")
+    return payload
+
+
+def _allow(method: str, expected: str) -> None:
+    if method != expected:
+        raise HTTPError(405, f"use {expected}", [(b"allow", expected.encode())])
+
+
+async def _read_body(receive: Receive, limit: int) -> bytes:
+    chunks: list[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, "client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise HTTPError(413, "request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _wait_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _respond(send: Send, status: int, data: Any, headers: list[tuple[bytes, bytes]] | None = None) -> None:
+    body = json.dumps(data, ensure_ascii=False).encode()
+    await _respond_bytes(send, status, body, b"application/json", headers)
+
+
+async def _respond_bytes(
+    send: Send, status: int, body: bytes, content_type: bytes, headers: list[tuple[bytes, bytes]] | None = None
+) -> None:
+    head = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *(headers or [])]
+    await send({"type": "http.response.start", "status": status, "headers": head})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# ---------------------------------------------------------------------------
+# Built-in HTTP/1.1 server: enough to self-host the app without uvicorn.
+# One request per connection; responses without a content-length are chunked.
+# ---------------------------------------------------------------------------
+
+MAX_HEADER_BYTES = 64 * 1024
+WRITE_BUFFER_HIGH = 64 * 1024
+
+
+async def start_server(app: ASGIApp, host: str = "127.0.0.1", port: int = 2024) -> asyncio.Server:
+    """Listen on `host`:`port` and serve `app`; returns the running `asyncio.Server`."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await _serve_connection(app, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port, limit=MAX_HEADER_BYTES)
+
+
+async def _serve_connection(app: ASGIApp, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # 写缓冲超过高水位时 drain() 会等待，把慢客户端的背压传回应用
+    writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\nconnection: close\r\n\r\n")
+        return
+    request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nconnection: close\r\n\r\n")
+        return
+    headers = []
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        headers.append((name.encode("latin-1"), value.encode("latin-1")))
+        if name == "content-length":
+            length = int(value) if value.isdigit() else -1
+            if length < 0:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nconnection: close\r\n\r\n")
+                return
+        elif name == "transfer-encoding":
+            writer.write(b"HTTP/1.1 411 Length Required\r\nconnection: close\r\n\r\n")
+            return
+    body = await reader.readexactly(length) if length else b""
+
+    path, _, query = target.partition("?")
+    scope: Scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": unquote(path),
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "headers": headers,
+        "client": writer.get_extra_info("peername"),
+        "server": writer.get_extra_info("sockname"),
+    }
+
+    body_sent = False
+    chunked = False
+
+    async def receive() -> Message:
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        try:
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal chunked
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = message.get("headers", [])
+            chunked = not any(k.lower() == b"content-length" for k, _ in response_headers)
+            lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode()]
+            lines += [k + b": " + v for k, v in response_headers]
+            if chunked:
+                lines.append(b"transfer-encoding: chunked")
+            lines.append(b"connection: close")
+            writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+        elif message["type"] == "http.response.body":
+            data = message.get("body", b"")
+            more = message.get("more_body", False)
+            if chunked:
+                if data:
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                if not more:
+                    writer.write(b"0\r\n\r\n")
+            else:
+                writer.write(data)
+        await writer.drain()
+
+    await app(scope, receive, send)
+
+
+async def _serve_forever(app: ASGIApp, host: str, port: int, refresh_ahead: Any = None) -> None:
+    server = await start_server(app, host, port)
+    if refresh_ahead is not None:
+        refresh_ahead.start()
+    sys.stderr.write(f"serving on http://{host}:{port}\n")
+    async with server:
+        await server.serve_forever()
+
+
+_app: StreamServer | None = None
+
+
+def __getattr__(name: str) -> Any:
+    """Build the default `app` on first access (``uvicorn agent.server:app``)."""
+    # 延迟构建：导入本模块或运行 main() 时不再多编译一份图和检查点
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m agent.server", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2024)
+    parser.add_argument("--max-streams", type=int, default=256, help="concurrent SSE responses before 503")
+    parser.add_argument("--queue-size", type=int, default=64, help="frames buffered per stream")
+    parser.add_argument("--keepalive", type=float, default=15.0, help="seconds between idle keepalives")
+    parser.add_argument("--send-timeout", type=float, default=30.0, help="drop clients that stall this long")
+    parser.add_argument("--trace-file", help="append OTLP/JSON spans to this file (tracing is off without it)")
+    parser.add_argument("--trace-sample", type=float, default=1.0, help="fraction of runs to trace")
+    parser.add_argument("--prefetch-top", type=int, default=0, help="keep the N most requested cities warm (0 = off)")
+    parser.add_argument("--prefetch-rate", type=float, default=1.0, help="upstream prefetches per second")
+    args = parser.parse_args(argv)
+
+    if args.trace_file:
+        TRACER.configure(FileExporter(args.trace_file), sample_rate=args.trace_sample)
+
+    refresh_ahead = None
+    if args.prefetch_top > 0:
+        refresh_ahead = importlib.import_module("agent.graph").enable_refresh_ahead(
+            top_n=args.prefetch_top, rate=args.prefetch_rate
+        )
+    server_app = create_app(
+        max_streams=args.max_streams,
+        queue_size=args.queue_size,
+        keepalive=args.keepalive,
+        send_timeout=args.send_timeout,
+    )
+    try:
+        asyncio.run(_serve_forever(server_app, args.host, args.port, refresh_ahead))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Nearest-neighbour lookup over geographic coordinates.
+
+Points are mapped onto the unit sphere, so the straight-line (chord)
+distance between two points orders them exactly like the great-circle
+distance, with no special cases at the antimeridian or the poles. The
+`KDTree` stores the points in flat ``array('d')`` columns in tree order
+(the median of each range is its root), so a lookup visits O(log n) nodes
+on typical data and allocates nothing but a small stack.
+
+`CityLocator` puts the bundled coordinate gazetteer in front of the tree:
+a place without weather data ("东京", "成都") resolves to the nearest city
+that has some.
+"""
+
+import math
+from array import array
+from typing import Iterable, NamedTuple
+
+from agent.matching import KeywordAutomaton
+from agent.partitions import PartitionedWeatherStore
+from agent.weather_store import WeatherTable
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    """Map decimal degrees onto the unit sphere."""
+    phi, lam = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi)
+
+
+def chord_to_km(chord: float) -> float:
+    """Convert a chord length on the unit sphere to a great-circle distance."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    dphi = math.radians(lat2 - lat1)
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class KDTree:
+    """Static 3-d tree over ``(lat, lon)`` points for nearest-neighbour queries."""
+
+    __slots__ = ("_xs", "_ys", "_zs", "_ids")
+
+    def __init__(self, points: Iterable[tuple[float, float]]) -> None:
+        """Build the tree; lookups return indexes into `points`."""
+        vectors = [unit_vector(lat, lon) for lat, lon in points]
+        columns = tuple(array("d", (v[axis] for v in vectors)) for axis in range(3))
+        ids = list(range(len(vectors)))
+
+        # 每个区间按当前轴排序后取中位数作根，左右子区间继续按下一个轴划分
+        stack = [(0, len(ids), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= 1:
+                continue
+            ids[lo:hi] = sorted(ids[lo:hi], key=columns[depth % 3].__getitem__)
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+        self._xs, self._ys, self._zs = (array("d", (column[i] for i in ids)) for column in columns)
+        self._ids = array("i", ids)
+
+    def __len__(self) -> int:
+        """Return the number of points."""
+        return len(self._ids)
+
+    def nearest(self, lat: float, lon: float) -> tuple[int, float] | None:
+        """Return ``(index, distance_km)`` of the point closest to `lat`/`lon`, or None if empty."""
+        if not self._ids:
+            return None
+        xs, ys, zs = self._xs, self._ys, self._zs
+        columns = (xs, ys, zs)
+        query = unit_vector(lat, lon)
+        qx, qy, qz = query
+        best, best_d2 = -1, math.inf
+
+        # 栈中记录子树与查询点在分割轴上距离的下界，出栈时再与当前最优比较
+        stack = [(0, len(xs), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            if bound >= best_d2:
+                continue
+            mid = (lo + hi) >> 1
+            dx, dy, dz = xs[mid] - qx, ys[mid] - qy, zs[mid] - qz
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 < best_d2:
+                best, best_d2 = mid, d2
+            axis = depth % 3
+            diff = query[axis] - columns[axis][mid]
+            if diff < 0:
+                near_lo, near_hi, far_lo, far_hi = lo, mid, mid + 1, hi
+            else:
+                near_lo, near_hi, far_lo, far_hi = mid + 1, hi, lo, mid
+            if far_lo < far_hi:
+                stack.append((far_lo, far_hi, depth + 1, diff * diff))
+            if near_lo < near_hi:
+                stack.append((near_lo, near_hi, depth + 1, 0.0))
+        return self._ids[best], chord_to_km(math.sqrt(best_d2))
+
+
+class NearestCity(NamedTuple):
+    """A place resolved to the closest city that has weather data."""
+
+    place: str
+    city: str
+    distance_km: float
+
+
+class CityLocator:
+    """Resolve gazetteer places to the nearest city of a `WeatherTable` or partitioned store."""
+
+    def __init__(self, table: WeatherTable | PartitionedWeatherStore, places: Iterable[tuple[str, float, float]]) -> None:
+        """Index ``(name, lat, lon)`` places; the tree over `table`'s cities is built lazily."""
+        self._table = table
+        self.coordinates: dict[str, tuple[float, float]] = {name: (lat, lon) for name, lat, lon in places}
+        self._automaton: KeywordAutomaton[str] = KeywordAutomaton({name: name for name in self.coordinates})
+        self._version = -1
+        self._cities: tuple[str, ...] = ()
+        self._tree = KDTree(())
+
+    def _index(self) -> KDTree:
+        # 表重新加载后按新的城市集合重建，与 RankingIndex 一致
+        if self._version != self._table.version:
+            self._cities = tuple(c for c in self._table.cities if c in self.coordinates)
+            self._tree = KDTree(self.coordinates[c] for c in self._cities)
+            self._version = self._table.version
+        return self._tree
+
+    def nearest(self, lat: float, lon: float) -> tuple[str, float] | None:
+        """Return the closest city with data and its distance, or None if none is geocoded."""
+        found = self._index().nearest(lat, lon)
+        if found is None:
+            return None
+        idx, distance = found
+        return self._cities[idx], distance
+
+    def nearest_to(self, place: str) -> NearestCity | None:
+        """Resolve a gazetteer place name; None if the place has no coordinates."""
+        coordinates = self.coordinates.get(place)
+        found = coordinates and self.nearest(*coordinates)
+        return NearestCity(place, *found) if found else None
+
+    def find(self, text: str) -> str | None:
+        """Return the leftmost-longest place name in `text`."""
+        best: tuple[int, int, str] | None = None
+        for start, name, _ in self._automaton.iter_matches(text):
+            key = (start, -len(name), name)
+            if best is None or key < best:
+                best = key
+        return best[2] if best else None
+
+    def locate(self, text: str) -> NearestCity | None:
+        """Resolve the first place named in `text` to the nearest city with data."""
+        place = self.find(text)
+        return self.nearest_to(place) if place else None
@@ -0,0 +1,463 @@
+"""OpenTelemetry-compatible spans for graph runs, nodes and data fetches.
+
+Spans follow the OpenTelemetry data model (128-bit trace ids, 64-bit span
+ids, parent links, typed attributes, a status) and are exported as OTLP/JSON
+``ExportTraceServiceRequest`` documents, so a file written by `FileExporter`
+can be replayed into any OTLP collector or viewer. No SDK or collector is
+needed: exporters are plain objects with ``export(spans)`` and
+``shutdown()``.
+
+Where spans come from:
+
+* ``graph.run`` and one span per node, from `TracingHandler`, a callback
+  handler attached to every run while tracing is configured;
+* explicit ``TRACER.span(...)`` blocks (extraction tiers, provider calls),
+  which nest under the current node because `traced_node` makes the node
+  span current while the node body runs.
+
+Sampling is decided once per trace from the trace id (OpenTelemetry's
+``TraceIdRatioBased``), and children follow their root. With no exporter
+configured `Tracer.span` returns a shared no-op and no handler is attached,
+so tracing off costs one attribute check per block. A trace is exported
+once its last span ends.
+"""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Protocol,
+    Sequence,
+    TypeVar,
+)
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+# OTLP 状态码
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# OTLP SpanKind：INTERNAL
+KIND_INTERNAL = 1
+
+SCOPE_NAME = "agent"
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+class _Trace:
+    """Finished spans of one sampled trace, exported when the last span ends."""
+
+    __slots__ = ("open", "spans")
+
+    def __init__(self) -> None:
+        """Start with no open or finished spans."""
+        self.open = 0
+        self.spans: list[Span] = []
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status",
+                 "status_message", "_start_perf", "_trace", "_tracer")
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: int, parent_id: int | None, trace: _Trace) -> None:
+        """Start `name` now in `trace`, under `parent_id` (None for a root span)."""
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64) or 1
+        self.parent_id = parent_id
+        self.attributes: dict[str, Any] = {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        # 结束时间由单调时钟推算，不受系统时间调整影响
+        self._start_perf = time.perf_counter_ns()
+        self._trace = trace
+        self._tracer = tracer
+        trace.open += 1
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set one attribute (str, bool, int, float or a list of them)."""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        """Set several attributes; None values are skipped."""
+        self.attributes.update((k, v) for k, v in attributes.items() if v is not None)
+
+    def set_status(self, code: int, message: str = "") -> None:
+        """Set the OTLP status code and description."""
+        self.status = code
+        self.status_message = message
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span failed with `error`."""
+        self.set_status(STATUS_ERROR, f"{type(error).__name__}: {error}")
+
+    def end(self) -> None:
+        """Finish the span; the trace is exported when its last span ends."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._start_perf
+        trace = self._trace
+        trace.spans.append(self)
+        trace.open -= 1
+        if trace.open == 0:
+            spans, trace.spans = trace.spans, []
+            self._tracer.export(spans)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds (0 while the span is open)."""
+        return 0.0 if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Stands in for spans that are not recorded; marks its subtree unsampled."""
+
+    __slots__ = ()
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        pass
+
+    def set_status(self, code: int, message: str = "") -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Span | _NoopSpan | None] = ContextVar("agent_current_span", default=None)
+
+
+def current_span() -> Span | _NoopSpan:
+    """Return the span of the running block, or the no-op span outside any trace."""
+    return _current.get() or NOOP_SPAN
+
+
+class _SpanScope:
+    """Context manager that starts a span and makes it current."""
+
+    __slots__ = ("_tracer", "_name", "_attributes", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, Any]) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self) -> Span | _NoopSpan:
+        span = self._span = self._tracer.start_span(self._name, _current.get(), self._attributes)
+        self._token = _current.set(span)
+        return span
+
+    def __exit__(self, exc_type: Any, exc: BaseException | None, tb: Any) -> None:
+        _current.reset(self._token)
+        if exc is not None:
+            self._span.record_error(exc)
+        self._span.end()
+
+
+class SpanExporter(Protocol):
+    """Destination of finished traces."""
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Receive the spans of one trace (or of its late children)."""
+        ...
+
+    def shutdown(self) -> None:
+        """Flush and release resources."""
+        ...
+
+
+class Tracer:
+    """Creates spans, samples traces and hands finished traces to the exporter."""
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 1.0) -> None:
+        """Export to `exporter` (None = tracing off), keeping `sample_rate` of traces."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.handler = TracingHandler(self)
+
+    def span(self, name: str, **attributes: Any) -> "_SpanScope | _NoopSpan":
+        """Return a context manager timing a block as a child of the current span."""
+        if self.exporter is None:
+            return NOOP_SPAN
+        return _SpanScope(self, name, attributes)
+
+    def start_span(
+        self, name: str, parent: Span | _NoopSpan | None, attributes: Mapping[str, Any] | None = None
+    ) -> Span | _NoopSpan:
+        """Start a span under `parent` (a new trace if None); call ``end()`` when done."""
+        if self.exporter is None or parent is NOOP_SPAN:
+            return NOOP_SPAN
+        if parent is None:
+            trace_id = random.getrandbits(128) or 1
+            if not self.sampled(trace_id):
+                return NOOP_SPAN
+            span = Span(self, name, trace_id, None, _Trace())
+        else:
+            assert isinstance(parent, Span)
+            span = Span(self, name, parent.trace_id, parent.span_id, parent._trace)
+        if attributes:
+            span.set_attributes(attributes)
+        return span
+
+    def sampled(self, trace_id: int) -> bool:
+        """Return the sampling decision from the low 64 bits of the trace id (``TraceIdRatioBased``)."""
+        return (trace_id & 0xFFFFFFFFFFFFFFFF) < self.sample_rate * 2**64
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Hand finished spans to the exporter; exporter errors never reach the caller."""
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export(spans)
+        except Exception:  # noqa: BLE001 - 追踪不能影响业务
+            pass
+
+    def configure(self, exporter: SpanExporter | None, sample_rate: float | None = None) -> None:
+        """Switch the exporter (None = off) and sampling rate.
+
+        Call at startup: runs started from this context, and from tasks
+        created after the call, get ``graph.run`` and node spans.
+        """
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.shutdown()
+        self.exporter = exporter
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        _handler_var.set(self.handler if exporter is not None else None)
+
+
+class TracingHandler(BaseCallbackHandler):
+    """Open a ``graph.run`` span per run and a span per node, keyed by run id."""
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer) -> None:
+        """Report to `tracer`."""
+        self.tracer = tracer
+        self._spans: dict[UUID, Span | _NoopSpan] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start ``graph.run`` for a root run, or a node span for a LangGraph node."""
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            # 根运行的回调在调用方的上下文中执行，可以挂到调用方当前的 span 下
+            self._spans[run_id] = self.tracer.start_span(
+                "graph.run", _current.get(), {"graph": name, "thread_id": metadata.get("thread_id")}
+            )
+        elif name is not None and name == metadata.get("langgraph_node") and parent_run_id in self._spans:
+            self._spans[run_id] = self.tracer.start_span(
+                f"node.{name}", self._spans[parent_run_id], {"node": name, "step": metadata.get("langgraph_step")}
+            )
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """End the run's span."""
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end()
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """End the run's span as failed."""
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.record_error(error)
+            span.end()
+
+    def span_for(self, config: Mapping[str, Any] | None) -> Span | _NoopSpan | None:
+        """Return the node span of the run that `config` was passed to."""
+        callbacks = (config or {}).get("callbacks")
+        run_id = getattr(callbacks, "parent_run_id", None)
+        return self._spans.get(run_id) if run_id is not None else None
+
+
+_handler_var: ContextVar[TracingHandler | None] = ContextVar("agent_tracing_handler", default=None)
+register_configure_hook(_handler_var, inheritable=True)
+
+# 进程级追踪器，默认关闭
+TRACER = Tracer()
+
+
+def traced_node(fn: F) -> F:
+    """Make the node's span current while `fn` runs, so nested spans attach to it."""
+
+    @functools.wraps(fn)
+    async def wrapper(state: Any, config: Any = None) -> Any:
+        # 节点 span 由回调创建；回调结束可能发生在其他任务中，所以在节点协程内切换当前 span
+        if TRACER.exporter is None:
+            return await fn(state, config)
+        span = TRACER.handler.span_for(config)
+        if span is None:
+            return await fn(state, config)
+        token = _current.set(span)
+        try:
+            return await fn(state, config)
+        finally:
+            _current.reset(token)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Run the decorated coroutine function inside a span called `name`."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if TRACER.exporter is None:
+                return await fn(*args, **kwargs)
+            with _SpanScope(TRACER, name, {}):
+                return await fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Mapping[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(spans: Iterable[Span], service_name: str) -> dict[str, Any]:
+    """Build an OTLP/JSON ``ExportTraceServiceRequest`` for `spans`."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": SCOPE_NAME},
+                        "spans": [
+                            {
+                                "traceId": f"{s.trace_id:032x}",
+                                "spanId": f"{s.span_id:016x}",
+                                **({"parentSpanId": f"{s.parent_id:016x}"} if s.parent_id else {}),
+                                "name": s.name,
+                                "kind": KIND_INTERNAL,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": _otlp_attributes(s.attributes),
+                                "status": {"code": s.status, **({"message": s.status_message} if s.status_message else {})},
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class InMemoryExporter:
+    """Keep finished spans in a list (tests, debugging, ad-hoc analysis)."""
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.spans: list[Span] = []
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Append `spans`."""
+        self.spans.extend(spans)
+
+    def shutdown(self) -> None:
+        """Nothing to release."""
+
+    def clear(self) -> None:
+        """Drop the collected spans."""
+        self.spans.clear()
+
+    def named(self, name: str) -> list[Span]:
+        """Return the collected spans called `name`."""
+        return [s for s in self.spans if s.name == name]
+
+
+class FileExporter:
+    """Append one OTLP/JSON document per trace to a file (JSON lines)."""
+
+    def __init__(self, path: str, service_name: str = "weather-agent") -> None:
+        """Append to `path`, creating its directory if needed."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Write `spans` as one line and flush."""
+        line = json.dumps(to_otlp(spans, self.service_name), ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        """Close the file."""
+        with self._lock:
+            self._file.close()
+
+
+def read_spans(path: str) -> Iterator[dict[str, Any]]:
+    """Yield the OTLP/JSON spans written by `FileExporter`."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    yield from scope["spans"]
@@ -1,4 +1,23 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useLayoutEffect, useRef, useCallback } from 'react';
+
+// Supplementary panels of the weather card - match backend agent/panels.py
+interface AirQualityPanel {
+  aqi: number;
+  level: string;
+  pollutant?: string;
+}
+
+interface AlertPanel {
+  level: string;
+  title: string;
+  description: string;
+}
+
+interface SunPanel {
+  sunrise: string | null;
+  sunset: string | null;
+  dayLength: string;
+}
 
 // Weather component props interface - matches backend WeatherOutput
 interface WeatherProps {
@@ -8,6 +27,43 @@ interface WeatherProps {
   humidity: string;
   windSpeed: string;
   description: string;
+  stale?: boolean;
+  airQuality?: AirQualityPanel;
+  alerts?: AlertPanel[];
+  sun?: SunPanel;
+  unavailable?: string[];  // panels whose branch failed or timed out
+}
+
+// Forecast component props interface - matches backend ForecastOutput
+interface ForecastDay {
+  date: string;
+  label: string;
+  condition: string;
+  min: number;
+  max: number;
+  avg: number;
+}
+
+interface ForecastProps {
+  city: string;
+  unit: string;
+  days: ForecastDay[];
+  hourly: number[];
+}
+
+// Comparison list props interface - matches backend WeatherListOutput
+interface WeatherListItem {
+  city: string;
+  value: number;
+  display: string;
+  condition: string;
+}
+
+interface WeatherListProps {
+  title: string;
+  metric: string;
+  unit: string;
+  items: WeatherListItem[];
 }
 
 // Visual mapping functions - keep presentation logic in frontend
@@ -37,15 +93,471 @@ const getBackgroundGradient = (condition: string): string => {
   return gradientMap[condition] || 'linear-gradient(135deg, #74b9ff 0%, #0984e3 100%)';
 };
 
-const WeatherComponent = (props: WeatherProps) => {
+// Stylesheets shared by every instance of a component are injected into
+// <head> once, instead of one <style jsx> block per card.
+const injectedStyles = new Set<string>();
+
+const useSharedStyle = (id: string, css: string) => {
+  useLayoutEffect(() => {
+    if (injectedStyles.has(id) || typeof document === 'undefined') return;
+    if (!document.getElementById(id)) {
+      const style = document.createElement('style');
+      style.id = id;
+      style.textContent = css;
+      document.head.appendChild(style);
+    }
+    injectedStyles.add(id);
+  }, [id, css]);
+};
+
+// One IntersectionObserver per margin for all cards; each card only
+// re-renders when its own visibility flips.
+const makeVisibilityHook = (rootMargin: string) => {
+  const callbacks = new Map<Element, (entry: IntersectionObserverEntry) => void>();
+  let observer: IntersectionObserver | null = null;
+
+  return (ref: React.RefObject<Element>, onChange: (entry: IntersectionObserverEntry) => void) => {
+    useEffect(() => {
+      const element = ref.current;
+      if (!element || typeof IntersectionObserver === 'undefined') return;
+      if (!observer) {
+        observer = new IntersectionObserver(
+          (entries) => entries.forEach((entry) => callbacks.get(entry.target)?.(entry)),
+          { rootMargin },
+        );
+      }
+      callbacks.set(element, onChange);
+      observer.observe(element);
+      return () => {
+        callbacks.delete(element);
+        observer?.unobserve(element);
+      };
+    }, [ref, onChange]);
+  };
+};
+
+const useVisibility = makeVisibilityHook('0px');
+// Virtualised items mount a screen's worth ahead so scrolling never shows blanks
+const useNearViewport = makeVisibilityHook('100% 0px');
+
+const useOnScreen = (ref: React.RefObject<Element>): boolean => {
+  const [onScreen, setOnScreen] = useState(true);
+  const onChange = useCallback((entry: IntersectionObserverEntry) => setOnScreen(entry.isIntersecting), []);
+  useVisibility(ref, onChange);
+  return onScreen;
+};
+
+// Virtualised list mode: an item far from the viewport unmounts its card and
+// leaves a spacer of the card's last measured height, so scroll position and
+// scrollbar length stay put while only nearby cards hold DOM and animations.
+interface VirtualItemProps {
+  estimatedHeight: number;
+  initiallyMounted?: boolean;
+  children: React.ReactNode;
+}
+
+const VirtualItem = ({ estimatedHeight, initiallyMounted = false, children }: VirtualItemProps) => {
+  const ref = useRef<HTMLDivElement>(null);
+  const [mounted, setMounted] = useState(initiallyMounted);
+  const height = useRef(estimatedHeight);
+  const onChange = useCallback((entry: IntersectionObserverEntry) => {
+    if (!entry.isIntersecting) {
+      // 卸载前记录真实高度（回调时子节点仍在 DOM 中）
+      height.current = entry.boundingClientRect.height || height.current;
+    }
+    setMounted(entry.isIntersecting);
+  }, []);
+  useNearViewport(ref, onChange);
+
+  return (
+    <div ref={ref} style={mounted ? undefined : { height: height.current }}>
+      {mounted ? children : null}
+    </div>
+  );
+};
+
+// Placeholder heights until a card has been measured once
+const ESTIMATED_HEIGHTS: Record<string, number> = {
+  weather: 560,
+  forecast: 420,
+  weather_list: 360,
+};
+
+const WEATHER_CSS = `
+  .weather-container {
+    display: flex;
+    justify-content: center;
+    padding: 20px;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+  }
+
+  .weather-container .weather-card {
+    position: relative;
+    width: 350px;
+    min-height: 450px;
+    border-radius: 25px;
+    padding: 30px;
+    color: white;
+    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.2);
+    overflow: hidden;
+    transform: translateY(50px);
+    opacity: 0;
+    transition: all 0.8s cubic-bezier(0.25, 0.46, 0.45, 0.94);
+    backdrop-filter: blur(10px);
+  }
+
+  .weather-container .weather-card.visible {
+    transform: translateY(0);
+    opacity: 1;
+  }
+
+  .weather-container .weather-card::before {
+    content: '';
+    position: absolute;
+    top: 0;
+    left: 0;
+    right: 0;
+    bottom: 0;
+    background: rgba(255, 255, 255, 0.1);
+    border-radius: 25px;
+    backdrop-filter: blur(10px);
+  }
+
+  .weather-container .weather-header {
+    position: relative;
+    z-index: 2;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    margin-bottom: 40px;
+  }
+
+  .weather-container .city-name {
+    font-size: 28px;
+    font-weight: 300;
+    margin: 0;
+    letter-spacing: 1px;
+    animation: weather-slideInLeft 0.8s ease-out 0.3s both;
+  }
+
+  .weather-container .stale-badge {
+    margin-left: 10px;
+    padding: 2px 8px;
+    font-size: 12px;
+    letter-spacing: 0;
+    vertical-align: middle;
+    border-radius: 10px;
+    background: rgba(0, 0, 0, 0.25);
+  }
+
+  .weather-container .weather-icon {
+    font-size: 60px;
+    animation: weather-bounce 2s infinite, weather-slideInRight 0.8s ease-out 0.3s both;
+  }
+
+  .weather-container .temperature-section {
+    position: relative;
+    z-index: 2;
+    text-align: center;
+    margin: 60px 0;
+  }
+
+  .weather-container .temperature {
+    font-size: 72px;
+    font-weight: 100;
+    margin: 0;
+    line-height: 1;
+    animation: weather-scaleIn 1s ease-out 0.6s both;
+    text-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
+  }
+
+  .weather-container .condition {
+    font-size: 22px;
+    font-weight: 300;
+    margin: 10px 0 5px 0;
+    opacity: 0.9;
+    animation: weather-fadeInUp 0.8s ease-out 0.9s both;
+  }
+
+  .weather-container .description {
+    font-size: 16px;
+    opacity: 0.8;
+    font-weight: 300;
+    animation: weather-fadeInUp 0.8s ease-out 1.1s both;
+  }
+
+  .weather-container .weather-details {
+    position: relative;
+    z-index: 2;
+    display: flex;
+    justify-content: space-around;
+    margin-top: 50px;
+  }
+
+  .weather-container .detail-item {
+    display: flex;
+    align-items: center;
+    gap: 12px;
+    animation: weather-fadeInUp 0.8s ease-out 1.3s both;
+  }
+
+  .weather-container .detail-icon {
+    font-size: 24px;
+    animation: weather-pulse 2s infinite;
+  }
+
+  .weather-container .detail-info {
+    display: flex;
+    flex-direction: column;
+  }
+
+  .weather-container .detail-label {
+    font-size: 14px;
+    opacity: 0.8;
+    font-weight: 300;
+  }
+
+  .weather-container .detail-value {
+    font-size: 18px;
+    font-weight: 500;
+  }
+
+  .weather-container .weather-panels {
+    position: relative;
+    z-index: 2;
+    display: flex;
+    flex-wrap: wrap;
+    gap: 8px;
+    margin-top: 24px;
+    font-size: 13px;
+  }
+
+  .weather-container .panel-chip {
+    padding: 4px 10px;
+    border-radius: 12px;
+    background: rgba(0, 0, 0, 0.2);
+  }
+
+  .weather-container .panel-chip.alert {
+    background: rgba(255, 196, 0, 0.45);
+  }
+
+  .weather-container .panel-chip.missing {
+    opacity: 0.6;
+  }
+
+  /* Background Animations */
+  .weather-container .bg-animation {
+    position: absolute;
+    top: 0;
+    left: 0;
+    right: 0;
+    bottom: 0;
+    pointer-events: none;
+    overflow: hidden;
+  }
+
+  .weather-container .cloud {
+    position: absolute;
+    font-size: 30px;
+    opacity: 0.3;
+    animation: weather-float 6s ease-in-out infinite;
+  }
+
+  .weather-container .cloud-1 {
+    top: 15%;
+    left: 10%;
+    animation-delay: 0s;
+  }
+
+  .weather-container .cloud-2 {
+    top: 25%;
+    right: 15%;
+    animation-delay: 3s;
+  }
+
+  .weather-container .sparkle {
+    position: absolute;
+    font-size: 16px;
+    opacity: 0.6;
+    animation: weather-twinkle 3s ease-in-out infinite;
+  }
+
+  .weather-container .sparkle-1 {
+    top: 30%;
+    left: 20%;
+    animation-delay: 0s;
+  }
+
+  .weather-container .sparkle-2 {
+    top: 60%;
+    right: 25%;
+    animation-delay: 1s;
+  }
+
+  .weather-container .sparkle-3 {
+    bottom: 25%;
+    left: 15%;
+    animation-delay: 2s;
+  }
+
+  /* Keyframe Animations */
+  @keyframes weather-slideInLeft {
+    from {
+      transform: translateX(-50px);
+      opacity: 0;
+    }
+    to {
+      transform: translateX(0);
+      opacity: 1;
+    }
+  }
+
+  @keyframes weather-slideInRight {
+    from {
+      transform: translateX(50px);
+      opacity: 0;
+    }
+    to {
+      transform: translateX(0);
+      opacity: 1;
+    }
+  }
+
+  @keyframes weather-scaleIn {
+    from {
+      transform: scale(0.5);
+      opacity: 0;
+    }
+    to {
+      transform: scale(1);
+      opacity: 1;
+    }
+  }
+
+  @keyframes weather-fadeInUp {
+    from {
+      transform: translateY(30px);
+      opacity: 0;
+    }
+    to {
+      transform: translateY(0);
+      opacity: 1;
+    }
+  }
+
+  @keyframes weather-bounce {
+    0%, 20%, 50%, 80%, 100% {
+      transform: translateY(0);
+    }
+    40% {
+      transform: translateY(-10px);
+    }
+    60% {
+      transform: translateY(-5px);
+    }
+  }
+
+  @keyframes weather-float {
+    0%, 100% {
+      transform: translateY(0px);
+    }
+    50% {
+      transform: translateY(-20px);
+    }
+  }
+
+  @keyframes weather-twinkle {
+    0%, 100% {
+      opacity: 0.6;
+      transform: scale(1);
+    }
+    50% {
+      opacity: 1;
+      transform: scale(1.2);
+    }
+  }
+
+  @keyframes weather-pulse {
+    0%, 100% {
+      transform: scale(1);
+    }
+    50% {
+      transform: scale(1.1);
+    }
+  }
+
+  /* Responsive Design */
+  @media (max-width: 480px) {
+    .weather-container .weather-card {
+      width: 300px;
+      min-height: 400px;
+      padding: 25px;
+    }
+
+    .weather-container .temperature {
+      font-size: 60px;
+    }
+
+    .weather-container .city-name {
+      font-size: 24px;
+    }
+
+    .weather-container .weather-icon {
+      font-size: 50px;
+    }
+  }
+
+  /* Off-screen cards pause their infinite animations */
+  .weather-container.paused .weather-icon,
+  .weather-container.paused .detail-icon,
+  .weather-container.paused .cloud,
+  .weather-container.paused .sparkle {
+    animation-play-state: paused;
+  }
+
+  @media (prefers-reduced-motion: reduce) {
+    .weather-container .weather-card {
+      transition: none;
+      transform: none;
+      opacity: 1;
+    }
+
+    .weather-container .weather-card * {
+      animation: none !important;
+    }
+  }
+`;
+
+// Merge-mode updates reuse the card id, so the same instance receives a
+// fresh props object every turn, with freshly decoded nested objects
+// (airQuality, alerts, sun); only re-render when a value changed.
+const sameValue = (a: unknown, b: unknown): boolean => {
+  if (a === b) return true;
+  if (typeof a !== 'object' || typeof b !== 'object' || a === null || b === null) return false;
+  if (Array.isArray(a) || Array.isArray(b)) {
+    return (
+      Array.isArray(a) && Array.isArray(b) && a.length === b.length && a.every((item, i) => sameValue(item, b[i]))
+    );
+  }
+  const x = a as Record<string, unknown>;
+  const y = b as Record<string, unknown>;
+  const keys = Object.keys(x);
+  return keys.length === Object.keys(y).length && keys.every((k) => k in y && sameValue(x[k], y[k]));
+};
+
+const sameProps = (prev: object, next: object): boolean => sameValue(prev, next);
+
+const WeatherComponent = React.memo((props: WeatherProps) => {
+  useSharedStyle('weather-component-styles', WEATHER_CSS);
+  const containerRef = useRef<HTMLDivElement>(null);
+  const onScreen = useOnScreen(containerRef);
   const [isVisible, setIsVisible] = useState(false);
 
   useEffect(() => {
-    console.log('🎯 WeatherComponent 正在渲染!', props);
-    
-    // Trigger animation on mount
+    // Trigger animation on mount only; in-place updates must not replay it
     setIsVisible(true);
-  }, [props]);
+  }, []);
 
   // Use props data directly instead of mock data
   const weatherData = {
@@ -59,14 +571,17 @@ const WeatherComponent = (props: WeatherProps) => {
   };
 
   return (
-    <div className="weather-container">
+    <div ref={containerRef} className={`weather-container ${onScreen ? '' : 'paused'}`}>
       <div 
         className={`weather-card ${isVisible ? 'visible' : ''}`}
         style={{ background: weatherData.gradient }}
       >
         {/* Header */}
         <div className="weather-header">
-          <h2 className="city-name">{props.city}</h2>
+          <h2 className="city-name">
+            {props.city}
+            {props.stale && <span className="stale-badge" title="天气数据源暂时不可用">缓存数据</span>}
+          </h2>
           <div className="weather-icon">{weatherData.icon}</div>
         </div>
 
@@ -96,6 +611,26 @@ const WeatherComponent = (props: WeatherProps) => {
           </div>
         </div>
 
+        {/* Panels fetched in parallel branches; a missing one is shown as unavailable */}
+        <div className="weather-panels">
+          {props.alerts?.map((alert) => (
+            <span key={alert.title} className="panel-chip alert" title={alert.description}>⚠️ {alert.title}</span>
+          ))}
+          {props.airQuality && (
+            <span className="panel-chip" title={props.airQuality.pollutant && `首要污染物 ${props.airQuality.pollutant}`}>
+              🍃 AQI {props.airQuality.aqi} {props.airQuality.level}
+            </span>
+          )}
+          {props.sun && (
+            <span className="panel-chip">
+              {props.sun.sunrise ? `🌅 ${props.sun.sunrise} · 🌇 ${props.sun.sunset}` : `☀️ 日照 ${props.sun.dayLength}`}
+            </span>
+          )}
+          {props.unavailable?.length ? (
+            <span className="panel-chip missing">部分数据暂不可用</span>
+          ) : null}
+        </div>
+
         {/* Animated Background Elements */}
         <div className="bg-animation">
           <div className="cloud cloud-1">☁️</div>
@@ -105,302 +640,297 @@ const WeatherComponent = (props: WeatherProps) => {
           <div className="sparkle sparkle-3">✨</div>
         </div>
       </div>
+    </div>
+  );
+}, sameProps);
+
+const FORECAST_CSS = `
+  .forecast-container {
+    display: flex;
+    justify-content: center;
+    padding: 20px;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+  }
+
+  .forecast-card {
+    width: 350px;
+    border-radius: 25px;
+    padding: 24px 30px;
+    color: white;
+    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.2);
+  }
+
+  .forecast-city {
+    font-size: 22px;
+    font-weight: 300;
+    margin: 0 0 16px 0;
+  }
+
+  .forecast-hourly {
+    width: 100%;
+    height: 60px;
+    margin-bottom: 12px;
+  }
+
+  .forecast-days {
+    list-style: none;
+    margin: 0;
+    padding: 0;
+  }
+
+  .forecast-day {
+    display: grid;
+    grid-template-columns: 48px 32px 44px 1fr 44px;
+    align-items: center;
+    gap: 8px;
+    padding: 6px 0;
+    font-size: 16px;
+  }
+
+  .forecast-label {
+    opacity: 0.9;
+  }
+
+  .forecast-temp {
+    text-align: right;
+    font-weight: 500;
+  }
+
+  .forecast-bar {
+    position: relative;
+    height: 6px;
+    border-radius: 3px;
+    background: rgba(255, 255, 255, 0.25);
+  }
+
+  .forecast-bar-fill {
+    position: absolute;
+    top: 0;
+    bottom: 0;
+    border-radius: 3px;
+    background: rgba(255, 255, 255, 0.9);
+  }
+`;
+
+const ForecastComponent = (props: ForecastProps) => {
+  useSharedStyle('forecast-component-styles', FORECAST_CSS);
+  const days = props.days || [];
+  // 温度条按整个预报窗口的最低/最高温归一化
+  const lowest = Math.min(...days.map((d) => d.min));
+  const highest = Math.max(...days.map((d) => d.max));
+  const span = Math.max(highest - lowest, 1);
+  const hourly = props.hourly || [];
+  const hourlyLow = Math.min(...hourly);
+  const hourlySpan = Math.max(Math.max(...hourly) - hourlyLow, 1);
 
-      <style jsx>{`
-        .weather-container {
-          display: flex;
-          justify-content: center;
-          padding: 20px;
-          font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        }
-
-        .weather-card {
-          position: relative;
-          width: 350px;
-          height: 450px;
-          border-radius: 25px;
-          padding: 30px;
-          color: white;
-          box-shadow: 0 20px 40px rgba(0, 0, 0, 0.2);
-          overflow: hidden;
-          transform: translateY(50px);
-          opacity: 0;
-          transition: all 0.8s cubic-bezier(0.25, 0.46, 0.45, 0.94);
-          backdrop-filter: blur(10px);
-        }
-
-        .weather-card.visible {
-          transform: translateY(0);
-          opacity: 1;
-        }
-
-        .weather-card::before {
-          content: '';
-          position: absolute;
-          top: 0;
-          left: 0;
-          right: 0;
-          bottom: 0;
-          background: rgba(255, 255, 255, 0.1);
-          border-radius: 25px;
-          backdrop-filter: blur(10px);
-        }
-
-        .weather-header {
-          position: relative;
-          z-index: 2;
-          display: flex;
-          justify-content: space-between;
-          align-items: center;
-          margin-bottom: 40px;
-        }
-
-        .city-name {
-          font-size: 28px;
-          font-weight: 300;
-          margin: 0;
-          letter-spacing: 1px;
-          animation: slideInLeft 0.8s ease-out 0.3s both;
-        }
-
-        .weather-icon {
-          font-size: 60px;
-          animation: bounce 2s infinite, slideInRight 0.8s ease-out 0.3s both;
-        }
-
-        .temperature-section {
-          position: relative;
-          z-index: 2;
-          text-align: center;
-          margin: 60px 0;
-        }
-
-        .temperature {
-          font-size: 72px;
-          font-weight: 100;
-          margin: 0;
-          line-height: 1;
-          animation: scaleIn 1s ease-out 0.6s both;
-          text-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-        }
-
-        .condition {
-          font-size: 22px;
-          font-weight: 300;
-          margin: 10px 0 5px 0;
-          opacity: 0.9;
-          animation: fadeInUp 0.8s ease-out 0.9s both;
-        }
-
-        .description {
-          font-size: 16px;
-          opacity: 0.8;
-          font-weight: 300;
-          animation: fadeInUp 0.8s ease-out 1.1s both;
-        }
-
-        .weather-details {
-          position: relative;
-          z-index: 2;
-          display: flex;
-          justify-content: space-around;
-          margin-top: 50px;
-        }
-
-        .detail-item {
-          display: flex;
-          align-items: center;
-          gap: 12px;
-          animation: fadeInUp 0.8s ease-out 1.3s both;
-        }
-
-        .detail-icon {
-          font-size: 24px;
-          animation: pulse 2s infinite;
-        }
-
-        .detail-info {
-          display: flex;
-          flex-direction: column;
-        }
-
-        .detail-label {
-          font-size: 14px;
-          opacity: 0.8;
-          font-weight: 300;
-        }
-
-        .detail-value {
-          font-size: 18px;
-          font-weight: 500;
-        }
-
-        /* Background Animations */
-        .bg-animation {
-          position: absolute;
-          top: 0;
-          left: 0;
-          right: 0;
-          bottom: 0;
-          pointer-events: none;
-          overflow: hidden;
-        }
-
-        .cloud {
-          position: absolute;
-          font-size: 30px;
-          opacity: 0.3;
-          animation: float 6s ease-in-out infinite;
-        }
-
-        .cloud-1 {
-          top: 15%;
-          left: 10%;
-          animation-delay: 0s;
-        }
-
-        .cloud-2 {
-          top: 25%;
-          right: 15%;
-          animation-delay: 3s;
-        }
-
-        .sparkle {
-          position: absolute;
-          font-size: 16px;
-          opacity: 0.6;
-          animation: twinkle 3s ease-in-out infinite;
-        }
-
-        .sparkle-1 {
-          top: 30%;
-          left: 20%;
-          animation-delay: 0s;
-        }
-
-        .sparkle-2 {
-          top: 60%;
-          right: 25%;
-          animation-delay: 1s;
-        }
-
-        .sparkle-3 {
-          bottom: 25%;
-          left: 15%;
-          animation-delay: 2s;
-        }
-
-        /* Keyframe Animations */
-        @keyframes slideInLeft {
-          from {
-            transform: translateX(-50px);
-            opacity: 0;
-          }
-          to {
-            transform: translateX(0);
-            opacity: 1;
-          }
-        }
-
-        @keyframes slideInRight {
-          from {
-            transform: translateX(50px);
-            opacity: 0;
-          }
-          to {
-            transform: translateX(0);
-            opacity: 1;
-          }
-        }
-
-        @keyframes scaleIn {
-          from {
-            transform: scale(0.5);
-            opacity: 0;
-          }
-          to {
-            transform: scale(1);
-            opacity: 1;
-          }
-        }
-
-        @keyframes fadeInUp {
-          from {
-            transform: translateY(30px);
-            opacity: 0;
-          }
-          to {
-            transform: translateY(0);
-            opacity: 1;
-          }
-        }
-
-        @keyframes bounce {
-          0%, 20%, 50%, 80%, 100% {
-            transform: translateY(0);
-          }
-          40% {
-            transform: translateY(-10px);
-          }
-          60% {
-            transform: translateY(-5px);
-          }
-        }
-
-        @keyframes float {
-          0%, 100% {
-            transform: translateY(0px);
-          }
-          50% {
-            transform: translateY(-20px);
-          }
-        }
-
-        @keyframes twinkle {
-          0%, 100% {
-            opacity: 0.6;
-            transform: scale(1);
-          }
-          50% {
-            opacity: 1;
-            transform: scale(1.2);
-          }
-        }
-
-        @keyframes pulse {
-          0%, 100% {
-            transform: scale(1);
-          }
-          50% {
-            transform: scale(1.1);
-          }
-        }
-
-        /* Responsive Design */
-        @media (max-width: 480px) {
-          .weather-card {
-            width: 300px;
-            height: 400px;
-            padding: 25px;
-          }
-
-          .temperature {
-            font-size: 60px;
-          }
-
-          .city-name {
-            font-size: 24px;
-          }
-
-          .weather-icon {
-            font-size: 50px;
-          }
-        }
-      `}</style>
+  return (
+    <div className="forecast-container">
+      <div
+        className="forecast-card"
+        style={{ background: getBackgroundGradient(days[0]?.condition ?? '') }}
+      >
+        <h2 className="forecast-city">{props.city} · 天气预报</h2>
+
+        {hourly.length > 0 && (
+          <svg className="forecast-hourly" viewBox={`0 0 ${hourly.length - 1} 40`} preserveAspectRatio="none">
+            <polyline
+              fill="none"
+              stroke="rgba(255, 255, 255, 0.9)"
+              strokeWidth="0.6"
+              points={hourly.map((t, h) => `${h},${38 - ((t - hourlyLow) / hourlySpan) * 36}`).join(' ')}
+            />
+          </svg>
+        )}
+
+        <ul className="forecast-days">
+          {days.map((day) => (
+            <li key={day.date} className="forecast-day">
+              <span className="forecast-label">{day.label}</span>
+              <span className="forecast-icon">{getWeatherIcon(day.condition)}</span>
+              <span className="forecast-temp">{Math.round(day.min)}{props.unit}</span>
+              <span className="forecast-bar">
+                <span
+                  className="forecast-bar-fill"
+                  style={{
+                    left: `${((day.min - lowest) / span) * 100}%`,
+                    width: `${((day.max - day.min) / span) * 100}%`,
+                  }}
+                />
+              </span>
+              <span className="forecast-temp">{Math.round(day.max)}{props.unit}</span>
+            </li>
+          ))}
+        </ul>
+      </div>
     </div>
   );
 };
 
-export default {
+const METRIC_ICONS: Record<string, string> = {
+  temperature: '🌡️',
+  humidity: '💧',
+  windSpeed: '💨',
+};
+
+const WEATHER_LIST_CSS = `
+  .weather-list-container {
+    display: flex;
+    justify-content: center;
+    padding: 20px;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+  }
+
+  .weather-list-card {
+    width: 350px;
+    border-radius: 25px;
+    padding: 24px 30px;
+    color: white;
+    background: linear-gradient(135deg, #74b9ff 0%, #0984e3 100%);
+    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.2);
+  }
+
+  .weather-list-title {
+    font-size: 20px;
+    font-weight: 300;
+    margin: 0 0 16px 0;
+  }
+
+  .weather-list-empty {
+    opacity: 0.8;
+  }
+
+  .weather-list {
+    list-style: none;
+    margin: 0;
+    padding: 0;
+  }
+
+  .weather-list-row {
+    display: grid;
+    grid-template-columns: 20px 80px 1fr 64px;
+    align-items: center;
+    gap: 8px;
+    padding: 6px 0;
+    font-size: 16px;
+  }
+
+  .weather-list-rank {
+    opacity: 0.7;
+  }
+
+  .weather-list-bar {
+    position: relative;
+    height: 6px;
+    border-radius: 3px;
+    background: rgba(255, 255, 255, 0.25);
+  }
+
+  .weather-list-bar-fill {
+    position: absolute;
+    top: 0;
+    bottom: 0;
+    left: 0;
+    border-radius: 3px;
+    background: rgba(255, 255, 255, 0.9);
+  }
+
+  .weather-list-value {
+    text-align: right;
+    font-weight: 500;
+  }
+`;
+
+const WeatherListComponent = (props: WeatherListProps) => {
+  useSharedStyle('weather-list-component-styles', WEATHER_LIST_CSS);
+  const items = props.items || [];
+  // 条形长度按列表中的最大值归一化（温度可能为负，整体平移到 0 以上）
+  const low = Math.min(0, ...items.map((item) => item.value));
+  const high = Math.max(...items.map((item) => item.value), low + 1);
+
+  return (
+    <div className="weather-list-container">
+      <div className="weather-list-card">
+        <h2 className="weather-list-title">
+          {METRIC_ICONS[props.metric] || '📊'} {props.title}
+        </h2>
+        {items.length === 0 ? (
+          <div className="weather-list-empty">没有符合条件的城市</div>
+        ) : (
+          <ol className="weather-list">
+            {items.map((item, index) => (
+              <li key={item.city} className="weather-list-row">
+                <span className="weather-list-rank">{index + 1}</span>
+                <span className="weather-list-city">
+                  {getWeatherIcon(item.condition)} {item.city}
+                </span>
+                <span className="weather-list-bar">
+                  <span
+                    className="weather-list-bar-fill"
+                    style={{ width: `${((item.value - low) / (high - low)) * 100}%` }}
+                  />
+                </span>
+                <span className="weather-list-value">{item.display}</span>
+              </li>
+            ))}
+          </ol>
+        )}
+      </div>
+    </div>
+  );
+};
+
+const components = {
   weather: WeatherComponent,
-};
\ No newline at end of file
+  forecast: ForecastComponent,
+  weather_list: WeatherListComponent,
+};
+
+const withVirtualization = <P extends object>(Component: React.ComponentType<P>, estimatedHeight: number) => {
+  const Virtualized = (props: P) => (
+    <VirtualItem estimatedHeight={estimatedHeight}>
+      <Component {...props} />
+    </VirtualItem>
+  );
+  return Virtualized;
+};
+
+// Drop-in replacement for the default map when the host renders each UI
+// message itself (e.g. LoadExternalComponent) but threads grow long.
+export const virtualized = {
+  weather: withVirtualization(WeatherComponent, ESTIMATED_HEIGHTS.weather),
+  forecast: withVirtualization(ForecastComponent, ESTIMATED_HEIGHTS.forecast),
+  weather_list: withVirtualization(WeatherListComponent, ESTIMATED_HEIGHTS.weather_list),
+};
+
+interface UIMessageItem {
+  id: string;
+  name: string;
+  props: Record<string, unknown>;
+}
+
+interface UIMessageListProps {
+  messages: UIMessageItem[];
+  // Newest cards render immediately instead of waiting one observer tick
+  eagerTail?: number;
+}
+
+// Virtualised rendering of a whole state["ui"] history
+export const UIMessageList = ({ messages, eagerTail = 3 }: UIMessageListProps) => (
+  <div className="ui-message-list">
+    {messages.map((message, i) => {
+      const Component = components[message.name as keyof typeof components] as React.ComponentType<any> | undefined;
+      if (!Component) return null;
+      return (
+        <VirtualItem
+          key={message.id}
+          estimatedHeight={ESTIMATED_HEIGHTS[message.name] ?? 400}
+          initiallyMounted={i >= messages.length - eagerTail}
+        >
+          <Component {...message.props} />
+        </VirtualItem>
+      );
+    })}
+  </div>
+);
+
+export default components;
\ No newline at end of file
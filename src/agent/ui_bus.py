@@ -0,0 +1,351 @@
+"""In-process pub/sub for UI events, with per-subscriber backpressure.
+
+Dashboards mirror the cards a thread emits to many viewers. `UIEventBus`
+fans each event out to the subscribers of its topic (the thread id) and to
+wildcard subscribers (topic None). `publish` never awaits: every subscriber
+owns a bounded queue, and when a slow viewer's queue is full its overflow
+policy decides what gives:
+
+* ``drop_oldest`` – discard the oldest pending event;
+* ``coalesce``    – pending events for the same card id collapse into one
+  (merge deltas are folded into the pending props), then drop oldest;
+* ``block``       – lossless: `apublish` callers wait for room, while the
+  non-blocking `publish` used by the graph disconnects the subscriber
+  instead of stalling the run, so the viewer reconnects and resyncs.
+
+Each `Subscription` reports its pending count, the age of its oldest
+pending event, and its delivered / dropped / coalesced counts. Bus-wide
+totals are exported through `agent.metrics`. `Subscription.sse()` renders
+the stream as Server-Sent Events, the stand-in for a websocket.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Hashable
+
+from agent.metrics import REGISTRY
+
+REGISTRY.describe("ui_bus_published_total", "UI events published to the bus")
+REGISTRY.describe("ui_bus_dropped_total", "UI events dropped from full subscriber queues, by policy")
+REGISTRY.describe("ui_bus_coalesced_total", "UI events folded into a pending event for the same card")
+REGISTRY.describe("ui_bus_disconnects_total", "Subscribers removed from the bus, by reason")
+REGISTRY.describe("ui_bus_subscribers", "Subscribers currently attached to the bus")
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, COALESCE, BLOCK)
+
+# 订阅关闭原因
+CLOSED = "closed"
+OVERFLOW = "overflow"
+
+
+class SubscriptionClosed(Exception):
+    """Raised by `Subscription.get` once the subscription is closed and drained."""
+
+
+class Subscription:
+    """One viewer's bounded queue of pending UI events."""
+
+    __slots__ = (
+        "bus", "topic", "policy", "maxsize", "delivered", "dropped", "coalesced",
+        "closed_reason", "_pending", "_seq", "_waiter", "_space",
+    )
+
+    def __init__(self, bus: "UIEventBus", topic: str | None, policy: str, maxsize: int) -> None:
+        """Use `UIEventBus.subscribe` rather than constructing this directly."""
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r}; expected one of {POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.bus = bus
+        self.topic = topic
+        self.policy = policy
+        self.maxsize = maxsize
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed_reason: str | None = None
+        # 合并策略按卡片 id 作键，其余策略按入队序号作键；值为 (入队时间, 事件)
+        self._pending: OrderedDict[Hashable, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._seq = 0
+        self._waiter: asyncio.Future[None] | None = None
+        self._space: asyncio.Future[None] | None = None
+
+    def __len__(self) -> int:
+        """Return the number of pending events."""
+        return len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        """Return True once the subscription no longer receives events."""
+        return self.closed_reason is not None
+
+    @property
+    def full(self) -> bool:
+        """Return True when the next event would overflow the queue."""
+        return len(self._pending) >= self.maxsize
+
+    def lag(self) -> float:
+        """Return how long the oldest pending event has been waiting, in seconds."""
+        if not self._pending:
+            return 0.0
+        enqueued_at, _ = next(iter(self._pending.values()))
+        return self.bus.clock() - enqueued_at
+
+    def stats(self) -> dict[str, Any]:
+        """Return this subscriber's queue and delivery counters."""
+        return {
+            "topic": self.topic,
+            "policy": self.policy,
+            "pending": len(self._pending),
+            "lag_s": self.lag(),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "closed": self.closed_reason,
+        }
+
+    def offer(self, event: dict[str, Any], now: float | None = None) -> bool:
+        """Enqueue without waiting; returns False if the subscriber was disconnected.
+
+        Per-subscriber counters are updated here; the bus-wide metrics are
+        updated once per `UIEventBus.publish`.
+        """
+        if self.closed:
+            return False
+        if now is None:
+            now = self.bus.clock()
+        if self.policy == COALESCE:
+            key = event.get("id")
+            pending = self._pending.get(key)
+            if pending is not None:
+                # 保留原来的排队位置和入队时间，只更新内容
+                self._pending[key] = (pending[0], coalesce(pending[1], event))
+                self.coalesced += 1
+                self._wake()
+                return True
+        else:
+            self._seq += 1
+            key = self._seq
+
+        if self.full:
+            if self.policy == BLOCK:
+                # 不能阻塞图执行，也不能悄悄丢事件：断开，由观看端重连后重新同步
+                self.dropped += 1
+                self.bus._remove(self, OVERFLOW)
+                return False
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = (now, event)
+        self._wake()
+        return True
+
+    def get_nowait(self) -> dict[str, Any] | None:
+        """Return the next pending event, or None if there is none."""
+        if not self._pending:
+            return None
+        _, (_, event) = self._pending.popitem(last=False)
+        self.delivered += 1
+        space, self._space = self._space, None
+        if space is not None and not space.done():
+            space.set_result(None)
+        return event
+
+    async def get(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """Wait for the next event; returns None on timeout.
+
+        Raises `SubscriptionClosed` once closed and every pending event has
+        been delivered.
+        """
+        event = self.get_nowait()
+        while event is None:
+            if self.closed:
+                raise SubscriptionClosed(self.closed_reason)
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._waiter), timeout)
+            except TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+            event = self.get_nowait()
+        return event
+
+    def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        """Iterate over events until the subscription is closed."""
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[dict[str, Any]]:
+        while True:
+            try:
+                event = await self.get()
+            except SubscriptionClosed:
+                return
+            if event is not None:
+                yield event
+
+    async def sse(self, keepalive: float = 15.0) -> AsyncIterator[bytes]:
+        """Yield the stream as Server-Sent Events, with comment keepalives when idle."""
+        while True:
+            try:
+                event = await self.get(keepalive)
+            except SubscriptionClosed:
+                return
+            yield b": keepalive\n\n" if event is None else format_sse(event, self.delivered)
+
+    async def wait_for_space(self) -> None:
+        """Wait until the queue has room (or the subscription closes)."""
+        while self.full and not self.closed:
+            if self._space is None or self._space.done():
+                self._space = asyncio.get_running_loop().create_future()
+            await asyncio.shield(self._space)
+
+    def close(self) -> None:
+        """Detach from the bus; pending events can still be drained."""
+        self.bus._remove(self, CLOSED)
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is None or waiter.done():
+            return
+        loop = waiter.get_loop()
+        try:
+            same_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            waiter.set_result(None)
+        else:
+            # 从其他线程发布时（如同步节点在线程池中执行）
+            loop.call_soon_threadsafe(_resolve, waiter)
+
+    def _closed(self, reason: str) -> None:
+        self.closed_reason = reason
+        self._wake()
+        space, self._space = self._space, None
+        if space is not None and not space.done():
+            space.set_result(None)
+
+
+class UIEventBus:
+    """Fan UI events out to subscribers by topic without ever blocking the publisher."""
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        policy: str = COALESCE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Defaults for new subscriptions: queue size `maxsize`, overflow `policy`."""
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r}; expected one of {POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.clock = clock
+        self._topics: dict[str | None, list[Subscription]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of attached subscribers."""
+        return self._count
+
+    def subscribe(
+        self, topic: str | None = None, *, maxsize: int | None = None, policy: str | None = None
+    ) -> Subscription:
+        """Attach a subscriber to `topic`, or to every topic when `topic` is None."""
+        sub = Subscription(self, topic, policy or self.policy, maxsize or self.maxsize)
+        # 复制后替换列表，发布过程中增删订阅者不影响正在进行的遍历
+        self._topics[topic] = [*self._topics.get(topic, ()), sub]
+        self._count += 1
+        REGISTRY.set("ui_bus_subscribers", self._count)
+        return sub
+
+    def has_subscribers(self, topic: str | None) -> bool:
+        """Return True if an event on `topic` would reach anyone."""
+        return bool(self._topics.get(None)) or (topic is not None and bool(self._topics.get(topic)))
+
+    def publish(self, topic: str | None, event: dict[str, Any]) -> int:
+        """Offer `event` to every matching subscriber; never waits. Returns how many accepted it."""
+        subs = self._subscribers(topic)
+        now = self.clock()
+        # 逐个订阅者只更新自身计数，汇总后每次发布更新一次全局指标
+        before = [(sub.dropped, sub.coalesced) for sub in subs]
+        accepted = 0
+        for sub in subs:
+            accepted += sub.offer(event, now)
+        REGISTRY.inc("ui_bus_published_total")
+        coalesced = 0
+        for sub, (dropped, merged) in zip(subs, before):
+            if sub.dropped != dropped:
+                REGISTRY.inc("ui_bus_dropped_total", sub.dropped - dropped, policy=sub.policy)
+            coalesced += sub.coalesced - merged
+        if coalesced:
+            REGISTRY.inc("ui_bus_coalesced_total", coalesced)
+        return accepted
+
+    async def apublish(self, topic: str | None, event: dict[str, Any]) -> int:
+        """Like `publish`, but wait for room in ``block`` subscribers instead of disconnecting them."""
+        for sub in self._subscribers(topic):
+            if sub.policy == BLOCK:
+                await sub.wait_for_space()
+        return self.publish(topic, event)
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Return per-subscriber stats, wildcard subscribers first."""
+        return [sub.stats() for subs in self._topics.values() for sub in subs]
+
+    def close(self) -> None:
+        """Close every subscription."""
+        for subs in list(self._topics.values()):
+            for sub in subs:
+                sub.close()
+
+    def _subscribers(self, topic: str | None) -> list[Subscription]:
+        subs = self._topics.get(None, [])
+        if topic is not None and topic in self._topics:
+            subs = subs + self._topics[topic]
+        return subs
+
+    def _remove(self, sub: Subscription, reason: str) -> None:
+        if sub.closed:
+            return
+        subs = self._topics.get(sub.topic, [])
+        if sub in subs:
+            remaining = [s for s in subs if s is not sub]
+            if remaining:
+                self._topics[sub.topic] = remaining
+            else:
+                del self._topics[sub.topic]
+            self._count -= 1
+            REGISTRY.set("ui_bus_subscribers", self._count)
+            REGISTRY.inc("ui_bus_disconnects_total", reason=reason)
+        sub._closed(reason)
+
+
+def coalesce(pending: dict[str, Any], event: dict[str, Any]) -> dict[str, Any]:
+    """Fold `event` into a pending event for the same card."""
+    if not event.get("metadata", {}).get("merge"):
+        return event  # 完整替换直接覆盖
+    # 增量叠加到待发送的 props 上；待发送的是完整卡片时结果仍是完整卡片
+    merge = pending.get("metadata", {}).get("merge", False)
+    return {
+        **event,
+        "props": {**pending.get("props", {}), **event.get("props", {})},
+        "metadata": {**event["metadata"], "merge": merge},
+    }
+
+
+def format_sse(data: dict[str, Any], id: int | None = None, event: str | None = None) -> bytes:
+    """Encode one payload as a Server-Sent Events frame; `event` defaults to its ``type``."""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    head = "" if id is None else f"id: {id}\n"
+    return f"{head}event: {event or data.get('type', 'ui')}\ndata: {body}\n\n".encode()
+
+
+def _resolve(waiter: asyncio.Future[None]) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,140 @@
+"""Headless destinations for UI events.
+
+Inside a LangGraph run, nodes publish cards with `push_ui_message`, which
+streams the event and appends it to the ``ui`` state key. Batch jobs,
+scripts and tests that call the nodes directly have no runnable context,
+so there is nowhere to push to. Instead of letting `push_ui_message` raise
+and swallowing the error, nodes check for the context up front and hand
+the event to a `UISink` chosen through ``configurable["ui_sink"]``:
+
+- a `UISink` instance (e.g. `MemorySink` to collect events in-process);
+- a string path, which appends one JSON event per line to that file.
+
+Events have the same shape as `push_ui_message`'s, minus the run metadata
+(run id, tags) that only exists inside a run. When a sink is configured
+for a graph run, events go to the sink as well as to the stream.
+"""
+
+import atexit
+import json
+import uuid
+from typing import IO, Any, Protocol, runtime_checkable
+
+from langchain_core.runnables.config import var_child_runnable_config
+
+
+@runtime_checkable
+class UISink(Protocol):
+    """Anything that accepts UI events outside the graph's stream."""
+
+    def emit(self, event: dict[str, Any]) -> None:
+        """Record one UI event."""
+        ...
+
+
+class MemorySink:
+    """Collect UI events in a list."""
+
+    __slots__ = ("events",)
+
+    def __init__(self) -> None:
+        """Start with no events."""
+        self.events: list[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        """Return the number of collected events."""
+        return len(self.events)
+
+    def emit(self, event: dict[str, Any]) -> None:
+        """Append the event."""
+        self.events.append(event)
+
+    def named(self, name: str) -> list[dict[str, Any]]:
+        """Return the events for one component, in order."""
+        return [e for e in self.events if e["name"] == name]
+
+    def clear(self) -> None:
+        """Drop every collected event."""
+        self.events.clear()
+
+
+class FileSink:
+    """Append UI events to a JSONL file, one event per line."""
+
+    __slots__ = ("path", "_file")
+
+    def __init__(self, path: str) -> None:
+        """Write to `path`; the file is opened on the first event."""
+        self.path = path
+        self._file: IO[str] | None = None
+
+    def emit(self, event: dict[str, Any]) -> None:
+        """Serialise the event and append it."""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        """Flush buffered events to disk."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Flush and close the file; a later event reopens it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "FileSink":
+        """Return the sink itself."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the file."""
+        self.close()
+
+
+# 配置里给出的文件路径共用同一个 sink，进程退出时统一关闭
+_file_sinks: dict[str, FileSink] = {}
+
+
+@atexit.register
+def _close_file_sinks() -> None:
+    for sink in _file_sinks.values():
+        sink.close()
+
+
+def resolve_sink(value: "UISink | str | None") -> UISink | None:
+    """Return the sink for a ``configurable["ui_sink"]`` value."""
+    if value is None or isinstance(value, UISink):
+        return value
+    if isinstance(value, str):
+        sink = _file_sinks.get(value)
+        if sink is None:
+            sink = _file_sinks[value] = FileSink(value)
+        return sink
+    raise TypeError(f"ui_sink must be a UISink or a file path, got {type(value).__name__}")
+
+
+def in_runnable_context() -> bool:
+    """Return True when called from inside a LangGraph / LangChain run."""
+    # 与 get_config() 使用同一个上下文变量，只是不抛出异常
+    return var_child_runnable_config.get() is not None
+
+
+def ui_event(
+    name: str,
+    props: dict[str, Any],
+    *,
+    id: str | None = None,
+    message_id: str | None = None,
+    merge: bool = False,
+) -> dict[str, Any]:
+    """Build a UI event shaped like `push_ui_message`'s, for headless sinks."""
+    return {
+        "type": "ui",
+        "id": id or str(uuid.uuid4()),
+        "name": name,
+        "props": props,
+        "metadata": {"merge": merge, **({"message_id": message_id} if message_id else {})},
+    }
@@ -0,0 +1,94 @@
+"""Unit conversion and display formatting for numeric weather columns.
+
+Values are kept in canonical units (°C, %, km/h). Conversion is applied to a
+whole column in one call and formatting happens only when props are built
+for the UI.
+"""
+
+from array import array
+from typing import Iterable, NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+
+class Unit(NamedTuple):
+    """Linear conversion from the canonical unit plus its display suffix."""
+
+    suffix: str
+    scale: float
+    offset: float
+    decimals: int
+
+
+TEMPERATURE_UNITS = {
+    "C": Unit("°C", 1.0, 0.0, 0),
+    "F": Unit("°F", 9 / 5, 32.0, 0),
+}
+
+WIND_UNITS = {
+    "km/h": Unit("km/h", 1.0, 0.0, 0),
+    "m/s": Unit("m/s", 1 / 3.6, 0.0, 1),
+    "mph": Unit("mph", 0.621371, 0.0, 0),
+}
+
+HUMIDITY_UNITS = {
+    "%": Unit("%", 1.0, 0.0, 0),
+}
+
+# field -> 可选单位表
+FIELD_UNITS = {
+    "temperature": TEMPERATURE_UNITS,
+    "humidity": HUMIDITY_UNITS,
+    "windSpeed": WIND_UNITS,
+}
+
+DEFAULT_UNITS = {"temperature": "C", "humidity": "%", "windSpeed": "km/h"}
+
+# locale -> (小数点, 数值与单位之间的分隔符)
+LOCALES = {
+    "zh-CN": (".", ""),
+    "en-US": (".", ""),
+    "de-DE": (",", " "),
+    "fr-FR": (",", " "),
+}
+DEFAULT_LOCALE = "zh-CN"
+
+
+def resolve_unit(field: str, unit: str | None) -> Unit:
+    """Return the `Unit` for `field`, falling back to the canonical unit."""
+    table = FIELD_UNITS[field]
+    return table.get(unit or DEFAULT_UNITS[field]) or table[DEFAULT_UNITS[field]]
+
+
+def convert_column(values: "array[float]", unit: Unit) -> "array[float]":
+    """Convert a whole canonical column to `unit` in one operation."""
+    if unit.scale == 1.0 and unit.offset == 0.0:
+        return values
+    if np is not None:
+        converted = np.frombuffer(values, dtype=np.float64) * unit.scale + unit.offset
+        return array("d", converted.tobytes())
+    scale, offset = unit.scale, unit.offset
+    return array("d", [v * scale + offset for v in values])
+
+
+def convert_values(values: Sequence[float], unit: Unit) -> list[float]:
+    """Convert plain floats (e.g. forecast aggregates) to `unit`."""
+    return convert_column(array("d", values), unit).tolist()
+
+
+def format_column(values: Iterable[float], unit: Unit, locale: str | None = None) -> tuple[str, ...]:
+    """Format converted values as display strings for `locale`."""
+    decimal, sep = LOCALES.get(locale or DEFAULT_LOCALE, LOCALES[DEFAULT_LOCALE])
+    spec = f".{unit.decimals}f"
+    suffix = sep + unit.suffix
+    if decimal == ".":
+        return tuple(format(v, spec) + suffix for v in values)
+    return tuple(format(v, spec).replace(".", decimal) + suffix for v in values)
+
+
+def parse_quantity(text: str, suffix: str) -> float:
+    """Parse a bundled display string such as "22°C" into its number."""
+    return float(text.strip().removesuffix(suffix))
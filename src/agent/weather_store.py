@@ -0,0 +1,150 @@
+"""Columnar store for current weather conditions.
+
+The bundled records carry display strings ("22°C", "45%", "3km/h"); they are
+parsed once into numeric ``array('d')`` columns in canonical units. Converted
+and formatted columns are cached per unit and locale and dropped whenever
+the table is reloaded. Fetched readings are formatted by `format_reading`,
+memoised per reading, unit and locale.
+"""
+
+import functools
+import sys
+from array import array
+from typing import Any, Iterable, Mapping
+
+from agent.matching import KeywordAutomaton
+from agent.units import (
+    DEFAULT_UNITS,
+    FIELD_UNITS,
+    Unit,
+    convert_column,
+    convert_values,
+    format_column,
+    parse_quantity,
+    resolve_unit,
+)
+
+NUMERIC_FIELDS = ("temperature", "humidity", "windSpeed")
+FORMAT_CACHE_SIZE = 4096
+
+
+class WeatherTable:
+    """Current conditions stored column by column, one row per city."""
+
+    def __init__(self, records: Iterable[Mapping[str, Any]]) -> None:
+        """Load the table from bundled display-format records."""
+        self.version = 0
+        self._load(records)
+
+    def _load(self, records: Iterable[Mapping[str, Any]]) -> None:
+        rows = list(records)
+        self.cities: tuple[str, ...] = tuple(r["city"] for r in rows)
+        self.conditions: tuple[str, ...] = tuple(r["condition"] for r in rows)
+        self.descriptions: tuple[str, ...] = tuple(r["description"] for r in rows)
+        self.columns: dict[str, array[float]] = {
+            field: array(
+                "d",
+                (parse_quantity(r[field], FIELD_UNITS[field][DEFAULT_UNITS[field]].suffix) for r in rows),
+            )
+            for field in NUMERIC_FIELDS
+        }
+        self._rows = {city: i for i, city in enumerate(self.cities)}
+        self.city_set = frozenset(self.cities)
+        self.city_matcher: KeywordAutomaton[str] = KeywordAutomaton({city: city for city in self.cities})
+        self._converted: dict[tuple[str, Unit], array[float]] = {}
+        self._formatted: dict[tuple[str, Unit, str | None], tuple[str, ...]] = {}
+
+    def reload(self, records: Iterable[Mapping[str, Any]]) -> None:
+        """Replace the data, bump `version` and drop derived caches."""
+        self._load(records)
+        self.version += 1
+
+    def __len__(self) -> int:
+        """Return the number of cities."""
+        return len(self.cities)
+
+    def __contains__(self, city: object) -> bool:
+        """Return whether `city` has a row."""
+        return city in self._rows
+
+    def table_for(self, city: str) -> "WeatherTable | None":
+        """Return the table holding `city` (this one), or None; see `PartitionedWeatherStore`."""
+        return self if city in self._rows else None
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the rows and the derived caches."""
+        strings = sum(sys.getsizeof(s) for s in (*self.cities, *self.conditions, *self.descriptions))
+        numbers = sum(len(a) * a.itemsize for a in (*self.columns.values(), *self._converted.values()))
+        formatted = sum(sys.getsizeof(s) for column in self._formatted.values() for s in column)
+        return strings + numbers + formatted
+
+    def row(self, city: str) -> int | None:
+        """Return the row index of `city`, or None."""
+        return self._rows.get(city)
+
+    def column(self, field: str, unit: str | None = None) -> "array[float]":
+        """Return `field` converted to `unit` for every row (cached)."""
+        resolved = resolve_unit(field, unit)
+        key = (field, resolved)
+        column = self._converted.get(key)
+        if column is None:
+            column = self._converted[key] = convert_column(self.columns[field], resolved)
+        return column
+
+    def formatted(self, field: str, unit: str | None = None, locale: str | None = None) -> tuple[str, ...]:
+        """Return display strings for `field` in `unit` / `locale` (cached)."""
+        resolved = resolve_unit(field, unit)
+        key = (field, resolved, locale)
+        strings = self._formatted.get(key)
+        if strings is None:
+            strings = self._formatted[key] = format_column(self.column(field, unit), resolved, locale)
+        return strings
+
+    def value(self, city: str, field: str, unit: str | None = None) -> float:
+        """Return one numeric value of `city` in `unit`."""
+        return self.column(field, unit)[self._rows[city]]
+
+
+def format_reading(
+    reading: Mapping[str, Any], units: Mapping[str, str] | None = None, locale: str | None = None
+) -> dict[str, str]:
+    """Build the "weather" card props from one fetched canonical reading.
+
+    Results are memoised on the reading's values, the units and the locale,
+    so a popular city is converted and formatted once per distinct reading
+    rather than on every turn.
+    """
+    units = units or {}
+    props = _format_values(
+        reading["city"],
+        tuple(reading[field] for field in NUMERIC_FIELDS),
+        reading["condition"],
+        reading["description"],
+        tuple(units.get(field) for field in NUMERIC_FIELDS),
+        locale,
+    )
+    return dict(props)
+
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _format_values(
+    city: str,
+    values: tuple[float, ...],
+    condition: str,
+    description: str,
+    units: tuple[str | None, ...],
+    locale: str | None,
+) -> tuple[tuple[str, str], ...]:
+    # 返回不可变的键值对，调用方各自得到新的 dict（之后可能加 stale 等字段）
+    fields = {}
+    for field, value, unit_name in zip(NUMERIC_FIELDS, values, units):
+        unit = resolve_unit(field, unit_name)
+        fields[field] = format_column(convert_values([value], unit), unit, locale)[0]
+    return (
+        ("city", city),
+        ("temperature", fields["temperature"]),
+        ("condition", condition),
+        ("humidity", fields["humidity"]),
+        ("windSpeed", fields["windSpeed"]),
+        ("description", description),
+    )
@@ -4,3 +4,20 @@ import pytest
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+@pytest.fixture
+def scanned(monkeypatch):
+    """记录关键词自动机每次扫描的文本长度，用来断言扫描量有上界而不是测耗时"""
+    from agent.matching import KeywordAutomaton
+
+    lengths = []
+    for name in ("iter_matches", "first_match", "contains_any"):
+        original = getattr(KeywordAutomaton, name)
+
+        def spy(self, text, _original=original):
+            lengths.append(len(text))
+            return _original(self, text)
+
+        monkeypatch.setattr(KeywordAutomaton, name, spy)
+    return lengths
@@ -0,0 +1,221 @@
+"""测试准入控制与限流的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.admission import AdmissionController, TokenBuckets
+from agent.graph import BUSY_REPLY, AgentState, graph, weather_node
+from agent.metrics import REGISTRY
+from agent.panels import PANELS
+from agent.providers import WeatherFetcher
+
+graph_module = sys.modules["agent.graph"]
+
+
+class GaugedProvider:
+    """记录同时进行的调用数的慢数据源"""
+
+    name = "gauged"
+
+    def __init__(self, inner, gauge, delay=0.02):
+        self.inner = inner
+        self.gauge = gauge
+        self.delay = delay
+
+    async def fetch(self, city):
+        self.gauge["now"] += 1
+        self.gauge["peak"] = max(self.gauge["peak"], self.gauge["now"])
+        try:
+            await asyncio.sleep(self.delay)
+            return await self.inner.fetch(city)
+        finally:
+            self.gauge["now"] -= 1
+
+
+def gauge_providers(monkeypatch, delay=0.02):
+    gauge = {"now": 0, "peak": 0}
+    for panel in PANELS[1:]:
+        inner = graph_module._panel_providers[panel]
+        monkeypatch.setitem(graph_module._panel_providers, panel, GaugedProvider(inner, gauge, delay))
+    fetcher = WeatherFetcher(GaugedProvider(graph_module._static_provider, gauge, delay))
+    monkeypatch.setattr(graph_module, "_weather_fetcher", fetcher)
+    return gauge
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBuckets:
+    """令牌桶测试"""
+
+    def test_burst_then_refill(self):
+        """测试突发额度用完后按速率恢复"""
+        clock = FakeClock()
+        buckets = TokenBuckets(rate=2, burst=3, clock=clock)
+        assert [buckets.try_acquire("a") for _ in range(4)] == [True, True, True, False]
+        assert buckets.try_acquire("b")  # 其他租户不受影响
+        clock.now = 0.5
+        assert buckets.try_acquire("a")
+        assert not buckets.try_acquire("a")
+
+    def test_bounded_keys(self):
+        """测试桶的数量有上限"""
+        buckets = TokenBuckets(rate=1, burst=1, max_keys=100, clock=FakeClock())
+        for i in range(1000):
+            buckets.try_acquire(str(i))
+        assert len(buckets._buckets) == 100
+
+
+class TestAdmissionController:
+    """全局并发与等待队列测试"""
+
+    @pytest.mark.anyio
+    async def test_queue_hands_over_slots_in_order(self):
+        """测试名额释放后按先后顺序交给等待者"""
+        controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=1)
+        assert await controller.acquire(None) is None
+        order = []
+
+        async def waiter(name):
+            assert await controller.acquire(None) is None
+            order.append(name)
+            controller.release()
+
+        tasks = [asyncio.create_task(waiter(n)) for n in ("first", "second")]
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 2
+        assert await controller.acquire(None) == "queue_full"
+
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order == ["first", "second"]
+        assert controller.in_flight == 0 and controller.queue_depth == 0
+
+    @pytest.mark.anyio
+    async def test_queue_timeout(self):
+        """测试等待超时后拒绝，不会无限排队"""
+        REGISTRY.reset()
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=10)
+        async with controller.admit(None) as rejected:
+            assert rejected is None
+            assert await controller.acquire(None, timeout=0.01) == "queue_timeout"
+            assert controller.queue_depth == 0
+        assert controller.in_flight == 0
+        assert REGISTRY.get("admission_rejected_total", reason="queue_timeout") == 1
+
+    @pytest.mark.anyio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """测试等待中的请求被取消后不占用名额"""
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=10)
+        await controller.acquire(None)
+        task = asyncio.create_task(controller.acquire(None))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        controller.release()
+        assert controller.in_flight == 0 and controller.queue_depth == 0
+
+
+class TestWeatherNodeAdmission:
+    """天气节点准入测试"""
+
+    @pytest.mark.anyio
+    async def test_rate_limited_tenant_gets_busy_reply(self, monkeypatch):
+        """测试超出速率的租户收到预先生成的忙碌回复"""
+        REGISTRY.reset()
+        monkeypatch.setattr(sys.modules["agent.graph"], "_admission", AdmissionController(rate=0.001, burst=2))
+        state = AgentState(messages=[HumanMessage(content="北京天气")], ui=[])
+        config = {"configurable": {"tenant_id": "noisy"}}
+        replies = [(await weather_node(state, config))["messages"][0].content for _ in range(3)]
+        assert BUSY_REPLY not in replies[:2]
+        assert replies[2] == BUSY_REPLY
+        other = await weather_node(state, {"configurable": {"tenant_id": "quiet"}})
+        assert other["messages"][0].content != BUSY_REPLY
+        assert REGISTRY.get("admission_rejected_total", reason="rate_limited") == 1
+
+    @pytest.mark.anyio
+    async def test_run_holds_one_slot(self, monkeypatch):
+        """测试一次运行只占用一个名额，各面板分支共用，结束后归还"""
+        controller = AdmissionController(max_concurrent=8)
+        monkeypatch.setattr(graph_module, "_admission", controller)
+        gauge = gauge_providers(monkeypatch, delay=0.1)
+        task = asyncio.create_task(graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []}))
+        await asyncio.sleep(0.05)
+        assert gauge["now"] == len(PANELS)
+        assert controller.in_flight == 1
+        result = await task
+        assert "unavailable" not in result["ui"][0]["props"]
+        assert controller.in_flight == 0
+
+    @pytest.mark.anyio
+    async def test_concurrency_limit_queues_runs(self, monkeypatch):
+        """测试并发上限按运行计数，超出的运行排队而不是同时发出"""
+        controller = AdmissionController(max_concurrent=1, max_queue=64, queue_timeout=5)
+        monkeypatch.setattr(graph_module, "_admission", controller)
+        gauge = gauge_providers(monkeypatch)
+        state = {"messages": [HumanMessage(content="北京天气")], "ui": []}
+        results = await asyncio.gather(*(graph.ainvoke(state) for _ in range(3)))
+        assert gauge["peak"] == len(PANELS)
+        assert all("unavailable" not in r["ui"][0]["props"] for r in results)
+        assert controller.in_flight == 0 and controller.queue_depth == 0
+
+    @pytest.mark.anyio
+    async def test_saturated_controller_gets_busy_reply(self, monkeypatch):
+        """测试名额占满且不能排队时返回忙碌回复，而不是降级的天气卡片"""
+        REGISTRY.reset()
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        monkeypatch.setattr(graph_module, "_admission", controller)
+        slot = await controller.lease(ttl=60)
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []})
+        assert result["messages"][-1].content == BUSY_REPLY
+        assert result["ui"] == []
+        assert REGISTRY.get("admission_rejected_total", reason="queue_full") == 1
+        controller.release_lease(slot)
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []})
+        assert result["messages"][-1].content != BUSY_REPLY
+        assert controller.in_flight == 0
+
+    @pytest.mark.anyio
+    async def test_forecast_releases_slot(self, monkeypatch):
+        """测试在提取阶段就回答的预报不会一直占着名额"""
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        monkeypatch.setattr(graph_module, "_admission", controller)
+        await graph.ainvoke({"messages": [HumanMessage(content="北京明天天气")], "ui": []})
+        assert controller.in_flight == 0
+
+    @pytest.mark.anyio
+    async def test_cancelled_run_slot_is_reclaimed(self, monkeypatch):
+        """测试运行在获取途中被取消、没有走到 compose 时，名额在租约过期后收回"""
+        REGISTRY.reset()
+        clock = FakeClock()
+        controller = AdmissionController(max_concurrent=1, max_queue=0, clock=clock)
+        monkeypatch.setattr(graph_module, "_admission", controller)
+        gauge_providers(monkeypatch, delay=5)
+        task = asyncio.create_task(graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []}))
+        await asyncio.sleep(0.05)
+        assert controller.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await controller.acquire(None) == "queue_full"
+        clock.now = 3600
+        slot = await controller.lease(ttl=1)
+        assert REGISTRY.get("admission_leases_expired_total") == 1
+        controller.release_lease(slot)
+        controller.release_lease(slot)  # 重复释放被忽略
+        assert controller.in_flight == 0
@@ -0,0 +1,137 @@
+"""测试图级响应缓存的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from datetime import date
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.cache import CachedGraph, normalize
+from agent.graph import WEATHER_DATA, graph
+from agent.weather_store import WeatherTable
+
+
+class CountingGraph:
+    """记录调用次数的图包装"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return await graph.ainvoke(input, config, **kwargs)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def ask(text):
+    return {"messages": [HumanMessage(content=text)], "ui": []}
+
+
+class TestResponseCache:
+    """响应缓存测试"""
+
+    def test_normalize(self):
+        """测试归一化忽略大小写、空白和句末标点"""
+        assert normalize("  北京天气怎么样？ ") == "北京天气怎么样"
+        assert normalize("Beijing   WEATHER!") == "beijing weather"
+        assert normalize([{"type": "text", "text": "北京天气"}, {"type": "image_url", "image_url": {}}]) == "北京天气"
+
+    @pytest.mark.anyio
+    async def test_hit_replays_with_fresh_ids(self):
+        """测试命中时不执行图，并为消息和组件生成新 id"""
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: 0)
+        first = await cached.ainvoke(ask("北京天气怎么样"))
+        second = await cached.ainvoke(ask("北京天气怎么样？"))
+        assert inner.calls == 1
+
+        assert second["messages"][-1].content == first["messages"][-1].content
+        assert second["messages"][-1].id != first["messages"][-1].id
+        assert second["ui"][0]["props"] == first["ui"][0]["props"]
+        assert second["ui"][0]["id"] != first["ui"][0]["id"]
+        assert second["ui"][0]["metadata"]["message_id"] == second["messages"][-1].id
+        assert second["context"] == first["context"]
+
+        second["ui"][0]["props"]["temperature"] = "changed"
+        third = await cached.ainvoke(ask("北京天气怎么样"))
+        assert third["ui"][0]["props"]["temperature"] == "22°C"
+
+    @pytest.mark.anyio
+    async def test_key_includes_display_preferences(self):
+        """测试不同单位 / 地区设置分别缓存"""
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: 0)
+        celsius = await cached.ainvoke(ask("北京天气"))
+        fahrenheit = await cached.ainvoke(ask("北京天气"), {"configurable": {"temperature_unit": "F"}})
+        assert inner.calls == 2
+        assert celsius["ui"][0]["props"]["temperature"] != fahrenheit["ui"][0]["props"]["temperature"]
+
+    @pytest.mark.anyio
+    async def test_forecast_key_includes_local_date(self):
+        """测试预报问题按本地日期分别缓存，过了零点不会返回前一天的“明天”"""
+        today = date(2026, 10, 19)
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: 0, today=lambda: today)
+        await cached.ainvoke(ask("北京明天天气"))
+        await cached.ainvoke(ask("北京明天天气"))
+        await cached.ainvoke(ask("北京天气"))
+        assert inner.calls == 2
+
+        today = date(2026, 10, 20)
+        await cached.ainvoke(ask("北京明天天气"))
+        await cached.ainvoke(ask("北京天气"))  # 当前天气与日期无关
+        assert inner.calls == 3
+
+    @pytest.mark.anyio
+    async def test_bypass_for_threads(self):
+        """测试带会话状态的请求不走缓存"""
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: 0)
+        for _ in range(2):
+            await cached.ainvoke(ask("北京天气"), {"configurable": {"thread_id": "t"}})
+        assert inner.calls == 2 and len(cached) == 0
+
+    @pytest.mark.anyio
+    async def test_ttl_size_and_reload(self):
+        """测试过期、容量上限和数据重载失效"""
+        clock = FakeClock()
+        table = WeatherTable(WEATHER_DATA)
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: table.version, maxsize=2, ttl=10, clock=clock)
+
+        await cached.ainvoke(ask("北京天气"))
+        clock.now = 11
+        await cached.ainvoke(ask("北京天气"))
+        assert inner.calls == 2
+
+        await cached.ainvoke(ask("上海天气"))
+        await cached.ainvoke(ask("深圳天气"))
+        assert len(cached) == 2
+        await cached.ainvoke(ask("北京天气"))  # 最久未使用，已被淘汰
+        assert inner.calls == 5
+
+        table.reload(WEATHER_DATA)
+        await cached.ainvoke(ask("北京天气"))
+        assert inner.calls == 6 and len(cached) == 1
+
+    @pytest.mark.anyio
+    async def test_uncacheable_results(self):
+        """测试谓词拒绝的结果不被缓存"""
+        inner = CountingGraph()
+        cached = CachedGraph(inner, version=lambda: 0, cacheable=lambda output: False)
+        for _ in range(2):
+            await cached.ainvoke(ask("北京天气"))
+        assert inner.calls == 2
@@ -0,0 +1,155 @@
+"""测试多轮对话上下文的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.context import merge_context, resolve_turn
+from agent.forecast import TimeRange
+from agent.graph import AgentState, builder, props_delta, route_message, weather_node
+
+
+class TestResolveTurn:
+    """单轮槽位解析测试"""
+
+    def test_city_falls_back_to_context(self):
+        """测试未提到城市时沿用上一轮城市"""
+        turn = resolve_turn("湿度呢？", {"city": "上海"}, None, None)
+        assert turn.city == "上海"
+        assert turn.attribute == "humidity"
+        assert turn.is_follow_up
+
+    def test_explicit_city_wins(self):
+        """测试本轮明确提到的城市优先"""
+        turn = resolve_turn("那深圳呢？", {"city": "上海"}, "深圳", None)
+        assert turn.city == "深圳"
+
+    def test_time_range_inherited_only_for_city_follow_ups(self):
+        """测试“那深圳呢”沿用时间范围，“湿度呢”不沿用"""
+        context = {"city": "上海", "time_range": {"start_day": 1, "days": 1, "label": "明天"}}
+        assert resolve_turn("那深圳呢？", context, "深圳", None).time_range == TimeRange(1, 1, "明天")
+        assert resolve_turn("湿度呢？", context, None, None).time_range is None
+        assert resolve_turn("深圳天气", context, "深圳", None).time_range is None
+
+    def test_units_precedence(self):
+        """测试单位优先级：默认 < 上一轮 < 配置 < 消息"""
+        context = {"units": {"temperature": "F", "windSpeed": "mph"}}
+        assert resolve_turn("天气", context, None, None).units["temperature"] == "F"
+        assert resolve_turn("天气", context, None, None, {"windSpeed": "m/s"}).units["windSpeed"] == "m/s"
+        assert resolve_turn("用摄氏度呢", context, None, None, {"temperature": "F"}).units["temperature"] == "C"
+        assert resolve_turn("天气", None, None, None).units == {"temperature": "C", "humidity": "%", "windSpeed": "km/h"}
+
+    def test_merge_context(self):
+        """测试上下文 reducer 只覆盖本轮槽位"""
+        assert merge_context({"city": "北京", "units": {}}, {"city": "上海"}) == {"city": "上海", "units": {}}
+        assert merge_context(None, {"city": "上海"}) == {"city": "上海"}
+
+
+class TestFollowUps:
+    """追问的节点与路由测试"""
+
+    def test_follow_up_routing_requires_context(self):
+        """测试只有已有城市时追问才走天气分支"""
+        message = [HumanMessage(content="那明天呢？")]
+        assert route_message(AgentState(messages=message, ui=[])) == "chitchat"
+        assert route_message(AgentState(messages=message, ui=[], context={"city": "上海"})) == "weather"
+
+    @pytest.mark.anyio
+    async def test_weather_node_uses_context_without_history(self):
+        """测试节点只读取最后一条消息和上下文记录"""
+        state = AgentState(
+            messages=[AIMessage(content="历史消息不会被重新解析 北京"), HumanMessage(content="湿度呢？")],
+            ui=[],
+            context={"city": "深圳"},
+        )
+        result = await weather_node(state)
+        assert result["messages"][0].content == "💧 深圳当前湿度：78%"
+        assert result["context"]["city"] == "深圳"
+
+    @pytest.mark.anyio
+    async def test_multi_turn_thread(self):
+        """测试带检查点的多轮对话"""
+        graph = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "context-test"}}
+
+        async def ask(text):
+            result = await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+            return result["messages"][-1].content, result
+
+        content, _ = await ask("上海天气怎么样")
+        assert "上海" in content
+        content, result = await ask("那明天呢？")
+        assert content.startswith("📅 上海明天")
+        assert result["ui"][-1]["name"] == "forecast"
+        content, _ = await ask("那深圳呢？")
+        assert content.startswith("📅 深圳明天")
+        content, _ = await ask("湿度呢？")
+        assert content == "💧 深圳当前湿度：78%"
+        _, result = await ask("用华氏度呢")
+        assert result["ui"][-1]["props"]["temperature"] == "79°F"
+        assert result["context"]["units"]["temperature"] == "F"
+
+
+class TestMergeUpdates:
+    """同一会话内卡片增量更新测试"""
+
+    def test_props_delta(self):
+        """测试只保留变化的属性，消失的属性置为 None"""
+        previous = {"city": "北京", "temperature": "22°C", "stale": True}
+        current = {"city": "北京", "temperature": "23°C"}
+        assert props_delta(previous, current) == {"temperature": "23°C", "stale": None}
+        assert props_delta(current, current) == {}
+
+    @pytest.mark.anyio
+    async def test_merge_mode_reuses_card(self):
+        """测试 merge 模式下同城市追问复用卡片 id，只发送变化的属性"""
+        graph = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "merge-test", "ui_update_mode": "merge"}}
+
+        async def ask(text):
+            events = []
+            async for mode, chunk in graph.astream(
+                {"messages": [HumanMessage(content=text)]}, config, stream_mode=["custom", "values"]
+            ):
+                if mode == "custom":
+                    events.append(chunk)
+                else:
+                    state = chunk
+            return events, state
+
+        events, state = await ask("北京天气怎么样")
+        card_id = events[0]["id"]
+        assert len(events[0]["props"]) == 9  # 实时天气 6 项 + 空气质量、预警、日出日落
+
+        events, state = await ask("北京天气呢")
+        assert events == []  # 没有变化，不推送空的增量
+        assert state["messages"][-1].type == "ai"  # 文字回复照常发送
+        assert state["context"]["card"]["id"] == card_id
+        assert len(state["ui"]) == 1
+
+        events, state = await ask("用华氏度呢")
+        assert events[0]["id"] == card_id
+        assert events[0]["props"] == {"temperature": "72°F"}
+        assert events[0]["metadata"]["merge"] is True
+        assert len(state["ui"]) == 1
+        assert state["ui"][0]["props"]["temperature"] == "72°F"
+        assert state["ui"][0]["props"]["humidity"] == "45%"
+
+        events, state = await ask("上海天气")
+        assert events[0]["id"] != card_id
+        assert len(state["ui"]) == 2
+
+    @pytest.mark.anyio
+    async def test_replace_mode_is_default(self):
+        """测试默认每轮推送新卡片"""
+        graph = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "replace-test"}}
+        for text in ["北京天气", "北京天气呢"]:
+            state = await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+        assert len(state["ui"]) == 2
+        assert "card" not in state["context"]
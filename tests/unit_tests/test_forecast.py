@@ -0,0 +1,123 @@
+"""测试天气预报功能的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from datetime import date
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent import forecast as forecast_module
+from agent.forecast import ForecastStore, TimeRange, parse_time_range, synthetic_series
+from agent.graph import AgentState, weather_node
+
+
+class TestTimeRangeParsing:
+    """相对时间表达解析测试"""
+
+    def test_single_days(self):
+        """测试单日表达"""
+        assert parse_time_range("明天北京天气") == TimeRange(1, 1, "明天")
+        assert parse_time_range("后天上海下雨吗") == TimeRange(2, 1, "后天")
+        assert parse_time_range("大后天深圳温度") == TimeRange(3, 1, "大后天")
+
+    def test_multi_day_windows(self):
+        """测试多日表达"""
+        assert parse_time_range("这周上海温度") == TimeRange(0, 7, "本周")
+        assert parse_time_range("未来三天广州天气") == TimeRange(0, 3, "未来3天")
+        assert parse_time_range("接下来5天杭州天气") == TimeRange(0, 5, "未来5天")
+        assert parse_time_range("这几天北京冷不冷") == TimeRange(0, 3, "这几天")
+
+    def test_weekend(self):
+        """测试周末相对今天的偏移"""
+        wednesday = date(2026, 10, 14)
+        assert parse_time_range("周末天气", today=wednesday) == TimeRange(3, 2, "周末")
+        sunday = date(2026, 10, 18)
+        assert parse_time_range("周末天气", today=sunday) == TimeRange(0, 1, "周末")
+
+    def test_current_conditions(self):
+        """测试当前天气不解析为预报"""
+        for text in ["北京天气", "今天杭州的温度", "现在广州天气如何", ""]:
+            assert parse_time_range(text) is None, text
+
+
+class TestForecastStore:
+    """列式预报存储测试"""
+
+    @pytest.fixture
+    def store(self):
+        store = ForecastStore(days=3)
+        hourly = [float(d * 100 + h) for d in range(3) for h in range(24)]
+        store.add_city("测试城市", hourly, ["晴天", "多云", "小雨"])
+        return store
+
+    def test_rejects_wrong_length(self, store):
+        """测试序列长度校验"""
+        with pytest.raises(ValueError):
+            store.add_city("坏数据", [1.0, 2.0], ["晴天"])
+
+    @pytest.mark.parametrize("use_numpy", [True, False])
+    def test_daily_aggregates(self, store, monkeypatch, use_numpy):
+        """测试按天聚合最低/最高/平均温度（NumPy 与 array 两条路径一致）"""
+        if not use_numpy:
+            monkeypatch.setattr(forecast_module, "np", None)
+        elif forecast_module.np is None:
+            pytest.skip("NumPy 未安装")
+
+        mins, maxs, avgs = store.aggregate("测试城市", 1, 2)
+        assert mins == [100.0, 200.0]
+        assert maxs == [123.0, 223.0]
+        assert avgs == [pytest.approx(111.5), pytest.approx(211.5)]
+
+    def test_forecast_props(self, store):
+        """测试预报 UI 数据结构"""
+        today = date(2026, 10, 19)
+        props = store.forecast("测试城市", TimeRange(1, 1, "明天"), today=today)
+        assert props["city"] == "测试城市"
+        assert props["unit"] == "°C"
+        assert props["days"] == [{
+            "date": "2026-10-20", "label": "明天", "condition": "多云",
+            "min": 100.0, "max": 123.0, "avg": 111.5,
+        }]
+        assert len(props["hourly"]) == 24
+
+        weekly = store.forecast("测试城市", TimeRange(0, 7, "本周"), today=today)
+        assert [d["label"] for d in weekly["days"]] == ["今天", "明天", "后天"]
+        assert weekly["hourly"] == []
+
+    def test_synthetic_series_is_deterministic(self):
+        """测试示例数据可复现且第一天围绕当前温度"""
+        hourly, conditions = synthetic_series("北京", 22.0, "晴天")
+        assert (hourly, conditions) == synthetic_series("北京", 22.0, "晴天")
+        assert len(hourly) == 7 * 24
+        assert conditions[0] == "晴天"
+        assert 17.0 <= min(hourly[:24]) and max(hourly[:24]) <= 27.0
+
+
+class TestForecastNode:
+    """天气节点的预报分支测试"""
+
+    @pytest.mark.anyio
+    async def test_weather_node_forecast_message(self):
+        """测试预报请求返回预报消息"""
+        state = AgentState(messages=[HumanMessage(content="明天北京天气")], ui=[])
+        result = await weather_node(state)
+        content = result["messages"][0].content
+        assert content.startswith("📅 北京明天")
+        assert "°C" in content
+
+    @pytest.mark.anyio
+    async def test_graph_pushes_forecast_component(self):
+        """测试 graph 推送 forecast 组件"""
+        from agent.graph import graph
+
+        result = await graph.ainvoke({"messages": [HumanMessage(content="这周上海温度")], "ui": []})
+        ui = result["ui"][0]
+        assert ui["name"] == "forecast"
+        assert ui["props"]["city"] == "上海"
+        assert len(ui["props"]["days"]) == 7
+        for day in ui["props"]["days"]:
+            assert day["min"] <= day["avg"] <= day["max"]
@@ -0,0 +1,109 @@
+"""测试行政区划层级索引的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import random
+import time
+
+import pytest
+
+from agent.divisions import ADMIN_DIVISIONS
+from agent.gazetteer import AdminLevel, Gazetteer, short_name
+from agent.graph import WEATHER_DATA, extract_city_from_message
+
+
+def synthetic_divisions(provinces=34, cities=12, districts=9, seed=0):
+    """生成与全国区划规模相当的合成数据（约 3.7k 条）"""
+    rng = random.Random(seed)
+    pool = "安平康宁阳山河江湖海东西南北中新兴华永长清和泰丰德福兰云龙凤"
+    divisions = []
+    for p in range(provinces):
+        pcode = f"{p + 11:02d}"
+        divisions.append((f"{pcode}0000", "".join(rng.sample(pool, 3)) + "省"))
+        for c in range(1, cities + 1):
+            divisions.append((f"{pcode}{c:02d}00", "".join(rng.sample(pool, 3)) + "市"))
+            for d in range(1, districts + 1):
+                divisions.append((f"{pcode}{c:02d}{d:02d}", "".join(rng.sample(pool, 3)) + "区"))
+    return divisions
+
+
+class TestGazetteer:
+    """行政区划索引单元测试"""
+
+    @pytest.fixture
+    def gazetteer(self):
+        return Gazetteer(ADMIN_DIVISIONS)
+
+    @pytest.fixture
+    def available(self):
+        return {w["city"] for w in WEATHER_DATA}
+
+    def test_short_name(self):
+        """测试行政后缀去除"""
+        assert short_name("广州市") == "广州"
+        assert short_name("浦东新区") == "浦东"
+        assert short_name("新疆维吾尔自治区") == "新疆"
+        assert short_name("东区") == "东区"
+
+    def test_parent_pointers(self, gazetteer):
+        """测试父节点由区划编码推导"""
+        idx = gazetteer.codes.index("440305")
+        chain = [gazetteer.names[i] for i in gazetteer.ancestors(idx)]
+        assert chain == ["深圳市", "广东省"]
+        assert gazetteer.levels[idx] == AdminLevel.DISTRICT
+
+        # 直辖市的区直接挂在市级单位下
+        haidian = gazetteer.codes.index("110108")
+        assert [gazetteer.names[i] for i in gazetteer.ancestors(haidian)] == ["北京市"]
+
+    def test_resolve_levels(self, gazetteer, available):
+        """测试各级地名解析到最近的有数据城市"""
+        cases = [
+            ("南山区天气", "深圳"),
+            ("余杭天气", "杭州"),
+            ("浦东新区的温度", "上海"),
+            ("浙江天气", "杭州"),
+            ("广东天气怎么样", "广州"),
+            ("海淀", "北京"),
+        ]
+        for text, expected in cases:
+            assert gazetteer.resolve(text, available) == expected, text
+
+    def test_resolve_ambiguity_by_containment(self, gazetteer, available):
+        """测试重名区县通过上级地名消歧"""
+        assert gazetteer.resolve("北京朝阳区天气", available) == "北京"
+        # 明确指定长春的朝阳区，没有数据时不应误选北京
+        assert gazetteer.resolve("吉林长春朝阳区天气", available) is None
+        # 没有上下文时选择能解析到数据的候选
+        assert gazetteer.resolve("朝阳区天气", available) == "北京"
+
+    def test_resolve_without_data(self, gazetteer, available):
+        """测试没有数据或不是地名的情况"""
+        for text in ["四川天气", "东京的温度", "今天蓝天白云", "天气", ""]:
+            assert gazetteer.resolve(text, available) is None, text
+
+    def test_extract_city_uses_gazetteer(self):
+        """测试城市提取接入区划解析"""
+        assert extract_city_from_message("南山区天气") == "深圳"
+        assert extract_city_from_message("余杭天气") == "杭州"
+        # 直接匹配仍然优先
+        assert extract_city_from_message("上海和南山区天气") == "上海"
+
+    def test_national_scale_lookup_is_sub_millisecond(self):
+        """测试全国规模索引的查询延迟"""
+        divisions = synthetic_divisions()
+        gazetteer = Gazetteer(divisions)
+        assert len(gazetteer) > 3500
+
+        district_names = [name for code, name in divisions if code[4:] != "00"]
+        available = {short_name(name) for code, name in divisions if code[2:] == "0000"}
+        queries = [f"{name}明天天气怎么样" for name in district_names[:500]]
+
+        start = time.perf_counter()
+        for query in queries:
+            gazetteer.resolve(query, available)
+        per_lookup = (time.perf_counter() - start) / len(queries)
+        assert per_lookup < 1e-3, f"单次查询 {per_lookup * 1e6:.1f}us 超过 1ms"
@@ -5,7 +5,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
 import pytest
-from agent.graph import extract_city_from_message, WEATHER_DATA
+from agent.graph import EXTRACTION_SCAN_CHARS, extract_city_from_message, WEATHER_DATA
 
 
 class TestMessageParsing:
@@ -145,4 +145,27 @@ class TestMessageParsing:
         
         for message, expected_city in patterns_to_test:
             result = extract_city_from_message(message)
-            assert result == expected_city, f"天气模式测试失败: '{message}' -> '{result}' (期望: '{expected_city}')"
\ No newline at end of file
+            assert result == expected_city, f"天气模式测试失败: '{message}' -> '{result}' (期望: '{expected_city}')"
+
+class TestAdversarialInputs:
+    """超长 / 对抗性输入的扫描量上限测试"""
+
+    def _assert_bounded(self, scanned, message, expected=None):
+        assert extract_city_from_message(message) == expected
+        assert scanned and max(scanned) <= EXTRACTION_SCAN_CHARS, f"{len(message)} 字符的消息扫描了 {max(scanned)} 字符"
+        scanned.clear()
+
+    def test_backtracking_patterns(self, scanned):
+        """测试会让惰性正则回溯的输入只扫描有界前缀"""
+        self._assert_bounded(scanned, "查询" + "的天" * 2_000_000)
+        self._assert_bounded(scanned, "的" * 4_000_000)
+        self._assert_bounded(scanned, "天气" * 2_000_000)
+
+    def test_city_after_scan_window_is_ignored(self, scanned):
+        """测试扫描窗口之外的城市不会被读取"""
+        self._assert_bounded(scanned, "啊" * 3_000_000 + "北京天气")
+        self._assert_bounded(scanned, "啊" * (EXTRACTION_SCAN_CHARS - 4) + "北京天气", "北京")
+
+    def test_many_near_miss_city_prefixes(self, scanned):
+        """测试大量城市前缀（北、上、广）不会退化"""
+        self._assert_bounded(scanned, "北上广深杭" * 800_000)
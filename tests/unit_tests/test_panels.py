@@ -0,0 +1,172 @@
+"""测试天气卡片并行面板（实时天气、空气质量、预警、日出日落）的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+import time
+from datetime import date, timedelta
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent.graph import CURRENT_UNAVAILABLE, STALE_NOTE, builder, graph, weather_node
+from agent.metrics import REGISTRY
+from agent.panels import (
+    AIR_QUALITY,
+    ALERTS,
+    SUN,
+    AirQualityProvider,
+    SunProvider,
+    aqi_level,
+    merge_panels,
+    sun_times,
+)
+from agent.providers import WeatherFetcher
+
+graph_module = sys.modules["agent.graph"]
+
+
+class SlowProvider:
+    """等待一段时间后转发给内层数据源（或抛出错误）的面板数据源"""
+
+    def __init__(self, delay, inner=None, error=None):
+        self.delay = delay
+        self.inner = inner
+        self.error = error
+        self.name = "slow"
+
+    async def fetch(self, city):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return await self.inner.fetch(city)
+
+
+def ask(text):
+    return {"messages": [HumanMessage(content=text)], "ui": []}
+
+
+class TestProviders:
+    """本地面板数据源测试"""
+
+    def test_sun_times(self):
+        """测试日出日落时间与极昼极夜"""
+        times = sun_times(39.90, 116.41, date(2026, 6, 21))
+        cst = timedelta(hours=8)
+        assert (times.sunrise + cst).strftime("%H:%M") in {"04:45", "04:46", "04:47", "04:48"}
+        assert (times.sunset + cst).strftime("%H:%M") in {"19:45", "19:46", "19:47", "19:48"}
+        assert sun_times(80, 0, date(2026, 6, 21)).daylight == timedelta(days=1)
+        assert sun_times(-80, 0, date(2026, 6, 21)).daylight == timedelta(0)
+
+    @pytest.mark.anyio
+    async def test_sun_panel(self):
+        """测试日出日落面板按城市坐标与时区格式化"""
+        panel = await SunProvider({"北京": (39.90, 116.41)}).fetch("北京", date(2026, 10, 19))
+        assert panel["sunrise"] < "06:40" < "17:20" < panel["sunset"]
+        assert panel["dayLength"].startswith("11h")
+        with pytest.raises(KeyError):
+            await SunProvider({}).fetch("北京")
+
+    @pytest.mark.anyio
+    async def test_air_quality_levels(self):
+        """测试 AQI 分级，优良以下才给出首要污染物"""
+        assert [aqi_level(v) for v in (0, 50, 51, 150, 201, 301)] == ["优", "优", "良", "轻度污染", "重度污染", "严重污染"]
+        provider = AirQualityProvider({"北京": (120, "PM2.5"), "上海": (40, "O3")})
+        assert await provider.fetch("北京") == {"aqi": 120, "level": "轻度污染", "pollutant": "PM2.5"}
+        assert await provider.fetch("上海") == {"aqi": 40, "level": "优"}
+
+    def test_merge_panels(self):
+        """测试面板结果的归约：分支追加，None 清空"""
+        merged = merge_panels(merge_panels(None, {"current": 1}), {"sun": None})
+        assert merged == {"current": 1, "sun": None}
+        assert merge_panels(merged, None) == {}
+
+
+class TestFanOut:
+    """并行分支与降级测试"""
+
+    @pytest.mark.anyio
+    async def test_composite_card(self):
+        """测试卡片包含所有面板，回复中列出预警"""
+        result = await graph.ainvoke(ask("深圳天气"))
+        props = result["ui"][0]["props"]
+        assert props["temperature"] == "26°C" and props["airQuality"]["level"] == "优"
+        assert props["alerts"][0]["title"] in result["messages"][-1].content
+        assert set(props["sun"]) == {"sunrise", "sunset", "dayLength"}
+        assert "unavailable" not in props
+
+    @pytest.mark.anyio
+    async def test_latency_close_to_slowest_branch(self, monkeypatch):
+        """测试各分支并行执行，总耗时接近最慢的分支"""
+        for panel in (AIR_QUALITY, ALERTS, SUN):
+            inner = graph_module._panel_providers[panel]
+            monkeypatch.setitem(graph_module._panel_providers, panel, SlowProvider(0.1, inner))
+        monkeypatch.setattr(graph_module, "_weather_fetcher", WeatherFetcher(SlowProvider(0.1, graph_module._static_provider)))
+        start = time.perf_counter()
+        result = await graph.ainvoke(ask("北京天气"))
+        assert time.perf_counter() - start < 0.3  # 串行需要 0.4s
+        assert "unavailable" not in result["ui"][0]["props"]
+
+    @pytest.mark.anyio
+    async def test_slow_or_failing_branch_degrades_only_its_panel(self, monkeypatch):
+        """测试超时或出错的分支只丢弃自己的面板"""
+        monkeypatch.setitem(graph_module._panel_providers, SUN, SlowProvider(5))
+        monkeypatch.setitem(graph_module._panel_providers, ALERTS, SlowProvider(0, error=RuntimeError("down")))
+        timeouts = REGISTRY.get("weather_panel_degraded_total", panel=SUN, reason="timeout")
+        start = time.perf_counter()
+        result = await graph.ainvoke(ask("北京天气"), {"configurable": {"panel_timeout_ms": 50}})
+        assert time.perf_counter() - start < 1
+        props = result["ui"][0]["props"]
+        assert props["unavailable"] == [ALERTS, SUN]
+        assert props["temperature"] == "22°C" and "airQuality" in props
+        assert "sun" not in props and "alerts" not in props
+        assert REGISTRY.get("weather_panel_degraded_total", panel=SUN, reason="timeout") == timeouts + 1
+
+    @pytest.mark.anyio
+    async def test_slow_current_conditions_fall_back_and_trip_breaker(self, monkeypatch):
+        """测试实时天气超出分支预算时回退到内置数据，超时计入熔断器，熔断后不再等待上游"""
+        fetcher = WeatherFetcher(SlowProvider(5), fallback=graph_module._static_provider)
+        monkeypatch.setattr(graph_module, "_weather_fetcher", fetcher)
+        config = {"configurable": {"panel_timeout_ms": 50}}
+        for _ in range(fetcher.breaker.failure_threshold):
+            result = await graph.ainvoke(ask("北京天气"), config)
+            props = result["ui"][0]["props"]
+            assert props["stale"] is True and props["temperature"] == "22°C" and "unavailable" not in props
+            assert result["messages"][-1].content.endswith(STALE_NOTE)
+        assert fetcher.breaker.state == "open" and fetcher.stats.fallbacks == fetcher.breaker.failure_threshold
+        start = time.perf_counter()
+        await graph.ainvoke(ask("北京天气"), config)
+        assert time.perf_counter() - start < 0.05 and fetcher.stats.short_circuited == 1
+
+    @pytest.mark.anyio
+    async def test_current_conditions_failure_keeps_other_panels(self, monkeypatch):
+        """测试实时天气完全不可用时卡片显示占位，其余面板照常"""
+        monkeypatch.setattr(graph_module, "_weather_fetcher", WeatherFetcher(SlowProvider(0, error=RuntimeError("down"))))
+        result = await graph.ainvoke(ask("北京天气"))
+        props = result["ui"][0]["props"]
+        assert props["unavailable"] == ["current"] and props["temperature"] == "—"
+        assert props["airQuality"]["aqi"] == 68
+        assert result["messages"][-1].content == CURRENT_UNAVAILABLE.format(city="北京")
+
+    @pytest.mark.anyio
+    async def test_direct_call_matches_graph(self):
+        """测试直接调用 weather_node 得到与图相同的组合结果"""
+        direct = await weather_node(ask("深圳天气"))
+        via_graph = await graph.ainvoke(ask("深圳天气"))
+        assert direct["messages"][0].content == via_graph["messages"][-1].content
+        assert direct["context"]["city"] == "深圳" and "plan" not in direct
+
+    @pytest.mark.anyio
+    async def test_turn_state_is_cleared(self):
+        """测试一轮结束后检查点中不保留提取结果和面板"""
+        checkpointed = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "fan-out"}}
+        await checkpointed.ainvoke(ask("北京天气"), config)
+        result = await checkpointed.ainvoke(ask("湿度呢？"), config)
+        assert result["messages"][-1].content == "💧 北京当前湿度：45%"
+        assert result.get("plan") is None and not result.get("panels")
+
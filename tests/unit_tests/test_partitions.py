@@ -0,0 +1,120 @@
+"""测试按地区分区、按需加载与淘汰的天气数据存储的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.coordinates import PLACE_COORDINATES
+from agent.graph import WEATHER_DATA, extract_city_from_message, region_of, weather_node
+from agent.metrics import REGISTRY
+from agent.partitions import (
+    BundledPartitions,
+    JsonPartitions,
+    PartitionedWeatherStore,
+    write_partitions,
+)
+from agent.providers import TableProvider
+from agent.spatial import CityLocator
+
+graph_module = sys.modules["agent.graph"]
+
+
+class CountingSource(BundledPartitions):
+    """记录每个分区被加载次数的数据源"""
+
+    def __init__(self, records, key):
+        super().__init__(records, key)
+        self.loads = []
+
+    def load(self, partition):
+        self.loads.append(partition)
+        return super().load(partition)
+
+
+@pytest.fixture
+def source():
+    return CountingSource(WEATHER_DATA, region_of)
+
+
+class TestPartitionedStore:
+    """分区存储测试"""
+
+    def test_index_is_resident_without_loading(self, source):
+        """测试城市索引常驻，判断城市是否有数据不加载分区"""
+        store = PartitionedWeatherStore(source)
+        assert region_of("深圳") == region_of("广州") == "广东" and region_of("东京") == "其他"
+        assert "杭州" in store and "成都" not in store and len(store) == 5
+        assert store.partition_of("深圳") == "广东"
+        assert store.city_matcher.first_match("杭州天气")[2] == "杭州"
+        assert source.loads == [] and store.resident == ()
+
+    def test_loads_partition_on_first_request(self, source):
+        """测试首次查询分区内的城市时加载，之后命中常驻分区"""
+        store = PartitionedWeatherStore(source)
+        loads = REGISTRY.get("weather_partition_loads_total", partition="广东")
+        assert store.table_for("深圳").cities == ("深圳", "广州")
+        assert store.table_for("广州") is store.table_for("深圳")
+        assert store.table_for("成都") is None
+        assert source.loads == ["广东"] and store.resident == ("广东",)
+        assert REGISTRY.get("weather_partition_loads_total", partition="广东") == loads + 1
+
+    def test_evicts_least_recently_used_under_budget(self, source):
+        """测试超出内存预算时淘汰最久未用的分区，刚加载的分区不被淘汰"""
+        one = PartitionedWeatherStore(source).table_for("北京").nbytes()
+        store = PartitionedWeatherStore(source, budget_bytes=int(one * 2.5))
+        for city in ("北京", "上海", "北京", "杭州"):
+            store.table_for(city)
+        assert store.resident == ("北京", "浙江")
+        assert store.resident_bytes() <= store.budget_bytes
+        store.table_for("上海")
+        assert source.loads == ["北京", "北京", "上海", "浙江", "上海"]  # 第一次来自测量用的存储
+
+        tiny = PartitionedWeatherStore(source, budget_bytes=1)
+        assert tiny.table_for("深圳") is not None and tiny.resident == ("广东",)
+        tiny.table_for("杭州")
+        assert tiny.resident == ("浙江",)
+
+    def test_json_partitions(self, tmp_path):
+        """测试写入分区目录后按需读取单个分区文件"""
+        index = write_partitions(str(tmp_path), WEATHER_DATA, region_of)
+        assert index["杭州"] == "浙江" and (tmp_path / "index.json").exists()
+        store = PartitionedWeatherStore(JsonPartitions(str(tmp_path)))
+        assert store.table_for("广州").formatted("temperature")[store.table_for("广州").row("广州")] == "24°C"
+        assert store.resident == ("广东",)
+
+    def test_reload(self, source):
+        """测试重新加载索引后丢弃已加载分区并更新版本"""
+        store = PartitionedWeatherStore(source)
+        locator = CityLocator(store, PLACE_COORDINATES)
+        store.table_for("杭州")
+        assert locator.locate("南京天气").city == "杭州"
+        store.reload(BundledPartitions([r for r in WEATHER_DATA if r["city"] != "杭州"], region_of))
+        assert store.version == 1 and store.resident == () and "杭州" not in store
+        assert locator.locate("南京天气").city == "上海"
+
+    @pytest.mark.anyio
+    async def test_table_provider_over_store(self, source):
+        """测试数据源从分区存储读取实时天气"""
+        provider = TableProvider(PartitionedWeatherStore(source))
+        assert (await provider.fetch("上海"))["humidity"] == 68
+        assert provider.reading("成都") is None
+
+
+class TestGraphRouting:
+    """天气节点经由分区索引路由的测试"""
+
+    @pytest.mark.anyio
+    async def test_only_requested_partition_is_loaded(self, source, monkeypatch):
+        """测试城市提取只用常驻索引，回答只加载所查城市的分区"""
+        store = PartitionedWeatherStore(source)
+        monkeypatch.setattr(graph_module, "_weather_store", store)
+        monkeypatch.setattr(graph_module._static_provider, "_table", store)
+        assert extract_city_from_message("南山区天气") == "深圳"
+        assert source.loads == []
+        result = await weather_node({"messages": [HumanMessage(content="杭州天气")], "ui": []})
+        assert result["context"]["city"] == "杭州"
+        assert store.resident == ("浙江",)
@@ -0,0 +1,199 @@
+"""测试热门城市统计与缓存过期前提前刷新的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.graph import graph
+from agent.metrics import REGISTRY
+from agent.prefetch import RefreshAhead, SpaceSaving
+from agent.providers import WeatherFetcher
+
+graph_module = sys.modules["agent.graph"]
+
+
+class FakeClock:
+    """手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingProvider:
+    """记录上游调用次数的数据源，可以切换为出错"""
+
+    name = "counting"
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+        self.error = None
+
+    async def fetch(self, city):
+        self.calls.append(city)
+        if self.error:
+            raise self.error
+        return await self.inner.fetch(city)
+
+
+@pytest.fixture
+def upstream():
+    return CountingProvider(graph_module._static_provider)
+
+
+def make(upstream, clock, **options):
+    options = {"ttl": 60, "lead": 10, "top_n": 2, "rate": 1, "burst": 10, **options}
+    return RefreshAhead(WeatherFetcher(upstream), clock=clock, **options)
+
+
+class TestSpaceSaving:
+    """Space-Saving 热门统计测试"""
+
+    def test_exact_below_capacity(self):
+        """测试条目数不超过容量时计数精确，按计数降序返回"""
+        sketch = SpaceSaving(4)
+        for city in ["北京"] * 5 + ["上海"] * 3 + ["广州"]:
+            sketch.add(city)
+        assert [tuple(h) for h in sketch.top(2)] == [("北京", 5, 0), ("上海", 3, 0)]
+        assert sketch.total == 9 and "广州" in sketch
+
+    def test_heavy_hitters_survive_long_tail(self):
+        """测试大量只出现一次的城市挤不掉真正的热门城市，计数误差有上界"""
+        sketch = SpaceSaving(8)
+        for i in range(1000):
+            sketch.add("北京" if i % 3 == 0 else "上海" if i % 5 == 0 else f"城市{i}")
+        top = sketch.top(2)
+        assert [h.item for h in top] == ["北京", "上海"] and len(sketch) == 8
+        assert all(h.hits - h.error <= true <= h.hits for h, true in zip(top, (334, 133)))
+
+    def test_decay(self):
+        """测试衰减后计数减半，归零的条目被移除"""
+        sketch = SpaceSaving(4)
+        sketch.add("北京", 4)
+        sketch.add("上海")
+        sketch.decay()
+        assert sketch.top() == [("北京", 2, 0)] and sketch.total == 2
+
+
+class TestRefreshAhead:
+    """提前刷新缓存测试"""
+
+    @pytest.mark.anyio
+    async def test_caches_fresh_readings(self, upstream):
+        """测试有效期内的读数直接从缓存返回，过期后重新请求上游"""
+        clock = FakeClock()
+        cache = make(upstream, clock)
+        first = await cache.fetch_with_fallback("北京")
+        assert not first.stale and (await cache.fetch_with_fallback("北京")).reading == first.reading
+        assert upstream.calls == ["北京"]
+        clock.now = 61
+        await cache.fetch_with_fallback("北京")
+        assert upstream.calls == ["北京", "北京"] and cache.stats.hits == 1
+
+    @pytest.mark.anyio
+    async def test_refreshes_top_cities_before_expiry(self, upstream):
+        """测试只刷新最热门的 N 个城市，且在过期前 lead 秒内才刷新"""
+        clock = FakeClock()
+        cache = make(upstream, clock)
+        for city, n in (("北京", 5), ("上海", 3), ("广州", 1)):
+            for _ in range(n):
+                cache.record(city)
+        assert await cache.refresh() == 2 and upstream.calls == ["北京", "上海"]
+        assert cache.due() == [] and await cache.refresh() == 0
+
+        clock.now = 55
+        assert cache.due() == ["北京", "上海"]
+        await cache.refresh()
+        clock.now = 100  # 第一次预取的读数已过期，第二次的还有效
+        result = await cache.fetch_with_fallback("北京")
+        assert not result.stale and upstream.calls == ["北京", "上海"] * 2
+        assert cache.stats.prefetch_hits == 1 and cache.expires_in("北京") == 15
+
+    @pytest.mark.anyio
+    async def test_prefetch_budget(self, upstream):
+        """测试预取受令牌桶限速，超出预算的城市留到下一轮"""
+        clock = FakeClock()
+        cache = make(upstream, clock, top_n=5, rate=1, burst=2)
+        for city in ("北京", "上海", "广州", "深圳"):
+            cache.record(city)
+        throttled = REGISTRY.get("weather_prefetch_total", result="throttled")
+        assert await cache.refresh() == 2 and cache.stats.throttled == 1
+        assert REGISTRY.get("weather_prefetch_total", result="throttled") == throttled + 1
+        clock.now = 1
+        assert await cache.refresh() == 1 and len(upstream.calls) == 3
+
+    @pytest.mark.anyio
+    async def test_errors_and_stale_readings_are_not_cached(self, upstream):
+        """测试预取失败只计数，回退的过期数据不写入缓存"""
+        clock = FakeClock()
+        cache = RefreshAhead(WeatherFetcher(upstream, fallback=graph_module._static_provider), clock=clock)
+        upstream.error = RuntimeError("down")
+        cache.record("北京")
+        assert await cache.refresh() == 0 and cache.stats.errors == 1
+        assert (await cache.fetch_with_fallback("北京")).stale and len(cache) == 0
+
+    @pytest.mark.anyio
+    async def test_version_change_drops_cache(self, upstream):
+        """测试数据集版本变化后缓存的读数作废"""
+        version = [0]
+        cache = make(upstream, FakeClock(), version=lambda: version[0])
+        await cache.fetch_with_fallback("北京")
+        version[0] = 1
+        await cache.fetch_with_fallback("北京")
+        assert upstream.calls == ["北京", "北京"]
+
+    @pytest.mark.anyio
+    async def test_report(self, upstream):
+        """测试报告热门城市、命中率与节省的上游调用"""
+        clock = FakeClock()
+        cache = make(upstream, clock, top_n=1)
+        for _ in range(4):
+            cache.record("上海")
+        await cache.refresh()
+        for _ in range(4):
+            await cache.fetch_with_fallback("上海")
+        await cache.fetch_with_fallback("广州")
+        report = cache.report()
+        assert report["top"] == [("上海", 4, 0)]
+        assert report["requests"] == 5 and report["prefetch_hit_ratio"] == 0.8
+        assert report["upstream_calls"] == 2 and report["upstream_saved"] == 3
+        assert REGISTRY.get("weather_prefetch_hit_ratio") == 0.8
+
+    @pytest.mark.anyio
+    async def test_background_loop(self, upstream):
+        """测试后台循环定时刷新，停止后不再请求上游"""
+        cache = make(upstream, FakeClock())
+        cache.record("北京")
+        cache.start(interval=0.01)
+        await asyncio.sleep(0.05)
+        await cache.stop()
+        assert upstream.calls == ["北京"]
+
+
+class TestGraphIntegration:
+    """图中启用提前刷新的测试"""
+
+    @pytest.mark.anyio
+    async def test_weather_turns_feed_the_sketch(self, upstream, monkeypatch):
+        """测试天气问答记录城市热度，预取之后的请求不再访问上游"""
+        monkeypatch.setattr(graph_module, "_weather_fetcher", WeatherFetcher(upstream))
+        monkeypatch.setattr(graph_module, "_refresh_ahead", None)
+        cache = graph_module.enable_refresh_ahead(top_n=1, lead=3600)  # 缓存中的城市也视为即将过期
+        for text in ("北京天气", "北京天气怎么样", "上海天气"):
+            await graph.ainvoke({"messages": [HumanMessage(content=text)], "ui": []})
+        assert cache.top(2) == [("北京", 2, 0), ("上海", 1, 0)]
+        assert upstream.calls == ["北京", "上海"]
+
+        await cache.refresh()
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []})
+        assert result["ui"][0]["props"]["temperature"] == "22°C"
+        assert upstream.calls == ["北京", "上海", "北京"] and cache.stats.prefetch_hits == 1
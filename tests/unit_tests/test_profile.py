@@ -0,0 +1,96 @@
+"""测试图运行性能分析命令行的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import json
+import pstats
+import tracemalloc
+
+from agent.profile import MemoryRecorder, main, plan
+
+graph_module = sys.modules["agent.graph"]
+
+
+class TestMemoryRecorder:
+    """嵌套内存区间测试"""
+
+    def test_nested_peaks(self):
+        """测试子区间的峰值计入父区间，键按层级拼接"""
+        recorder = MemoryRecorder()
+        tracemalloc.start()
+        try:
+            recorder.enter("")
+            recorder.enter("node")
+            with recorder.span("phase"):
+                block = bytearray(200_000)
+                del block
+            kept = bytearray(50_000)
+            recorder.exit()
+            peak, retained = recorder.exit()
+        finally:
+            tracemalloc.stop()
+        assert set(recorder.stats) == {"node", "node/phase"}
+        assert recorder.stats["node/phase"].max_peak >= 200_000
+        assert recorder.stats["node"].max_peak >= 200_000 and peak >= 200_000
+        assert 50_000 <= retained < 200_000
+        del kept
+
+    def test_overlapping_spans(self):
+        """测试并行分支的区间交错结束时按句柄关闭，键按指定的父区间拼接"""
+        recorder = MemoryRecorder()
+        tracemalloc.start()
+        try:
+            root = recorder.enter("")
+            first = recorder.enter("panel", root)
+            second = recorder.enter("panel", root)
+            recorder.exit(first)
+            with recorder.span("fetch"):
+                pass
+            recorder.exit(second)
+            recorder.exit(root)
+        finally:
+            tracemalloc.stop()
+        assert recorder.stats["panel"].calls == 2
+        assert set(recorder.stats) == {"panel", "panel/fetch"}
+        assert recorder.root is None
+
+
+class TestProfileCLI:
+    """命令行测试"""
+
+    def test_plan_assigns_threads_round_robin(self):
+        """测试请求按轮询分配到会话"""
+        requests = plan([("北京天气", {}), ("湿度呢", {})], 5, 2)
+        assert [r.thread_id for r in requests] == ["profile-0", "profile-1"] * 2 + ["profile-0"]
+        assert [r.message for r in requests][:3] == ["北京天气", "湿度呢", "北京天气"]
+        assert all(r.thread_id is None for r in plan([("你好", {})], 3, 0))
+
+    def test_all_passes_write_outputs(self, tmp_path, capsys):
+        """测试三种分析都写出结果，并恢复被替换的函数"""
+        originals = (graph_module.extract_city_from_message, graph_module._admission)
+        log = tmp_path / "log.jsonl"
+        log.write_text("\n".join(json.dumps(m, ensure_ascii=False) for m in ["北京天气", "湿度呢？", "哪个城市最热"]))
+        out = tmp_path / "profiles"
+        assert main(["--workload", str(log), "--requests", "12", "--threads", "2", "-o", str(out)]) == 0
+
+        assert pstats.Stats(str(out / "cpu.pstats")).total_calls > 0
+        folded = (out / "flame.folded").read_text(encoding="utf-8").splitlines()
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+
+        report = (out / "memory.txt").read_text(encoding="utf-8")
+        assert "requests: 12" in report
+        for key in ("weather ", "weather/extract_city", "panel/fetch", "compose/push_ui", "query/parse_ranking", "route_message"):
+            assert key in report
+        assert "state bytes per thread (2 threads" in report and "messages" in report
+        assert report in capsys.readouterr().out
+
+        assert (graph_module.extract_city_from_message, graph_module._admission) == originals
+        assert "fetch_with_fallback" not in vars(graph_module._weather_fetcher)
+
+    def test_single_mode(self, tmp_path):
+        """测试只运行选定的分析"""
+        assert main(["--mode", "cpu", "--requests", "3", "--threads", "0", "-o", str(tmp_path)]) == 0
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["cpu.pstats", "cpu.txt"]
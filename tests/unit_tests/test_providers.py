@@ -0,0 +1,269 @@
+"""测试数据源截止时间与对冲请求的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.graph import WEATHER_DATA, AgentState, graph, weather_node
+from agent.metrics import REGISTRY, MetricsRegistry
+from agent.providers import (
+    CircuitBreaker,
+    CircuitOpen,
+    Deadline,
+    DeadlineExceeded,
+    LatencyWindow,
+    TableProvider,
+    WeatherFetcher,
+)
+from agent.weather_store import WeatherTable
+
+
+class ScriptedProvider:
+    """按脚本返回延迟的假数据源"""
+
+    name = "scripted"
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = 0
+        self.table = TableProvider(WeatherTable(WEATHER_DATA))
+
+    async def fetch(self, city):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return await self.table.fetch(city)
+
+
+class FlakyProvider:
+    """可切换为故障状态的假数据源"""
+
+    name = "flaky"
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+        self.table = TableProvider(WeatherTable([{**WEATHER_DATA[0], "temperature": "30°C"}]))
+
+    async def fetch(self, city):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("upstream down")
+        return await self.table.fetch(city)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def warmed_up(provider, latency=0.001, samples=20):
+    """返回已积累延迟样本的 fetcher"""
+    fetcher = WeatherFetcher(provider, min_samples=samples)
+    for _ in range(samples):
+        fetcher.latencies.add(latency)
+    return fetcher
+
+
+class TestDeadline:
+    """截止时间测试"""
+
+    def test_from_config(self):
+        """测试从配置读取绝对和相对截止时间"""
+        assert Deadline.from_config({}).remaining() is None
+        assert 0.9 < Deadline.from_config({"timeout_ms": 1000}).remaining() <= 1.0
+        both = Deadline.from_config({"deadline": time.time() + 10, "timeout_ms": 500})
+        assert both.remaining() <= 0.5
+        assert Deadline.from_config({"deadline": time.time() - 1}).expired
+
+    def test_latency_window(self):
+        """测试延迟窗口只保留最近的样本"""
+        window = LatencyWindow(size=4)
+        assert window.percentile(95) is None
+        for value in [9.0, 1.0, 2.0, 3.0, 4.0]:
+            window.add(value)
+        assert len(window) == 4
+        assert window.percentile(100) == 4.0
+        assert window.percentile(50) == 2.0
+
+
+class TestWeatherFetcher:
+    """对冲请求测试"""
+
+    @pytest.mark.anyio
+    async def test_deadline_cancels_slow_fetch(self):
+        """测试超过截止时间时抛出异常并取消请求"""
+        provider = ScriptedProvider([1.0])
+        fetcher = WeatherFetcher(provider)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await fetcher.fetch("北京", Deadline.after(0.02))
+        assert time.perf_counter() - start < 0.5
+        await asyncio.sleep(0)
+        assert provider.cancelled == 1
+        assert fetcher.stats.deadline_exceeded == 1
+
+    @pytest.mark.anyio
+    async def test_hedge_wins_and_loser_is_cancelled(self):
+        """测试首个请求过慢时对冲请求胜出"""
+        provider = ScriptedProvider([1.0, 0.0])
+        fetcher = warmed_up(provider)
+        reading = await fetcher.fetch("上海", Deadline.after(0.5), hedge=True)
+        assert reading["city"] == "上海"
+        assert provider.calls == 2
+        await asyncio.sleep(0)
+        assert provider.cancelled == 1
+        stats = fetcher.stats.snapshot()
+        assert stats["hedges_fired"] == 1 and stats["hedges_won"] == 1
+        assert stats["hedge_win_rate"] == 1.0
+
+    @pytest.mark.anyio
+    async def test_cancelled_attempts_are_recorded(self):
+        """测试被截止时间取消或输掉对冲的慢请求也计入延迟窗口"""
+        fetcher = WeatherFetcher(ScriptedProvider([1.0]))
+        with pytest.raises(DeadlineExceeded):
+            await fetcher.fetch("北京", Deadline.after(0.05))
+        await asyncio.sleep(0)
+        assert len(fetcher.latencies) == 1 and fetcher.latencies.percentile(100) >= 0.05
+
+        hedged = warmed_up(ScriptedProvider([1.0, 0.0]), latency=0.01)
+        await hedged.fetch("上海", Deadline.after(0.5), hedge=True)
+        await asyncio.sleep(0)
+        assert len(hedged.latencies) == 22 and hedged.latencies.percentile(100) >= 0.01
+
+    @pytest.mark.anyio
+    async def test_no_hedge_when_fast_or_cold(self):
+        """测试快速请求和冷启动阶段不发起对冲"""
+        fast = ScriptedProvider([0.0])
+        fetcher = warmed_up(fast, latency=0.5)
+        await fetcher.fetch("北京", hedge=True)
+        assert fast.calls == 1 and fetcher.stats.hedges_fired == 0
+
+        cold = WeatherFetcher(ScriptedProvider([0.05, 0.0]))
+        await cold.fetch("北京", hedge=True)
+        assert cold.provider.calls == 1
+
+    @pytest.mark.anyio
+    async def test_errors_propagate(self):
+        """测试数据源错误照常抛出"""
+        fetcher = WeatherFetcher(TableProvider(WeatherTable(WEATHER_DATA)))
+        with pytest.raises(KeyError):
+            await fetcher.fetch("纽约")
+        assert fetcher.stats.errors == 1
+
+
+class TestCircuitBreaker:
+    """熔断器测试"""
+
+    def test_state_machine(self):
+        """测试关闭 -> 打开 -> 半开 -> 关闭 / 重新打开"""
+        REGISTRY.reset()
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=clock)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state == "closed" and breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+
+        clock.now = 10
+        assert breaker.state == "half_open"
+        assert breaker.allow()
+        assert not breaker.allow()  # 只放行一个探测请求
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        clock.now = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert REGISTRY.get("weather_breaker_transitions_total", source="test", to="open") == 2
+        assert REGISTRY.get("weather_breaker_state", source="test") == 0
+
+    @pytest.mark.anyio
+    async def test_open_breaker_fails_fast_with_fallback(self):
+        """测试熔断后不再请求数据源，先回退到缓存再回退到内置数据"""
+        REGISTRY.reset()
+        provider = FlakyProvider()
+        breaker = CircuitBreaker(provider.name, failure_threshold=2, reset_timeout=10, clock=FakeClock())
+        fetcher = WeatherFetcher(provider, breaker=breaker, fallback=TableProvider(WeatherTable(WEATHER_DATA)))
+
+        fresh = await fetcher.fetch_with_fallback("北京")
+        assert not fresh.stale and fresh.reading["temperature"] == 30.0
+
+        provider.down = True
+        for _ in range(2):
+            result = await fetcher.fetch_with_fallback("北京")
+            assert result.stale and result.reading["temperature"] == 30.0  # 最近一次的缓存
+        assert breaker.state == "open"
+
+        calls = provider.calls
+        with pytest.raises(CircuitOpen):
+            await fetcher.fetch("北京")
+        result = await fetcher.fetch_with_fallback("北京")
+        assert provider.calls == calls
+        assert result.stale
+        assert fetcher.stats.short_circuited == 2
+
+        with pytest.raises(CircuitOpen):
+            await fetcher.fetch_with_fallback("纽约")  # 没有任何可回退的数据
+        assert REGISTRY.get("weather_fallbacks_total", source="flaky", reason="error", served="cache") == 2
+        assert REGISTRY.get("weather_fallbacks_total", source="flaky", reason="open", served="cache") == 1
+
+    @pytest.mark.anyio
+    async def test_static_fallback_marks_card_stale(self, monkeypatch):
+        """测试无缓存时回退到内置数据并在组件属性中标记"""
+        provider = FlakyProvider()
+        provider.down = True
+        fetcher = WeatherFetcher(provider, fallback=TableProvider(WeatherTable(WEATHER_DATA)))
+        monkeypatch.setattr(sys.modules["agent.graph"], "_weather_fetcher", fetcher)
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []})
+        props = result["ui"][0]["props"]
+        assert props["stale"] is True
+        assert props["temperature"] == "22°C"
+
+    def test_prometheus_render(self):
+        """测试 Prometheus 文本格式导出"""
+        registry = MetricsRegistry()
+        registry.describe("requests_total", "Requests")
+        registry.inc("requests_total", source="a")
+        registry.inc("requests_total", 2, source="a")
+        registry.set("state", 1, source="a")
+        text = registry.render()
+        assert '# HELP requests_total Requests' in text
+        assert 'requests_total{source="a"} 3' in text
+        assert '# TYPE state gauge' in text
+        assert registry.snapshot() == {'requests_total{source="a"}': 3, 'state{source="a"}': 1}
+
+
+class TestWeatherNodeDeadline:
+    """天气节点传递截止时间测试"""
+
+    @pytest.mark.anyio
+    async def test_node_answers_within_deadline(self, monkeypatch):
+        """测试数据源过慢时节点按截止时间返回内置数据"""
+        fetcher = WeatherFetcher(ScriptedProvider([1.0]), fallback=TableProvider(WeatherTable(WEATHER_DATA)))
+        monkeypatch.setattr(sys.modules["agent.graph"], "_weather_fetcher", fetcher)
+        state = AgentState(messages=[HumanMessage(content="北京天气")], ui=[])
+        start = time.perf_counter()
+        result = await weather_node(state, {"configurable": {"timeout_ms": 20}})
+        assert time.perf_counter() - start < 0.5
+        assert "最近一次的数据" in result["messages"][0].content
+        assert fetcher.stats.deadline_exceeded == 1
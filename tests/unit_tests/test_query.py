@@ -0,0 +1,131 @@
+"""测试排名与筛选查询的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import random
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.graph import WEATHER_DATA, AgentState, graph, route_message
+from agent.query import RankingIndex, RankingQuery, SortedIndex, parse_ranking_query
+from agent.units import HUMIDITY_UNITS, TEMPERATURE_UNITS
+from agent.weather_store import WeatherTable
+
+
+class TestParseRankingQuery:
+    """排名查询解析测试"""
+
+    def test_superlatives(self):
+        """测试最高级问题"""
+        assert parse_ranking_query("哪个城市最热") == RankingQuery("temperature", True, 1)
+        assert parse_ranking_query("哪个城市最冷？") == RankingQuery("temperature", False, 1)
+        assert parse_ranking_query("哪个城市最干燥") == RankingQuery("humidity", False, 1)
+        assert parse_ranking_query("哪个城市风最大") == RankingQuery("windSpeed", True, 1)
+
+    def test_top_k(self):
+        """测试前 k 名"""
+        assert parse_ranking_query("top 5 windiest cities") == RankingQuery("windSpeed", True, 5)
+        assert parse_ranking_query("温度最高的前三个城市") == RankingQuery("temperature", True, 3)
+        assert parse_ranking_query("城市湿度排名") == RankingQuery("humidity", True, None)
+
+    def test_ranges(self):
+        """测试范围筛选"""
+        assert parse_ranking_query("湿度低于50%的城市") == RankingQuery("humidity", False, None, None, 50.0)
+        assert parse_ranking_query("温度20度以上的城市") == RankingQuery(
+            "temperature", True, None, 20.0, None, low_inclusive=True
+        )
+        assert parse_ranking_query("温度高于20且低于25的城市") == RankingQuery(
+            "temperature", False, None, 20.0, 25.0
+        )
+
+    def test_not_a_ranking_query(self):
+        """测试普通天气问题不解析为排名"""
+        for text in ["北京最高温度", "北京天气", "你好", "明天会下雨吗"]:
+            assert parse_ranking_query(text) is None, text
+
+
+class TestSortedIndex:
+    """有序二级索引测试"""
+
+    def test_top_and_range_match_full_scan(self):
+        """测试 top-k 和范围查询与全表扫描结果一致"""
+        rng = random.Random(0)
+        column = [rng.uniform(-20, 40) for _ in range(2000)]
+        index = SortedIndex(column)
+
+        by_value = sorted(range(len(column)), key=column.__getitem__)
+        assert index.top(10) == by_value[::-1][:10]
+        assert index.top(10, descending=False) == by_value[:10]
+        assert index.top(None) == by_value[::-1]
+
+        expected = [i for i in by_value if 0 <= column[i] < 10]
+        assert index.range(0, 10, high_inclusive=False) == expected
+        assert index.range(low=35) == [i for i in by_value if column[i] >= 35]
+        assert index.range(high=-100) == []
+
+    def test_inclusive_bounds(self):
+        """测试边界包含关系"""
+        index = SortedIndex([10.0, 20.0, 20.0, 30.0])
+        assert index.range(20, 20) == [1, 2]
+        assert index.range(20, 30, low_inclusive=False) == [3]
+        assert index.range(10, 30, low_inclusive=False, high_inclusive=False) == [1, 2]
+
+
+class TestRankingIndex:
+    """天气表排名索引测试"""
+
+    def test_run_queries(self):
+        """测试在天气表上执行查询"""
+        table = WeatherTable(WEATHER_DATA)
+        ranking = RankingIndex(table)
+        hottest = ranking.run(RankingQuery("temperature", True, 1), TEMPERATURE_UNITS["C"])
+        assert [table.cities[i] for i in hottest] == ["深圳"]
+        dry = ranking.run(RankingQuery("humidity", False, None, None, 60.0), HUMIDITY_UNITS["%"])
+        assert [table.cities[i] for i in dry] == ["北京", "杭州"]
+
+    def test_fahrenheit_thresholds(self):
+        """测试华氏度阈值先换算回摄氏度"""
+        table = WeatherTable(WEATHER_DATA)
+        rows = RankingIndex(table).run(RankingQuery("temperature", True, None, 75.0), TEMPERATURE_UNITS["F"])
+        # 75°F ≈ 23.9°C
+        assert [table.cities[i] for i in rows] == ["深圳", "广州"]
+
+    def test_rebuilds_after_reload(self):
+        """测试数据重载后索引重建"""
+        table = WeatherTable(WEATHER_DATA)
+        ranking = RankingIndex(table)
+        ranking.run(RankingQuery("temperature"), TEMPERATURE_UNITS["C"])
+        table.reload([{**WEATHER_DATA[0], "temperature": "40°C"}, *WEATHER_DATA[1:]])
+        rows = ranking.run(RankingQuery("temperature", True, 1), TEMPERATURE_UNITS["C"])
+        assert table.cities[rows[0]] == "北京"
+
+
+class TestQueryNode:
+    """查询节点测试"""
+
+    def test_routing(self):
+        """测试排名问题路由到查询节点"""
+        state = AgentState(messages=[HumanMessage(content="哪个城市最热")], ui=[])
+        assert route_message(state) == "query"
+
+    @pytest.mark.anyio
+    async def test_weather_list_component(self):
+        """测试推送对比列表组件"""
+        result = await graph.ainvoke({"messages": [HumanMessage(content="湿度低于50%的城市")], "ui": []})
+        ui = result["ui"][0]
+        assert ui["name"] == "weather_list"
+        assert ui["props"]["metric"] == "humidity"
+        assert [item["city"] for item in ui["props"]["items"]] == ["北京"]
+        assert ui["props"]["items"][0]["display"] == "45%"
+
+    @pytest.mark.anyio
+    async def test_falls_back_when_not_a_ranking(self):
+        """测试信号词误命中时回到常规分支"""
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京最高温度")], "ui": []})
+        assert result["ui"][0]["name"] == "weather"
+        result = await graph.ainvoke({"messages": [HumanMessage(content="我的分数高于90")], "ui": []})
+        assert result["ui"] == []
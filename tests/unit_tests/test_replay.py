@@ -0,0 +1,149 @@
+"""测试流量回放与对比工具的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+import io
+import json
+
+from agent.graph import BUSY_REPLY
+from agent.replay import diff, iter_lines, main, run
+
+graph_module = sys.modules["agent.graph"]
+
+
+def write_log(path, messages):
+    """写入一份 JSONL 日志"""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, message in enumerate(messages):
+            record = message if i % 2 else {"id": i, "message": message}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def slow(fetch, delay=0.1):
+    """让数据源调用变慢，使回放的请求同时在途"""
+
+    async def wrapper(city):
+        await asyncio.sleep(delay)
+        return await fetch(city)
+
+    return wrapper
+
+
+class TestIterLines:
+    """按字节范围切分日志测试"""
+
+    def test_shards_cover_every_line_once(self, tmp_path):
+        """测试任意切分点下每一行恰好属于一个分片"""
+        log = tmp_path / "log.jsonl"
+        write_log(log, [f"消息{i}" * (i % 7 + 1) for i in range(50)])
+        expected = list(iter_lines(str(log)))
+        size = log.stat().st_size
+        for cut in [1, 17, expected[10][0], expected[10][0] + 1, size - 1]:
+            shards = list(iter_lines(str(log), 0, cut)) + list(iter_lines(str(log), cut, None))
+            assert shards == expected, cut
+
+
+class TestReplay:
+    """回放测试"""
+
+    def test_run_records_city_ui_and_latency(self, tmp_path):
+        """测试回放记录城市、组件属性和延迟，并保持输入顺序"""
+        log = tmp_path / "log.jsonl"
+        messages = ["北京天气怎么样", "你好", "南山区天气", "哪个城市最热", "上海天气"] * 4
+        write_log(log, messages)
+        with open(log, "a", encoding="utf-8") as f:
+            f.write("\n{not json\n")
+
+        out = tmp_path / "out.jsonl"
+        assert run(str(log), str(out), "agent.graph:graph", concurrency=3, workers=1) == len(messages) + 1
+        results = read_results(out)
+        assert [r["input"] for r in results[:-1]] == messages
+        assert [r["offset"] for r in results] == sorted(r["offset"] for r in results)
+        assert results[0]["id"] == 0 and results[0]["city"] == "北京"
+        assert results[0]["ui"][0]["name"] == "weather"
+        assert results[1]["city"] is None and results[1]["ui"] == []
+        assert results[2]["city"] == "深圳"
+        assert all(r["latency_ms"] >= 0 for r in results)
+        assert results[-1]["error"].startswith("JSONDecodeError")
+
+    def test_sharded_run_matches_single_worker(self, tmp_path):
+        """测试多进程分片回放与单进程结果一致"""
+        log = tmp_path / "log.jsonl"
+        write_log(log, ["北京天气", "杭州天气", "你好", "浙江天气"] * 5)
+        single, sharded = tmp_path / "single.jsonl", tmp_path / "sharded.jsonl"
+        run(str(log), str(single), "agent.graph:graph", concurrency=4, workers=1)
+        run(str(log), str(sharded), "agent.graph:graph", concurrency=4, workers=3)
+
+        def strip(records):
+            return [{k: v for k, v in r.items() if k != "latency_ms"} for r in records]
+
+        assert strip(read_results(single)) == strip(read_results(sharded))
+        assert not any(p.name.startswith("sharded.jsonl.part") for p in tmp_path.iterdir())
+
+    def test_admission_does_not_throttle_replay(self, tmp_path):
+        """测试回放时准入控制不限流：同一租户的大量请求都得到正常回答，结束后恢复原控制器"""
+        log = tmp_path / "log.jsonl"
+        with open(log, "w", encoding="utf-8") as f:
+            for i in range(30):
+                record = {"id": i, "message": "北京天气", "config": {"configurable": {"tenant_id": "t"}}}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        admission = graph_module._admission
+        out = tmp_path / "out.jsonl"
+        run(str(log), str(out), "agent.graph:graph", concurrency=8, workers=1)
+        assert all(r["city"] == "北京" and r["reply"] != BUSY_REPLY for r in read_results(out))
+        assert graph_module._admission is admission
+
+    def test_wide_replay_is_not_busy(self, tmp_path, monkeypatch):
+        """测试并发超过默认名额与队列之和时，回放仍然没有忙碌回复或降级卡片"""
+        monkeypatch.setattr(graph_module._static_provider, "fetch", slow(graph_module._static_provider.fetch))
+        log = tmp_path / "log.jsonl"
+        with open(log, "w", encoding="utf-8") as f:
+            for i in range(250):
+                f.write(json.dumps({"id": i, "message": "北京天气"}, ensure_ascii=False) + "\n")
+        out = tmp_path / "out.jsonl"
+        run(str(log), str(out), "agent.graph:graph", concurrency=250, workers=1)
+        results = read_results(out)
+        assert len(results) == 250
+        assert all(r["reply"] != BUSY_REPLY for r in results)
+        assert all("unavailable" not in r["ui"][0]["props"] for r in results)
+
+
+class TestDiff:
+    """结果对比测试"""
+
+    def test_diff_reports_changes(self, tmp_path):
+        """测试对比输出变化的请求和延迟统计"""
+        before, after = tmp_path / "before.jsonl", tmp_path / "after.jsonl"
+        base = {"input": "南山区天气", "ui": [], "reply": "ok", "latency_ms": 1.0, "error": None}
+        with open(before, "w", encoding="utf-8") as f:
+            for offset, city in [(0, "北京"), (10, "北京"), (20, "上海")]:
+                f.write(json.dumps({**base, "offset": offset, "city": city}, ensure_ascii=False) + "\n")
+        with open(after, "w", encoding="utf-8") as f:
+            for offset, city in [(0, "北京"), (10, "深圳"), (30, "上海")]:
+                f.write(json.dumps({**base, "offset": offset, "city": city}, ensure_ascii=False) + "\n")
+
+        out = io.StringIO()
+        assert diff(str(before), str(after), out) == 1
+        text = out.getvalue()
+        assert "@10 南山区天气" in text
+        assert "北京" in text and "│ 深圳" in text
+        assert "2 requests compared, 1 changed (city: 1, ui: 0, reply: 0), 2 present in only one file" in text
+
+    def test_cli_exit_codes(self, tmp_path, capsys):
+        """测试命令行：无差异返回 0"""
+        log = tmp_path / "log.jsonl"
+        write_log(log, ["北京天气", "你好"])
+        a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+        assert main(["run", str(log), "-o", str(a)]) == 0
+        assert main(["run", str(log), "-o", str(b), "--concurrency", "1"]) == 0
+        assert main(["diff", str(a), str(b)]) == 0
+        assert "2 requests compared, 0 changed" in capsys.readouterr().out
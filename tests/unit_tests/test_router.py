@@ -0,0 +1,94 @@
+"""测试意图预路由的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.graph import CHITCHAT_REPLY, AgentState, chitchat_node, graph, route_message
+from agent.matching import KeywordAutomaton
+from agent.router import ROUTER_SCAN_CHARS, IntentRouter
+
+
+class TestKeywordAutomaton:
+    """Aho-Corasick 自动机单元测试"""
+
+    def test_iter_matches_overlapping(self):
+        """测试重叠关键词全部命中"""
+        automaton = KeywordAutomaton({"he": 1, "she": 2, "hers": 3})
+        matches = {(start, kw) for start, kw, _ in automaton.iter_matches("ushers")}
+        assert matches == {(1, "she"), (2, "he"), (2, "hers")}
+
+    def test_first_match_leftmost_longest(self):
+        """测试返回最左且最长的匹配"""
+        automaton = KeywordAutomaton({"南山": "a", "南山区": "b", "山区": "c"})
+        assert automaton.first_match("去南山区看看") == (1, "南山区", "b")
+        assert automaton.first_match("没有命中") is None
+
+
+class TestIntentRouter:
+    """意图路由单元测试"""
+
+    @pytest.fixture
+    def router(self):
+        return IntentRouter(["北京", "上海"])
+
+    def test_weather_messages(self, router):
+        """测试天气相关消息"""
+        for message in ["北京天气", "今天气温如何？", "上海", "What's the Weather like", "要带伞吗"]:
+            assert router.classify(message) == "weather", message
+
+    def test_chitchat_messages(self, router):
+        """测试非天气消息"""
+        for message in ["你好", "讲个笑话", "谢谢", "hello there"]:
+            assert router.classify(message) == "chitchat", message
+
+    def test_empty_message_defaults_to_weather(self, router):
+        """测试空消息保持默认天气行为"""
+        assert router.classify("") == "weather"
+        assert router.classify("   ") == "weather"
+
+    def test_content_blocks_skip_images(self, router):
+        """测试内容块只看文本部分"""
+        blocks = [
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64,天气" * 10}},
+            {"type": "text", "text": "你好"},
+        ]
+        assert router.classify(blocks) == "chitchat"
+
+    def test_scan_is_bounded(self, router, scanned):
+        """测试只扫描有界前缀，超长消息的扫描量有上界"""
+        tail_keyword = "啊" * (ROUTER_SCAN_CHARS + 10) + "天气"
+        assert router.classify(tail_keyword) == "chitchat"
+
+        router.classify("啊" * 5_000_000)
+        assert scanned and max(scanned) <= ROUTER_SCAN_CHARS
+
+
+class TestRoutingGraph:
+    """路由接入 graph 的测试"""
+
+    def test_route_message(self):
+        """测试条件边的路由结果"""
+        assert route_message(AgentState(messages=[HumanMessage(content="你好")], ui=[])) == "chitchat"
+        assert route_message(AgentState(messages=[HumanMessage(content="深圳气候")], ui=[])) == "weather"
+        assert route_message(AgentState(messages=[], ui=[])) == "weather"
+
+    @pytest.mark.anyio
+    async def test_chitchat_node(self):
+        """测试闲聊分支返回固定回复"""
+        result = await chitchat_node(AgentState(messages=[HumanMessage(content="你好")], ui=[]))
+        message = result["messages"][0]
+        assert isinstance(message, AIMessage)
+        assert message.content == CHITCHAT_REPLY
+        assert message.id is not None
+
+    @pytest.mark.anyio
+    async def test_graph_routes_chitchat_without_ui(self):
+        """测试闲聊消息不会生成天气卡片"""
+        result = await graph.ainvoke({"messages": [HumanMessage(content="你好")], "ui": []})
+        assert result["messages"][-1].content == CHITCHAT_REPLY
+        assert result["ui"] == []
@@ -0,0 +1,110 @@
+"""测试检查点紧凑序列化器的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from datetime import datetime, timezone
+
+import ormsgpack
+import pytest
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.graph import builder
+from agent.serde import COMPACT, COMPACT_ZLIB, CompactSerializer
+
+
+def weather_card(i):
+    return {
+        "type": "ui", "id": f"ui-{i}", "name": "weather",
+        "props": {"city": "北京", "temperature": "22°C", "humidity": "45%", "airQuality": {"aqi": 68, "level": "良"}},
+        "metadata": {"merge": False, "message_id": f"ai-{i}"},
+    }
+
+
+MESSAGES = [
+    HumanMessage(content="北京天气", id="h-1"),
+    AIMessage(content="☀️ 北京 22°C", id="ai-1", tool_calls=[{"name": "weather", "args": {"city": "北京"}, "id": "call-1"}]),
+    ToolMessage(content="ok", tool_call_id="call-1", artifact={1: "整数键"}),
+    SystemMessage(content=[{"type": "text", "text": "系统提示"}], name="sys"),
+    AIMessageChunk(content="部分", id="chunk-1"),
+    RemoveMessage(id="h-1"),
+]
+
+
+class TestCompactSerializer:
+    """紧凑序列化器测试"""
+
+    def test_round_trip_keeps_values_and_types(self):
+        """测试消息、UI 字典与需要后备序列化器的值往返后不变"""
+        serde = CompactSerializer()
+        value = {
+            "messages": MESSAGES,
+            "ui": [weather_card(1)],
+            "seen": {1, 2},
+            "at": datetime(2026, 10, 19, tzinfo=timezone.utc),
+            "int_keys": [{2: "b"}],
+        }
+        restored = serde.loads_typed(serde.dumps_typed(value))
+        assert restored == value
+        assert [type(m) for m in restored["messages"]] == [type(m) for m in MESSAGES]
+
+    def test_tuples_stay_tuples(self):
+        """测试元组（包括嵌套在字典、列表和元组中的）往返后仍是元组"""
+        serde = CompactSerializer()
+        value = {"a": (1, 2), "b": [("x", {"k": ("v",)})], "c": ((), (None, 1.5))}
+        restored = serde.loads_typed(serde.dumps_typed(value))
+        assert restored == value
+        assert type(restored["a"]) is tuple and type(restored["b"][0]) is tuple
+        assert type(restored["b"][0][1]["k"]) is tuple and restored["c"] == ((), (None, 1.5))
+        assert serde.loads_typed(serde.dumps_typed((1, 2))) == (1, 2)
+
+    def test_smaller_than_default(self):
+        """测试字段名只写一次，默认值字段不写入，体积明显小于默认序列化器"""
+        value = [AIMessage(content=f"第 {i} 条回复", id=f"ai-{i}") for i in range(20)]
+        compact = CompactSerializer(compress_threshold=None).dumps_typed(value)[1]
+        default = JsonPlusSerializer().dumps_typed(value)[1]
+        assert len(compact) * 2 < len(default)
+        assert compact.count(b"additional_kwargs") == 0 and compact.count(b"content") == 1
+
+    def test_compression_threshold(self):
+        """测试超过阈值才压缩，压缩后仍可读回"""
+        cards = [weather_card(i) for i in range(50)]
+        serde = CompactSerializer(compress_threshold=1024)
+        type_, blob = serde.dumps_typed(cards)
+        assert type_ == COMPACT_ZLIB and serde.loads_typed((type_, blob)) == cards
+        assert serde.dumps_typed(cards[:1])[0] == COMPACT
+        assert CompactSerializer(compress_threshold=None).dumps_typed(cards)[0] == COMPACT
+
+    def test_reads_default_serializer_blobs(self):
+        """测试可以读取默认序列化器写入的数据，便于直接替换"""
+        serde = CompactSerializer()
+        for value in (None, b"raw", MESSAGES, {"ui": [weather_card(1)]}):
+            assert serde.loads_typed(JsonPlusSerializer().dumps_typed(value)) == value
+        assert serde.dumps_typed(None) == ("null", b"")
+
+    def test_unknown_extension(self):
+        """测试无法识别的扩展类型报错"""
+        blob = b"\x01\x00\x00\x00\x90" + ormsgpack.packb(ormsgpack.Ext(9, b""))
+        with pytest.raises(ValueError):
+            CompactSerializer().loads_typed((COMPACT, blob))
+
+    @pytest.mark.anyio
+    async def test_checkpointed_thread(self):
+        """测试作为检查点序列化器时多轮对话的上下文正常恢复"""
+        graph = builder.compile(checkpointer=InMemorySaver(serde=CompactSerializer(compress_threshold=256)))
+        config = {"configurable": {"thread_id": "serde"}}
+        await graph.ainvoke({"messages": [HumanMessage(content="上海天气")], "ui": []}, config)
+        result = await graph.ainvoke({"messages": [HumanMessage(content="湿度呢？")]}, config)
+        assert result["messages"][-1].content.startswith("💧 上海当前湿度")
+        assert len(result["messages"]) == 4 and result["ui"][0]["props"]["city"] == "上海"
@@ -0,0 +1,295 @@
+"""测试 SSE 流式服务器的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import agent.server as server_module
+from agent.server import StreamServer, create_app, start_server
+
+
+class Client:
+    """直接调用 ASGI 应用的测试客户端"""
+
+    def __init__(self, app, send_delay=0.0, stall_after=0):
+        self.app = app
+        self.send_delay = send_delay
+        self.stall_after = stall_after
+
+    async def request(self, method, path, body=None, disconnect=None):
+        raw = b"" if body is None else json.dumps(body, ensure_ascii=False).encode()
+        messages = [{"type": "http.request", "body": raw, "more_body": False}]
+        disconnect = disconnect or asyncio.Event()
+        response = {"status": None, "headers": {}, "body": b"", "frames": 0}
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = dict(message["headers"])
+            else:
+                if self.send_delay and response["frames"] >= self.stall_after:
+                    await asyncio.sleep(self.send_delay)
+                response["frames"] += 1
+                response["body"] += message.get("body", b"")
+
+        scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+        await self.app(scope, receive, send)
+        return response
+
+
+def events(body):
+    """把 SSE 响应体解析为 (事件名, 数据) 列表，心跳单独计数"""
+    result = []
+    for frame in body.decode().split("\n\n"):
+        if frame.startswith(": keepalive"):
+            result.append(("keepalive", None))
+        elif frame:
+            fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+            result.append((fields["event"], json.loads(fields["data"])))
+    return result
+
+
+def run_body(text, **configurable):
+    return {"input": {"messages": [{"type": "human", "content": text}]}, "config": {"configurable": configurable}}
+
+
+class SlowGraph:
+    """每个事件之间等待一段时间的假图"""
+
+    def __init__(self, delay, count=2):
+        self.delay = delay
+        self.count = count
+        self.closed = False
+
+    async def astream(self, input, config, stream_mode):
+        try:
+            for i in range(self.count):
+                await asyncio.sleep(self.delay)
+                yield "custom", {"type": "ui", "id": str(i), "name": "weather", "props": {}, "metadata": {}}
+            yield "messages", (AIMessage(id="m", content="done"), {"langgraph_node": "weather"})
+        finally:
+            self.closed = True
+
+
+class TestRuns:
+    """运行流测试"""
+
+    @pytest.mark.anyio
+    async def test_stateless_run_streams_messages_and_ui(self):
+        """测试无状态运行依次输出 metadata、ui、messages、end"""
+        client = Client(create_app())
+        response = await client.request("POST", "/runs/stream", run_body("北京天气怎么样"))
+        assert response["status"] == 200
+        assert response["headers"][b"content-type"].startswith(b"text/event-stream")
+        names = [name for name, _ in events(response["body"])]
+        assert names == ["metadata", "ui", "messages", "end"]
+        ui, message = events(response["body"])[1][1], events(response["body"])[2][1]
+        assert ui["props"]["city"] == "北京"
+        assert message["type"] == "ai" and message["id"] == ui["metadata"]["message_id"]
+
+    @pytest.mark.anyio
+    async def test_threads_keep_context_and_run_concurrently(self):
+        """测试会话内保持上下文，不同会话并发运行"""
+        client = Client(create_app())
+        await asyncio.gather(
+            client.request("POST", "/threads/a/runs/stream", run_body("上海天气")),
+            client.request("POST", "/threads/b/runs/stream", run_body("深圳天气")),
+        )
+        a, b = await asyncio.gather(
+            client.request("POST", "/threads/a/runs/stream", run_body("湿度呢？")),
+            client.request("POST", "/threads/b/runs/stream", run_body("湿度呢？")),
+        )
+        assert "上海" in events(a["body"])[2][1]["content"]
+        assert "深圳" in events(b["body"])[2][1]["content"]
+
+    @pytest.mark.anyio
+    async def test_client_cannot_choose_ui_sink(self, tmp_path):
+        """测试请求里的 ui_sink 配置被忽略，不会写服务器文件"""
+        path = tmp_path / "ui.jsonl"
+        client = Client(create_app())
+        response = await client.request("POST", "/runs/stream", run_body("北京天气", ui_sink=str(path)))
+        assert response["status"] == 200 and not path.exists()
+
+    @pytest.mark.anyio
+    async def test_bad_requests(self):
+        """测试错误请求返回 JSON 错误"""
+        client = Client(create_app(max_body=64))
+        assert (await client.request("GET", "/runs/stream"))["status"] == 405
+        assert (await client.request("POST", "/runs/stream", {"messages": []}))["status"] == 400
+        assert (await client.request("POST", "/runs/stream", run_body("北京" * 50)))["status"] == 413
+        missing = await client.request("GET", "/nope")
+        assert missing["status"] == 404 and json.loads(missing["body"]) == {"detail": "not found"}
+        assert (await client.request("GET", "/ok"))["status"] == 200
+        assert b"server_requests_total" in (await client.request("GET", "/metrics"))["body"]
+
+
+class TestBackpressure:
+    """心跳与背压测试"""
+
+    @pytest.mark.anyio
+    async def test_keepalive_while_idle(self):
+        """测试运行空闲时发送心跳注释"""
+        client = Client(create_app(SlowGraph(0.05), keepalive=0.02))
+        response = await client.request("POST", "/runs/stream", run_body("北京天气"))
+        names = [name for name, _ in events(response["body"])]
+        assert "keepalive" in names and names[-1] == "end"
+
+    @pytest.mark.anyio
+    async def test_capacity_limit(self):
+        """测试并发流超过上限时返回 503"""
+        app = create_app(SlowGraph(0.05), max_streams=1)
+        client = Client(app)
+        first = asyncio.ensure_future(client.request("POST", "/runs/stream", run_body("北京天气")))
+        await asyncio.sleep(0.01)
+        busy = await client.request("POST", "/runs/stream", run_body("北京天气"))
+        assert busy["status"] == 503 and busy["headers"][b"retry-after"] == b"1"
+        assert (await first)["status"] == 200 and app.active == 0
+
+    @pytest.mark.anyio
+    async def test_slot_is_reserved_before_the_body_arrives(self):
+        """测试读请求体之前就占用名额：上传缓慢的请求也计入上限，出错后名额释放"""
+        app = create_app(SlowGraph(0.01), max_streams=1)
+        uploaded = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"not json", "more_body": False}]
+
+        async def receive():
+            await uploaded.wait()
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "path": "/runs/stream", "headers": [], "query_string": b""}
+        slow = asyncio.ensure_future(app(scope, receive, send))
+        await asyncio.sleep(0.01)
+        busy = await Client(app).request("POST", "/runs/stream", run_body("北京天气"))
+        assert busy["status"] == 503 and app.active == 1
+        uploaded.set()
+        await asyncio.wait_for(slow, 5)
+        assert app.active == 0
+        assert (await Client(app).request("POST", "/runs/stream", run_body("北京天气")))["status"] == 200
+
+    @pytest.mark.anyio
+    async def test_end_is_delivered_when_the_queue_is_full(self):
+        """测试运行结束时队列已满，结束标记也会送达，响应正常结束并释放名额"""
+        app = create_app(SlowGraph(0, count=5), queue_size=1, keepalive=0.2)
+        client = Client(app, send_delay=0.01)
+        response = await asyncio.wait_for(client.request("POST", "/runs/stream", run_body("北京天气")), 5)
+        names = [name for name, _ in events(response["body"])]
+        assert names[-1] == "end" and "keepalive" not in names and app.active == 0
+
+    @pytest.mark.anyio
+    async def test_stream_ends_when_the_run_dies(self):
+        """测试运行被取消、没有送出结束标记时，响应也会结束而不是一直发送心跳"""
+
+        class CancelledGraph:
+            async def astream(self, input, config, stream_mode):
+                raise asyncio.CancelledError
+                yield
+
+        app = create_app(CancelledGraph(), keepalive=0.01)
+        response = await asyncio.wait_for(Client(app).request("POST", "/runs/stream", run_body("北京天气")), 5)
+        assert response["status"] == 200 and app.active == 0
+
+    @pytest.mark.anyio
+    async def test_stalled_client_is_dropped(self):
+        """测试客户端长时间不读取时断开连接并取消运行"""
+        graph = SlowGraph(0.001, count=100)
+        client = Client(create_app(graph, queue_size=2, send_timeout=0.02), send_delay=1, stall_after=1)
+        response = await asyncio.wait_for(client.request("POST", "/runs/stream", run_body("北京天气")), 5)
+        assert [name for name, _ in events(response["body"])] == ["metadata"] and graph.closed
+
+    @pytest.mark.anyio
+    async def test_disconnect_cancels_run(self):
+        """测试客户端断开后取消运行"""
+        graph = SlowGraph(0.01, count=100)
+        disconnect = asyncio.Event()
+        client = Client(create_app(graph))
+        request = asyncio.ensure_future(client.request("POST", "/runs/stream", run_body("北京天气"), disconnect))
+        await asyncio.sleep(0.03)
+        disconnect.set()
+        response = await asyncio.wait_for(request, 5)
+        assert graph.closed and events(response["body"])[-1][0] != "end"
+
+
+class TestMirror:
+    """会话 UI 镜像测试"""
+
+    @pytest.mark.anyio
+    async def test_viewer_receives_thread_cards(self):
+        """测试观看端收到对应会话的卡片"""
+        app = create_app(keepalive=0.01)
+        client = Client(app)
+        disconnect = asyncio.Event()
+        viewer = asyncio.ensure_future(client.request("GET", "/threads/v/ui/stream", disconnect=disconnect))
+        await asyncio.sleep(0.01)
+        await client.request("POST", "/threads/v/runs/stream", run_body("杭州天气"))
+        await client.request("POST", "/threads/other/runs/stream", run_body("北京天气"))
+        await asyncio.sleep(0.03)
+        disconnect.set()
+        response = await asyncio.wait_for(viewer, 5)
+        cards = [data for name, data in events(response["body"]) if name == "ui"]
+        assert [c["props"]["city"] for c in cards] == ["杭州"]
+        assert len(app.ui_bus) == 0
+
+
+class TestBuiltinServer:
+    """内置 HTTP 服务器测试"""
+
+    @pytest.mark.anyio
+    async def test_chunked_sse_over_socket(self):
+        """测试内置服务器以分块编码输出 SSE"""
+        server = await start_server(create_app(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            body = json.dumps(run_body("深圳天气")).encode()
+            writer.write(b"POST /runs/stream HTTP/1.1\r\ncontent-length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+        finally:
+            server.close()
+        head, _, rest = data.partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200 OK") and b"transfer-encoding: chunked" in head
+        assert rest.endswith(b"0\r\n\r\n") and "深圳".encode() in rest
+
+    @pytest.mark.anyio
+    async def test_malformed_content_length(self):
+        """测试无法解析的 content-length 返回 400"""
+        server = await start_server(create_app(SlowGraph(0)), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            for value in (b"abc", b"-5"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"POST /runs/stream HTTP/1.1\r\ncontent-length: %s\r\n\r\n" % value)
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                assert data.startswith(b"HTTP/1.1 400 Bad Request")
+        finally:
+            server.close()
+
+
+def test_default_app_is_built_on_first_access(monkeypatch):
+    """测试默认应用在第一次访问 app 时才构建，之后复用同一个实例"""
+    built = []
+    monkeypatch.setattr(server_module, "_app", None)
+    monkeypatch.setattr(server_module, "create_app", lambda: built.append(1) or StreamServer(SlowGraph(0)))
+    assert built == []
+    assert server_module.app is server_module.app and len(built) == 1
@@ -0,0 +1,114 @@
+"""测试坐标空间索引与最近城市回退的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import math
+import random
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.coordinates import PLACE_COORDINATES
+from agent.graph import WEATHER_DATA, weather_node
+from agent.spatial import CityLocator, KDTree, haversine_km
+from agent.weather_store import WeatherTable
+
+
+def random_points(n, seed=0):
+    """在球面上均匀生成 n 个坐标点"""
+    rng = random.Random(seed)
+    return [(math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)) for _ in range(n)]
+
+
+class TestKDTree:
+    """KD 树最近邻测试"""
+
+    def test_matches_brute_force(self):
+        """测试结果与暴力搜索一致，包括跨越日期变更线和两极附近"""
+        points = random_points(2000)
+        tree = KDTree(points)
+        queries = random_points(300, seed=1) + [(0.0, 179.99), (0.0, -179.99), (89.9, 0.0), (-89.9, 45.0)]
+        for lat, lon in queries:
+            idx, km = tree.nearest(lat, lon)
+            expected = min(haversine_km(lat, lon, *p) for p in points)
+            assert km == pytest.approx(expected, abs=1e-6)
+            assert haversine_km(lat, lon, *points[idx]) == pytest.approx(expected, abs=1e-6)
+
+    def test_small_and_empty(self):
+        """测试空树和单点树"""
+        assert KDTree([]).nearest(0, 0) is None
+        idx, km = KDTree([(39.90, 116.41)]).nearest(31.23, 121.47)
+        assert idx == 0 and km == pytest.approx(1067, abs=5)
+
+    def test_lookup_stays_fast_at_100k_points(self):
+        """测试 10 万个点时单次查询仍远低于 1ms"""
+        tree = KDTree(random_points(100_000))
+        queries = random_points(500, seed=2)
+        start = time.perf_counter()
+        for lat, lon in queries:
+            tree.nearest(lat, lon)
+        per_lookup = (time.perf_counter() - start) / len(queries)
+        assert per_lookup < 1e-3, f"单次查询 {per_lookup * 1e6:.1f}us 超过 1ms"
+
+
+class TestCityLocator:
+    """最近有数据城市解析测试"""
+
+    @pytest.fixture
+    def locator(self):
+        return CityLocator(WeatherTable(WEATHER_DATA), PLACE_COORDINATES)
+
+    def test_every_city_with_data_is_geocoded(self, locator):
+        """测试所有有数据的城市都在坐标表中，且解析到自身"""
+        for weather in WEATHER_DATA:
+            assert locator.nearest_to(weather["city"]).city == weather["city"]
+
+    def test_locate_places_without_data(self, locator):
+        """测试不支持的地名解析到最近的有数据城市"""
+        assert locator.locate("东京的温度").city == "上海"
+        assert locator.locate("南京天气").city == "杭州"
+        assert locator.locate("香港天气").city == "深圳"
+        assert locator.locate("成都和东京哪个冷").place == "成都"
+        assert locator.locate("火星天气") is None
+        assert locator.locate("") is None
+
+    def test_rebuilds_after_reload(self):
+        """测试数据重新加载后按新的城市集合查询"""
+        table = WeatherTable(WEATHER_DATA)
+        locator = CityLocator(table, PLACE_COORDINATES)
+        assert locator.locate("南京天气").city == "杭州"
+        table.reload([w for w in WEATHER_DATA if w["city"] != "杭州"])
+        assert locator.locate("南京天气").city == "上海"
+        table.reload([])
+        assert locator.locate("南京天气") is None
+
+
+class TestWeatherNodeFallback:
+    """天气节点的最近城市回退测试"""
+
+    @pytest.mark.anyio
+    async def test_unsupported_city_uses_nearest(self):
+        """测试不支持的城市返回最近城市的天气并注明"""
+        result = await weather_node({"messages": [HumanMessage(content="东京的天气怎么样？")], "ui": []})
+        content = result["messages"][0].content
+        assert content.startswith("📍 暂无东京的天气数据") and "上海" in content
+        assert result["context"]["city"] == "上海"
+
+    @pytest.mark.anyio
+    async def test_supported_and_missing_city_unchanged(self):
+        """测试支持的城市和未指定城市时不附加说明"""
+        for text, city in [("北京天气", "北京"), ("天气怎么样", "北京"), ("南山区天气", "深圳")]:
+            result = await weather_node({"messages": [HumanMessage(content=text)], "ui": []})
+            assert not result["messages"][0].content.startswith("📍")
+            assert result["context"]["city"] == city
+
+    @pytest.mark.anyio
+    async def test_context_city_without_data(self):
+        """测试上下文中的城市没有数据时取最近的城市，而不是随机城市"""
+        state = {"messages": [HumanMessage(content="湿度呢？")], "ui": [], "context": {"city": "南京"}}
+        result = await weather_node(state)
+        assert result["context"]["city"] == "杭州"
@@ -0,0 +1,206 @@
+"""测试图运行、节点、提取层级与数据源调用的追踪 span 的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.cache import CachedGraph
+from agent.graph import graph, weather_node
+from agent.panels import SUN
+from agent.tracing import (
+    NOOP_SPAN,
+    STATUS_ERROR,
+    TRACER,
+    FileExporter,
+    InMemoryExporter,
+    Tracer,
+    current_span,
+    read_spans,
+)
+
+graph_module = sys.modules["agent.graph"]
+
+
+class HangingProvider:
+    """永远等不到结果的面板数据源"""
+
+    name = "hanging"
+
+    async def fetch(self, city):
+        await asyncio.sleep(5)
+
+
+def ask(text):
+    return {"messages": [HumanMessage(content=text)], "ui": []}
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemoryExporter()
+    yield exporter
+    TRACER.configure(None, sample_rate=1.0)
+
+
+def parent_of(spans, span):
+    return next(s for s in spans if s.span_id == span.parent_id)
+
+
+class TestTracer:
+    """追踪器本身的测试"""
+
+    def test_off_by_default_returns_noop(self):
+        """测试未配置导出器时返回共享的空 span，不记录任何内容"""
+        tracer = Tracer()
+        with tracer.span("x", city="北京") as span:
+            assert span is NOOP_SPAN and current_span() is NOOP_SPAN
+            span.set_attribute("k", 1)
+
+    def test_nesting_and_export_on_last_end(self):
+        """测试子 span 挂在当前 span 下，整条追踪在最后一个 span 结束时导出"""
+        exporter = InMemoryExporter()
+        tracer = Tracer(exporter)
+        with tracer.span("root", city="北京") as root:
+            with tracer.span("child", tier="gazetteer", city=None) as child:
+                assert current_span() is child
+            assert exporter.spans == []
+        assert [s.name for s in exporter.spans] == ["child", "root"]
+        assert child.parent_id == root.span_id and child.trace_id == root.trace_id
+        assert child.attributes == {"tier": "gazetteer"} and root.duration_ms >= child.duration_ms
+
+    def test_error_status(self):
+        """测试块内抛出异常时 span 标记为失败"""
+        exporter = InMemoryExporter()
+        with pytest.raises(ValueError):
+            with Tracer(exporter).span("boom"):
+                raise ValueError("坏了")
+        assert exporter.spans[0].status == STATUS_ERROR
+        assert exporter.spans[0].status_message == "ValueError: 坏了"
+
+    def test_sampling_follows_root(self):
+        """测试采样率 0 时整棵子树都不记录，采样率 1 时全部记录"""
+        exporter = InMemoryExporter()
+        tracer = Tracer(exporter, sample_rate=0.0)
+        with tracer.span("root"):
+            with tracer.span("child") as child:
+                assert child is NOOP_SPAN
+        assert exporter.spans == []
+        tracer.sample_rate = 1.0
+        with tracer.span("root"):
+            pass
+        assert len(exporter.spans) == 1
+
+    def test_exporter_errors_are_swallowed(self):
+        """测试导出器出错不影响业务代码"""
+
+        class Broken(InMemoryExporter):
+            def export(self, spans):
+                raise OSError("disk full")
+
+        with Tracer(Broken()).span("root"):
+            pass
+
+    def test_file_exporter_writes_otlp_json(self, tmp_path):
+        """测试文件导出器按行写入 OTLP/JSON，可以读回"""
+        path = str(tmp_path / "traces" / "spans.jsonl")
+        tracer = Tracer(FileExporter(path, service_name="test"))
+        with tracer.span("root", city="北京", hit=True, rows=3):
+            with tracer.span("child", ratio=0.5):
+                pass
+        tracer.configure(None)
+        root, child = sorted(read_spans(path), key=lambda s: "parentSpanId" in s)
+        assert root["name"] == "root" and "parentSpanId" not in root
+        assert child["parentSpanId"] == root["spanId"] and child["traceId"] == root["traceId"]
+        assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+        assert {a["key"]: a["value"] for a in root["attributes"]} == {
+            "city": {"stringValue": "北京"}, "hit": {"boolValue": True}, "rows": {"intValue": "3"},
+        }
+        assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+class TestGraphTracing:
+    """图执行的追踪测试"""
+
+    @pytest.mark.anyio
+    async def test_span_tree_for_weather_question(self, exporter):
+        """测试一次天气问答产生 graph.run、节点、提取层级与数据源调用的 span 树"""
+        TRACER.configure(exporter)
+        await graph.ainvoke(ask("北京天气"))
+        spans = exporter.spans
+        assert len({s.trace_id for s in spans}) == 1
+        (run,) = exporter.named("graph.run")
+        assert run.parent_id is None
+
+        (weather,) = exporter.named("node.weather")
+        assert parent_of(spans, weather) is run and weather.attributes["city"] == "北京"
+        (tier,) = exporter.named("extract.tier")
+        assert parent_of(spans, tier) is weather
+        assert tier.attributes == {"tier": "automaton", "hit": True, "city": "北京"}
+
+        panels = exporter.named("node.panel")
+        assert len(panels) == 4 and all(parent_of(spans, p) is run for p in panels)
+        (fetch,) = exporter.named("weather.fetch")
+        assert parent_of(spans, fetch).attributes["panel"] == "current"
+        assert parent_of(spans, exporter.named("provider.fetch")[0]) in panels + [fetch]
+        assert len(exporter.named("provider.fetch")) == 4
+
+        (compose,) = exporter.named("node.compose")
+        assert compose.attributes["ui.component"] == "weather" and compose.attributes["ui.payload_bytes"] > 0
+
+    @pytest.mark.anyio
+    async def test_extraction_tiers(self, exporter):
+        """测试逐级提取时每一层各有一个 span，记录是否命中"""
+        TRACER.configure(exporter)
+        await graph.ainvoke(ask("南京天气"))
+        tiers = [(s.attributes["tier"], s.attributes["hit"]) for s in exporter.named("extract.tier")]
+        assert tiers == [("automaton", False), ("gazetteer", False), ("nearest", True)]
+        assert exporter.named("node.weather")[0].attributes["city"] == "杭州"
+
+    @pytest.mark.anyio
+    async def test_cache_hit_attribute(self, exporter):
+        """测试缓存命中时只有一个缓存 span，未命中时图运行挂在其下"""
+        TRACER.configure(exporter)
+        cached = CachedGraph(graph, version=lambda: 0)
+        await cached.ainvoke(ask("北京天气"))
+        (miss,) = exporter.named("graph.cached_invoke")
+        assert miss.attributes == {"cache.result": "miss", "cache.hit": False}
+        assert exporter.named("graph.run")[0].parent_id == miss.span_id
+        exporter.clear()
+        await cached.ainvoke(ask("北京天气"))
+        assert [(s.name, s.attributes["cache.hit"]) for s in exporter.spans] == [("graph.cached_invoke", True)]
+
+    @pytest.mark.anyio
+    async def test_timed_out_panel_is_marked(self, exporter, monkeypatch):
+        """测试超时的面板分支带有降级原因，被取消的数据源调用标记为失败"""
+        monkeypatch.setitem(graph_module._panel_providers, SUN, HangingProvider())
+        TRACER.configure(exporter)
+        await graph.ainvoke(ask("北京天气"), {"configurable": {"panel_timeout_ms": 50}})
+        (sun,) = [s for s in exporter.named("node.panel") if s.attributes["panel"] == SUN]
+        assert sun.attributes["degraded"] == "timeout"
+        (call,) = [s for s in exporter.named("provider.fetch") if s.attributes["provider"] == SUN]
+        assert call.status == STATUS_ERROR and call.parent_id == sun.span_id
+
+    @pytest.mark.anyio
+    async def test_direct_node_call(self, exporter):
+        """测试不经过图直接调用 weather_node 时 span 挂在节点函数的 span 下"""
+        TRACER.configure(exporter)
+        await weather_node(ask("深圳天气"))
+        (root,) = exporter.named("weather_node")
+        assert root.parent_id is None and root.attributes["city"] == "深圳"
+        assert len(exporter.named("node.panel")) == 4
+        assert all(s.trace_id == root.trace_id for s in exporter.spans)
+
+    @pytest.mark.anyio
+    async def test_unsampled_and_off(self, exporter):
+        """测试采样率为 0 或关闭追踪时不产生 span，回答不受影响"""
+        TRACER.configure(exporter, sample_rate=0.0)
+        result = await graph.ainvoke(ask("北京天气"))
+        assert exporter.spans == [] and result["ui"][0]["props"]["city"] == "北京"
+        TRACER.configure(None, sample_rate=1.0)
+        await graph.ainvoke(ask("北京天气"))
+        assert exporter.spans == []
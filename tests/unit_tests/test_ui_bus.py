@@ -0,0 +1,175 @@
+"""测试 UI 事件总线的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.graph import graph, ui_bus
+from agent.ui_bus import (
+    BLOCK,
+    COALESCE,
+    DROP_OLDEST,
+    SubscriptionClosed,
+    UIEventBus,
+    coalesce,
+)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def card(id, merge=False, **props):
+    return {"type": "ui", "id": id, "name": "weather", "props": props, "metadata": {"merge": merge}}
+
+
+class TestOverflowPolicies:
+    """订阅队列溢出策略测试"""
+
+    def test_drop_oldest(self):
+        """测试队列满时丢弃最旧事件并计数"""
+        bus = UIEventBus(maxsize=2, policy=DROP_OLDEST)
+        sub = bus.subscribe("t")
+        for i in range(5):
+            bus.publish("t", card(str(i)))
+        assert [sub.get_nowait()["id"] for _ in range(2)] == ["3", "4"]
+        assert sub.dropped == 3 and sub.delivered == 2
+
+    def test_coalesce_by_card_id(self):
+        """测试同一卡片的待发送事件合并，增量叠加到完整卡片上"""
+        bus = UIEventBus(maxsize=2, policy=COALESCE)
+        sub = bus.subscribe("t")
+        bus.publish("t", card("a", city="北京", temperature="22°C"))
+        bus.publish("t", card("b", city="上海"))
+        bus.publish("t", card("a", merge=True, temperature="72°F"))
+        bus.publish("t", card("a", merge=True, humidity="40%"))
+
+        first = sub.get_nowait()
+        assert first["id"] == "a" and first["metadata"]["merge"] is False
+        assert first["props"] == {"city": "北京", "temperature": "72°F", "humidity": "40%"}
+        assert sub.get_nowait()["id"] == "b"
+        assert sub.coalesced == 2 and sub.dropped == 0
+
+    def test_coalesce_replace_and_deltas(self):
+        """测试完整替换覆盖待发送事件，两个增量合并后仍是增量"""
+        assert coalesce(card("a", city="北京"), card("a", city="上海")) == card("a", city="上海")
+        folded = coalesce(card("a", merge=True, x=1), card("a", merge=True, y=2))
+        assert folded["metadata"]["merge"] is True and folded["props"] == {"x": 1, "y": 2}
+
+    def test_block_disconnects_on_nonblocking_publish(self):
+        """测试阻塞策略在非阻塞发布时断开订阅，而不是阻塞发布方"""
+        bus = UIEventBus(maxsize=1)
+        sub = bus.subscribe("t", policy=BLOCK)
+        other = bus.subscribe("t")
+        assert bus.publish("t", card("a")) == 2
+        assert bus.publish("t", card("b")) == 1
+        assert sub.closed_reason == "overflow" and sub.dropped == 1
+        assert len(bus) == 1 and other.full is True
+        # 已排队的事件仍可读完
+        assert sub.get_nowait()["id"] == "a"
+
+    @pytest.mark.anyio
+    async def test_apublish_waits_for_block_subscriber(self):
+        """测试 apublish 等待阻塞订阅者腾出空间，不丢事件"""
+        bus = UIEventBus(maxsize=1)
+        sub = bus.subscribe("t", policy=BLOCK)
+        await bus.apublish("t", card("a"))
+        pending = asyncio.ensure_future(bus.apublish("t", card("b")))
+        await asyncio.sleep(0)
+        assert not pending.done()
+        assert (await sub.get())["id"] == "a"
+        await pending
+        assert (await sub.get())["id"] == "b" and sub.dropped == 0
+
+    def test_rejects_unknown_policy(self):
+        """测试未知策略直接报错"""
+        with pytest.raises(ValueError):
+            UIEventBus().subscribe(policy="newest")
+
+
+class TestSubscriptions:
+    """订阅、统计与投递测试"""
+
+    def test_topics_and_wildcard(self):
+        """测试按主题投递，主题为 None 的订阅接收所有事件"""
+        bus = UIEventBus()
+        a, b, everything = bus.subscribe("a"), bus.subscribe("b"), bus.subscribe()
+        bus.publish("a", card("1"))
+        bus.publish(None, card("2"))
+        assert (len(a), len(b), len(everything)) == (1, 0, 2)
+        assert bus.has_subscribers("c")
+        everything.close()
+        assert not bus.has_subscribers("c") and len(bus) == 2
+
+    def test_lag_and_stats(self):
+        """测试积压时长按最旧待发送事件计算"""
+        clock = FakeClock()
+        bus = UIEventBus(clock=clock)
+        sub = bus.subscribe("t")
+        bus.publish("t", card("a"))
+        clock.now = 2.0
+        bus.publish("t", card("b"))
+        clock.now = 3.5
+        assert sub.lag() == 3.5
+        sub.get_nowait()
+        stats = bus.stats()[0]
+        assert stats["pending"] == 1 and stats["lag_s"] == 1.5 and stats["delivered"] == 1
+
+    @pytest.mark.anyio
+    async def test_iteration_ends_after_close(self):
+        """测试关闭后读完剩余事件即结束迭代"""
+        bus = UIEventBus()
+        sub = bus.subscribe("t")
+        bus.publish("t", card("a"))
+        bus.publish("t", card("b"))
+        sub.close()
+        assert [e["id"] async for e in sub] == ["a", "b"]
+        with pytest.raises(SubscriptionClosed):
+            await sub.get()
+
+    @pytest.mark.anyio
+    async def test_sse_frames_and_keepalive(self):
+        """测试 SSE 输出事件帧，空闲时输出心跳注释"""
+        bus = UIEventBus()
+        sub = bus.subscribe("t")
+        stream = sub.sse(keepalive=0.01)
+        assert await stream.__anext__() == b": keepalive\n\n"
+        bus.publish("t", card("a", city="北京"))
+        frame = (await stream.__anext__()).decode()
+        assert frame.startswith("id: 1\nevent: ui\ndata: ") and frame.endswith("\n\n")
+        assert json.loads(frame.split("data: ", 1)[1])["props"] == {"city": "北京"}
+
+
+class TestGraphPublishing:
+    """图运行时向总线发布"""
+
+    @pytest.mark.anyio
+    async def test_stalled_viewer_does_not_block_runs(self):
+        """测试观看端从不读取时图照常执行，按线程投递并丢弃旧事件"""
+        viewer = ui_bus.subscribe("thread-1", maxsize=2, policy=DROP_OLDEST)
+        other = ui_bus.subscribe("thread-2")
+        try:
+            config = {"configurable": {"thread_id": "thread-1"}}
+            for text in ["北京天气", "上海天气", "深圳天气", "杭州天气"]:
+                result = await asyncio.wait_for(
+                    graph.ainvoke({"messages": [HumanMessage(content=text)], "ui": []}, config), 5
+                )
+            assert viewer.dropped == 2 and len(other) == 0
+            assert viewer.get_nowait()["props"]["city"] == "深圳"
+            assert viewer.get_nowait()["id"] == result["ui"][0]["id"]
+        finally:
+            viewer.close()
+            other.close()
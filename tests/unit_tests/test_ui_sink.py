@@ -0,0 +1,98 @@
+"""测试无头模式 UI sink 的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.graph import AgentState, graph, query_node, weather_node
+from agent.ui_sink import FileSink, MemorySink, in_runnable_context, resolve_sink
+
+
+def ask(text):
+    return AgentState(messages=[HumanMessage(content=text)], ui=[])
+
+
+class TestHeadlessSink:
+    """脱离 LangGraph 上下文直接调用节点"""
+
+    @pytest.mark.anyio
+    async def test_memory_sink_collects_cards(self):
+        """测试直接调用节点时 UI 事件写入内存 sink"""
+        assert not in_runnable_context()
+        sink = MemorySink()
+        config = {"configurable": {"ui_sink": sink}}
+        result = await weather_node(ask("北京天气怎么样"), config)
+        await weather_node(ask("明天上海天气"), config)
+        await query_node(ask("哪个城市最热"), config)
+
+        assert [e["name"] for e in sink.events] == ["weather", "forecast", "weather_list"]
+        card = sink.named("weather")[0]
+        assert card["type"] == "ui" and card["props"]["city"] == "北京"
+        assert card["metadata"] == {"merge": False, "message_id": result["messages"][0].id}
+
+    @pytest.mark.anyio
+    async def test_merge_mode_emits_deltas(self):
+        """测试 merge 模式下 sink 收到与流式推送相同的增量事件"""
+        sink = MemorySink()
+        config = {"configurable": {"ui_sink": sink, "ui_update_mode": "merge"}}
+        state = ask("北京天气")
+        first = await weather_node(state, config)
+        state = {**state, "context": first["context"]}
+        await weather_node(state, {"configurable": {**config["configurable"], "temperature_unit": "F"}})
+
+        created, updated = sink.events
+        assert updated["id"] == created["id"] and updated["metadata"]["merge"] is True
+        assert set(updated["props"]) == {"temperature"}
+
+    @pytest.mark.anyio
+    async def test_no_sink_is_silent(self):
+        """测试未配置 sink 时直接调用节点不报错也不产生 UI"""
+        result = await weather_node(ask("北京天气"))
+        assert "ui" not in result
+
+    @pytest.mark.anyio
+    async def test_file_sink_from_path(self, tmp_path):
+        """测试配置文件路径时 UI 事件以 JSONL 追加写入"""
+        path = str(tmp_path / "ui.jsonl")
+        config = {"configurable": {"ui_sink": path}}
+        for text in ["北京天气", "深圳天气"]:
+            await weather_node(ask(text), config)
+        assert resolve_sink(path) is resolve_sink(path)
+        resolve_sink(path).close()
+
+        with open(path, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        assert [e["props"]["city"] for e in events] == ["北京", "深圳"]
+
+    def test_file_sink_reopens_after_close(self, tmp_path):
+        """测试关闭后再次写入会追加而不是覆盖"""
+        path = tmp_path / "ui.jsonl"
+        with FileSink(str(path)) as sink:
+            sink.emit({"name": "a"})
+        sink.emit({"name": "b"})
+        sink.close()
+        assert path.read_text(encoding="utf-8").splitlines() == ['{"name": "a"}', '{"name": "b"}']
+
+    def test_rejects_unknown_values(self):
+        """测试无法识别的 sink 配置直接报错"""
+        with pytest.raises(TypeError):
+            resolve_sink(42)
+
+
+class TestGraphRunSink:
+    """图运行时同时写入状态和 sink"""
+
+    @pytest.mark.anyio
+    async def test_graph_run_tees_to_sink(self):
+        """测试图运行时 UI 事件既进入 ui 状态也写入 sink"""
+        sink = MemorySink()
+        result = await graph.ainvoke(ask("杭州天气"), {"configurable": {"ui_sink": sink}})
+        assert len(sink) == 1
+        assert sink.events[0]["id"] == result["ui"][0]["id"]
+        assert sink.events[0]["props"] == result["ui"][0]["props"]
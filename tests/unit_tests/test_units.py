@@ -0,0 +1,135 @@
+"""测试数值天气字段与单位换算的单元测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from array import array
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent import units as units_module
+from agent import weather_store
+from agent.graph import WEATHER_DATA, graph
+from agent.providers import TableProvider
+from agent.units import (
+    TEMPERATURE_UNITS,
+    WIND_UNITS,
+    convert_column,
+    format_column,
+    resolve_unit,
+)
+from agent.weather_store import WeatherTable, format_reading
+
+
+def format_cache_misses():
+    return weather_store._format_values.cache_info().misses
+
+
+class TestUnitConversion:
+    """整列单位换算测试"""
+
+    @pytest.mark.parametrize("use_numpy", [True, False])
+    def test_convert_column(self, monkeypatch, use_numpy):
+        """测试温度和风速整列换算"""
+        if not use_numpy:
+            monkeypatch.setattr(units_module, "np", None)
+        elif units_module.np is None:
+            pytest.skip("NumPy 未安装")
+
+        celsius = array("d", [0.0, 100.0, -40.0])
+        assert list(convert_column(celsius, TEMPERATURE_UNITS["F"])) == pytest.approx([32.0, 212.0, -40.0])
+        kmh = array("d", [36.0, 3.6])
+        assert list(convert_column(kmh, WIND_UNITS["m/s"])) == pytest.approx([10.0, 1.0])
+        assert list(convert_column(kmh, WIND_UNITS["mph"])) == pytest.approx([22.369, 2.2369], rel=1e-3)
+
+    def test_canonical_unit_is_not_copied(self):
+        """测试规范单位不做换算"""
+        column = array("d", [1.0])
+        assert convert_column(column, TEMPERATURE_UNITS["C"]) is column
+
+    def test_resolve_unit_fallback(self):
+        """测试未知单位回退到规范单位"""
+        assert resolve_unit("temperature", "K") == TEMPERATURE_UNITS["C"]
+        assert resolve_unit("windSpeed", None) == WIND_UNITS["km/h"]
+
+    def test_format_column_locales(self):
+        """测试按语言区域格式化"""
+        assert format_column([22.0], TEMPERATURE_UNITS["C"]) == ("22°C",)
+        assert format_column([1.94], WIND_UNITS["m/s"], "en-US") == ("1.9m/s",)
+        assert format_column([1.94], WIND_UNITS["m/s"], "de-DE") == ("1,9 m/s",)
+
+
+class TestWeatherTable:
+    """列式天气表测试"""
+
+    @pytest.fixture
+    def table(self):
+        return WeatherTable(WEATHER_DATA)
+
+    def test_numeric_columns(self, table):
+        """测试展示字符串只在加载时解析一次"""
+        assert table.columns["temperature"].typecode == "d"
+        assert list(table.columns["temperature"]) == [22.0, 18.0, 26.0, 24.0, 20.0]
+        assert table.value("上海", "humidity") == 68.0
+        assert table.value("深圳", "windSpeed", "m/s") == pytest.approx(7 / 3.6)
+
+    def test_default_display_matches_bundled_records(self, table):
+        """测试默认单位下输出与前端约定完全一致"""
+        provider = TableProvider(table)
+        for record in WEATHER_DATA:
+            assert format_reading(provider.reading(record["city"])) == record
+
+    def test_formatted_columns_are_cached(self, table):
+        """测试格式化结果按单位和语言缓存"""
+        first = table.formatted("temperature", "F", "en-US")
+        assert first is table.formatted("temperature", "F", "en-US")
+        assert first is not table.formatted("temperature", "F", "de-DE")
+        assert first[0] == "72°F"
+
+    def test_reload_drops_caches(self, table):
+        """测试重新加载后版本号递增且缓存失效"""
+        before = table.formatted("temperature")
+        table.reload([{**WEATHER_DATA[0], "temperature": "30°C"}])
+        assert table.version == 1
+        assert len(table) == 1
+        assert table.formatted("temperature") is not before
+        assert format_reading(TableProvider(table).reading("北京"))["temperature"] == "30°C"
+
+    def test_formatted_readings_are_memoised(self, table):
+        """测试同一读数、单位和语言只换算格式化一次，调用方拿到各自的副本"""
+        reading = TableProvider(table).reading("上海")
+        units = {"temperature": "F", "windSpeed": "mph"}
+        first = format_reading(reading, units, "en-US")
+        first["stale"] = True
+        misses = format_cache_misses()
+        assert format_reading(dict(reading), units, "en-US") == {k: v for k, v in first.items() if k != "stale"}
+        assert format_cache_misses() == misses
+        assert format_reading({**reading, "temperature": 30.0}, units, "en-US")["temperature"] == "86°F"
+        assert format_cache_misses() == misses + 1
+
+
+class TestUnitPreferences:
+    """graph 单位偏好测试"""
+
+    @pytest.mark.anyio
+    async def test_imperial_weather_card(self):
+        """测试英制单位的天气卡片"""
+        config = {"configurable": {"temperature_unit": "F", "wind_unit": "mph", "locale": "en-US"}}
+        result = await graph.ainvoke({"messages": [HumanMessage(content="北京天气")], "ui": []}, config)
+        props = result["ui"][0]["props"]
+        assert props["temperature"] == "72°F"
+        assert props["windSpeed"] == "2mph"
+        assert props["humidity"] == "45%"
+
+    @pytest.mark.anyio
+    async def test_fahrenheit_forecast(self):
+        """测试预报同样换算为华氏度"""
+        config = {"configurable": {"temperature_unit": "F"}}
+        result = await graph.ainvoke({"messages": [HumanMessage(content="明天北京天气")], "ui": []}, config)
+        props = result["ui"][0]["props"]
+        assert props["unit"] == "°F"
+        assert props["days"][0]["min"] > 40
+        assert "°F" in result["messages"][-1].content
@@ -109,6 +109,25 @@ class TestWeatherNodeSimple:
         has_weather_icon = any(icon in message.content for icon in weather_icons)
         assert has_weather_icon, f"消息中缺少天气图标: {message.content}"
 
+    @pytest.mark.anyio
+    async def test_weather_node_skips_image_blocks(self, scanned):
+        """测试多模态消息只提取文本块，图片 base64 不参与匹配"""
+        from agent.graph import EXTRACTION_SCAN_CHARS
+
+        payload = "data:image/png;base64," + "上海" * 2_000_000
+        state = AgentState(
+            messages=[HumanMessage(content=[
+                {"type": "image_url", "image_url": {"url": payload}},
+                {"type": "text", "text": "深圳天气怎么样？"},
+            ])],
+            ui=[]
+        )
+        result = await weather_node(state)
+        assert scanned and max(scanned) <= EXTRACTION_SCAN_CHARS
+
+        shenzhen = next(w for w in WEATHER_DATA if w["city"] == "深圳")
+        assert shenzhen["description"] in result["messages"][0].content
+
     def test_extract_city_from_message_basic(self):
         """测试城市提取基本功能"""
         # 测试直接匹配